@@ -0,0 +1,83 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from config import SQLITE_MMAP_SIZE, SQLITE_CACHE_KB, POOL_LEITURA_MAXIMO
+
+
+# CONEXOES SQLITE DE VIDA LONGA COMPARTILHADAS PELOS ENDPOINTS
+class Armazenamento:
+    """Mantem um pool de conexoes de leitura e uma conexao dedicada de
+    escrita para o mesmo arquivo. Todas recebem os mesmos PRAGMAs e um
+    cache de statements, entao SQL repetido nao e recompilado a cada
+    requisicao."""
+
+    def __init__(self, caminho_db, max_leitura=POOL_LEITURA_MAXIMO, cached_statements=256):
+        self.caminho_db = caminho_db
+        self.max_leitura = max(1, int(max_leitura))
+        self.cached_statements = cached_statements
+        self._livres = queue.LifoQueue()
+        self._abertas = []
+        self._trava = threading.Lock()
+        self._escrita = None
+
+    def _conectar(self):
+        conn = sqlite3.connect(
+            self.caminho_db,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={int(SQLITE_MMAP_SIZE)}")
+        conn.execute(f"PRAGMA cache_size=-{int(SQLITE_CACHE_KB)}")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    # EMPRESTA UMA CONEXAO DE LEITURA; CRIA NOVAS ATE O LIMITE E DEPOIS ESPERA
+    @contextmanager
+    def leitura(self):
+        try:
+            conn = self._livres.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._trava:
+                if len(self._abertas) < self.max_leitura:
+                    conn = self._conectar()
+                    self._abertas.append(conn)
+            if conn is None:
+                conn = self._livres.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._livres.put(conn)
+
+    # CONEXAO FORA DO POOL PARA LEITURAS LONGAS (EXPORTACAO EM STREAMING): UM DOWNLOAD
+    # LENTO NAO PRENDE UMA DAS max_leitura CONEXOES QUE ATENDEM AS OUTRAS REQUISICOES
+    @contextmanager
+    def leitura_dedicada(self):
+        conn = self._conectar()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # CONEXAO UNICA DE ESCRITA (USADA SO PELO EscritorIngestao)
+    def escrita(self):
+        with self._trava:
+            if self._escrita is None:
+                self._escrita = self._conectar()
+            return self._escrita
+
+    def fechar(self):
+        with self._trava:
+            for conn in self._abertas:
+                conn.close()
+            self._abertas.clear()
+            self._livres = queue.LifoQueue()
+            if self._escrita is not None:
+                self._escrita.close()
+                self._escrita = None
@@ -0,0 +1,182 @@
+import json
+import struct
+import zipfile
+
+import numpy as np
+
+from config import BACKEND_MODELO, CAMINHO_PESOS, CAMINHO_PESOS_NUMPY, PESOS_MMAP
+
+TAMANHO_JANELA = 141
+
+# NORMALIZACAO FEITA PELA API ANTES DO MODELO (utils.normalizar_dados / normalizar_lote)
+NORMALIZACAO_API = "min_max_por_janela"
+
+# PRECISAO DOS KERNELS NO ARTEFATO .npz (VER quantizar_pesos.py) -> TIPO GRAVADO
+TIPOS_PRECISAO = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+# BACKEND ORIGINAL: DETECTOR KERAS CARREGADO DO .weights.h5
+class BackendKeras:
+    nome = "keras"
+    limiares = None
+
+    def __init__(self, caminho=CAMINHO_PESOS):
+        import tensorflow as tf
+        from detector import Detector
+
+        self._tf = tf
+        if str(caminho).endswith(".npz"):
+            # ARTEFATO DO treinar.py / exportar_pesos.py: ARQUITETURA E LIMIARES VEM NOS METADADOS
+            with np.load(caminho, allow_pickle=False) as arquivo:
+                metadados = json.loads(str(arquivo["metadados"]))
+                if metadados.get("precisao", "float32") != "float32":
+                    raise ValueError(f"Artefato em {metadados['precisao']}: use o backend numpy")
+                pesos = [arquivo[f"{tipo}_{i}"] for i in range(metadados["num_camadas"])
+                         for tipo in ("kernel", "bias")]
+            dimensoes = metadados["dimensoes"]
+            self.modelo = Detector(camadas=tuple(dimensoes[1:len(dimensoes) // 2 + 1]), saida=dimensoes[-1])
+            self.modelo(tf.zeros((1, dimensoes[0])))
+            self.modelo.set_weights(pesos)
+            self.limiares = metadados.get("limiares")
+            return
+
+        self.modelo = Detector()
+        self.modelo.build(input_shape=(None, TAMANHO_JANELA))
+        self.modelo.compile(optimizer='adam', loss='mae')
+        self.modelo.load_weights(caminho)
+
+    def reconstruir(self, lote):
+        return self.modelo(self._tf.convert_to_tensor(lote, dtype=self._tf.float32)).numpy()
+
+    def calcular_perdas(self, lote):
+        lote = np.asarray(lote, dtype=np.float32)
+        return np.mean(np.abs(lote - self.reconstruir(lote)), axis=1)
+
+
+# MAPEIA EM MEMORIA OS ARRAYS DE UM .npz SEM COMPRESSAO (np.savez)
+# AS PAGINAS FICAM NO CACHE DO SISTEMA E SAO COMPARTILHADAS ENTRE OS WORKERS
+def mapear_npz(caminho, nomes):
+    arrays = {}
+    with zipfile.ZipFile(caminho) as pacote, open(caminho, "rb") as arquivo:
+        for nome in nomes:
+            info = pacote.getinfo(f"{nome}.npy")
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{info.filename} está comprimido e não pode ser mapeado")
+
+            # CABECALHO LOCAL DO ZIP: 30 BYTES + NOME + CAMPO EXTRA
+            arquivo.seek(info.header_offset)
+            tamanho_nome, tamanho_extra = struct.unpack("<HH", arquivo.read(30)[26:30])
+            arquivo.seek(info.header_offset + 30 + tamanho_nome + tamanho_extra)
+
+            versao = np.lib.format.read_magic(arquivo)
+            if versao == (1, 0):
+                forma, fortran, tipo = np.lib.format.read_array_header_1_0(arquivo)
+            else:
+                forma, fortran, tipo = np.lib.format.read_array_header_2_0(arquivo)
+            arrays[nome] = np.memmap(
+                caminho, dtype=tipo, mode="r", offset=arquivo.tell(),
+                shape=forma, order="F" if fortran else "C",
+            )
+    return arrays
+
+
+# BACKEND SEM TENSORFLOW: MESMA REDE DENSA CALCULADA COM MATMUL DO NUMPY
+class BackendNumpy:
+    nome = "numpy"
+
+    def __init__(self, caminho=CAMINHO_PESOS_NUMPY, tamanho_janela=TAMANHO_JANELA, mmap=PESOS_MMAP):
+        with np.load(caminho, allow_pickle=False) as arquivo:
+            self.metadados = json.loads(str(arquivo["metadados"]))
+            n = self.metadados["num_camadas"]
+            self.precisao = self.metadados.get("precisao", "float32")
+            if self.precisao not in TIPOS_PRECISAO:
+                raise ValueError(f"Precisão desconhecida no artefato: {self.precisao}")
+
+            # NOME -> TIPO ESPERADO; NO int8 CADA CAMADA TRAZ AS ESCALAS DO KERNEL E DA ENTRADA
+            tipos = {f"kernel_{i}": TIPOS_PRECISAO[self.precisao] for i in range(n)}
+            tipos.update({f"bias_{i}": np.float32 for i in range(n)})
+            if self.precisao == "int8":
+                tipos.update({f"escala_kernel_{i}": np.float32 for i in range(n)})
+                tipos.update({f"escala_entrada_{i}": np.float32 for i in range(n)})
+
+            # COM mmap OS PESOS NAO SAO COPIADOS PARA A MEMORIA DE CADA PROCESSO
+            self.mapeado = False
+            if mmap:
+                try:
+                    mapeados = mapear_npz(caminho, list(tipos))
+                    self.mapeado = all(
+                        a.dtype == tipos[nome] and a.flags.c_contiguous for nome, a in mapeados.items()
+                    )
+                except (KeyError, ValueError):
+                    pass
+            origem = mapeados if self.mapeado else arquivo
+            pesos = {nome: np.ascontiguousarray(origem[nome], dtype=tipo) for nome, tipo in tipos.items()}
+            # O NUMPY NAO TEM MATMUL RAPIDO EM float16/int8: OS KERNELS SAO CONVERTIDOS PARA float32
+            # UMA VEZ AQUI E OS DE PRECISAO MENOR SAO DESCARTADOS. EM MEMORIA E EM VELOCIDADE UMA
+            # VARIANTE QUANTIZADA E IGUAL AO float32 (SEM O mmap, JA QUE A COPIA E DO PROCESSO):
+            # O GANHO E SO NO TAMANHO DO ARQUIVO
+            self.kernels = [np.ascontiguousarray(pesos.pop(f"kernel_{i}"), dtype=np.float32) for i in range(n)]
+            self.biases = [pesos[f"bias_{i}"] for i in range(n)]
+            if self.precisao == "int8":
+                self.escalas_kernel = [pesos[f"escala_kernel_{i}"] for i in range(n)]
+                self.escalas_entrada = [float(pesos[f"escala_entrada_{i}"]) for i in range(n)]
+            del pesos
+            if self.precisao != "float32":
+                self.mapeado = False
+
+        entrada = self.kernels[0].shape[0]
+        saida = self.kernels[-1].shape[1]
+        if entrada != tamanho_janela or saida != tamanho_janela:
+            raise ValueError(
+                f"Pesos com entrada {entrada} e saída {saida}; o Detector espera {tamanho_janela} valores."
+            )
+
+        # ARTEFATOS DO treinar.py TRAZEM A NORMALIZACAO USADA NO TREINO E OS LIMIARES DE DIAGNOSTICO
+        normalizacao = self.metadados.get("normalizacao", {}).get("metodo", NORMALIZACAO_API)
+        if normalizacao != NORMALIZACAO_API:
+            raise ValueError(f"Modelo treinado com normalização '{normalizacao}'; a API usa '{NORMALIZACAO_API}'.")
+        self.limiares = self.metadados.get("limiares")
+
+    def reconstruir(self, lote):
+        x = np.asarray(lote, dtype=np.float32)
+        ultima = len(self.kernels) - 1
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            if self.precisao == "int8":
+                # ENTRADA QUANTIZADA COM A ESCALA CALIBRADA; O PRODUTO DE INTEIROS E EXATO EM float32
+                # (kernel TEM OS VALORES int8 JA EM float32)
+                escala = self.escalas_entrada[i]
+                x = np.rint(x / escala)
+                np.clip(x, -127, 127, out=x)
+                x = x @ kernel
+                x *= escala * self.escalas_kernel[i]
+            else:
+                x = x @ kernel
+            x += bias
+            if i < ultima:
+                np.maximum(x, 0, out=x)
+            else:
+                # SIGMOIDE NA ULTIMA CAMADA
+                np.negative(x, out=x)
+                np.exp(x, out=x)
+                x += 1
+                np.reciprocal(x, out=x)
+        return x
+
+    def calcular_perdas(self, lote):
+        lote = np.asarray(lote, dtype=np.float32)
+        return np.mean(np.abs(lote - self.reconstruir(lote)), axis=1)
+
+
+BACKENDS = {
+    "keras": BackendKeras,
+    "numpy": BackendNumpy,
+}
+
+
+# `caminho` None = ARQUIVO PADRAO DO BACKEND (EASY_HEART_PESOS / EASY_HEART_PESOS_NUMPY)
+def criar_backend(nome=BACKEND_MODELO, caminho=None):
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend de modelo desconhecido: {nome}")
+    if caminho is None:
+        return BACKENDS[nome]()
+    return BACKENDS[nome](caminho)
@@ -0,0 +1,155 @@
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+
+# GERACAO DOS DADOS GRAVADOS (CHAVE EM metadados): O MAIOR id SO MUDA COM LINHAS NOVAS, ENTAO
+# QUEM ALTERA OU TIRA LINHAS EXISTENTES DO BANCO (repontuar.py, ARQUIVAMENTO) INCREMENTA A GERACAO
+CHAVE_GERACAO = "geracao"
+
+
+def ler_geracao(conn):
+    try:
+        linha = conn.execute("SELECT valor FROM metadados WHERE chave = ?", (CHAVE_GERACAO,)).fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return int(linha[0]) if linha else 0
+
+
+# CHAMAR DENTRO DA TRANSACAO QUE ALTERA AS LINHAS
+def incrementar_geracao(conn):
+    conn.execute(
+        "INSERT INTO metadados (chave, valor) VALUES (?, '1') "
+        "ON CONFLICT (chave) DO UPDATE SET valor = CAST(valor AS INTEGER) + 1",
+        (CHAVE_GERACAO,)
+    )
+
+
+# BUFFER CIRCULAR EM MEMORIA COM OS REGISTROS MAIS RECENTES
+class CacheRecentes:
+    """Guarda os ultimos registros ja formatados (global e por user_id).
+    E alimentado pelo escritor depois de cada commit, entao /ultimo_dado e
+    /ultimos_5_dados podem responder sem consultar o SQLite. O cache e por
+    processo: com varios workers cada um ve apenas o que ele mesmo gravou
+    depois de aquecer, entao endpoints.buscar_recentes confere o maior id
+    no banco antes de usa-lo (config.PROCESSOS > 1). Quando a geracao do
+    banco muda (`sincronizar`) o cache e esvaziado e aquecido de novo.
+    Guarda filas de ate `maximo_usuarios` pacientes: passando disso sai a
+    do paciente menos usado, como no CacheLRU."""
+
+    def __init__(self, capacidade_global=100, capacidade_usuario=5, maximo_usuarios=10000):
+        self.capacidade_global = capacidade_global
+        self.capacidade_usuario = capacidade_usuario
+        self.maximo_usuarios = max(1, int(maximo_usuarios))
+        self._global = deque(maxlen=capacidade_global)
+        self._global_carregado = False
+        self._usuarios = OrderedDict()
+        self._usuarios_carregados = set()
+        self.geracao = None
+        self._trava = threading.Lock()
+
+    def _fila_usuario(self, user_id):
+        fila = self._usuarios.get(user_id)
+        if fila is not None:
+            self._usuarios.move_to_end(user_id)
+            return fila
+        fila = self._usuarios[user_id] = deque(maxlen=self.capacidade_usuario)
+        while len(self._usuarios) > self.maximo_usuarios:
+            removido, _ = self._usuarios.popitem(last=False)
+            self._usuarios_carregados.discard(removido)
+        return fila
+
+    # REGISTROS NOVOS (EM ORDEM CRESCENTE DE id) APOS O COMMIT
+    def adicionar(self, registros):
+        with self._trava:
+            for registro in registros:
+                self._global.append(registro)
+                self._fila_usuario(registro["user_id"]).append(registro)
+
+    # ESVAZIA O CACHE SE AS LINHAS DO BANCO MUDARAM DESDE A ULTIMA CARGA
+    def sincronizar(self, geracao):
+        with self._trava:
+            if geracao == self.geracao:
+                return
+            self._global.clear()
+            self._global_carregado = False
+            self._usuarios.clear()
+            self._usuarios_carregados.clear()
+            self.geracao = geracao
+
+    # CARGA INICIAL A PARTIR DO BANCO (registros EM QUALQUER ORDEM), LIDOS DEPOIS DE VER `geracao`
+    # (UMA CARGA LIDA ANTES DA ULTIMA MUDANCA DE GERACAO E DESCARTADA)
+    def carregar(self, registros, user_id=None, geracao=None):
+        with self._trava:
+            if geracao != self.geracao:
+                return
+            if user_id is None:
+                destino, capacidade = self._global, self.capacidade_global
+            else:
+                destino, capacidade = self._fila_usuario(user_id), self.capacidade_usuario
+
+            # JUNTA COM O QUE O ESCRITOR JA TENHA ADICIONADO ENQUANTO O BANCO ERA LIDO
+            por_id = {r["id"]: r for r in registros}
+            por_id.update((r["id"], r) for r in destino)
+            destino.clear()
+            destino.extend(sorted(por_id.values(), key=lambda r: r["id"])[-capacidade:])
+
+            if user_id is None:
+                self._global_carregado = True
+            else:
+                self._usuarios_carregados.add(user_id)
+
+    # DEVOLVE OS n MAIS RECENTES (DO MAIS NOVO PARA O MAIS ANTIGO) OU None SE NAO HA COMO RESPONDER
+    def ultimos(self, n, user_id=None):
+        with self._trava:
+            if user_id is None:
+                if not self._global_carregado or n > self.capacidade_global:
+                    return None
+                fila = self._global
+            else:
+                if user_id not in self._usuarios_carregados or n > self.capacidade_usuario:
+                    return None
+                fila = self._fila_usuario(user_id)
+            return list(reversed(fila))[:n]
+
+
+# ETAG: MUDA SEMPRE QUE CHEGA UM REGISTRO NOVO PARA AQUELA VISAO OU QUE A GERACAO DO BANCO MUDA
+def calcular_etag(registros, n, user_id=None, sufixo="", geracao=0):
+    ultimo_id = registros[0]["id"] if registros else 0
+    escopo = "todos" if user_id is None else f"u{user_id}"
+    return f'"{escopo}-{n}-{ultimo_id}-g{geracao}{sufixo}"'
+
+
+# CACHE LRU SIMPLES (USADO PARA AS RECONSTRUCOES DO MODELO POR id DE REGISTRO)
+class CacheLRU:
+    def __init__(self, capacidade=1024):
+        self.capacidade = max(1, int(capacidade))
+        self.acertos = 0
+        self.faltas = 0
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            valor = self._itens.get(chave)
+            if valor is None:
+                self.faltas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._trava:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+
+    def estatisticas(self):
+        with self._trava:
+            return {
+                "itens": len(self._itens),
+                "capacidade": self.capacidade,
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+            }
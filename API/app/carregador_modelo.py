@@ -0,0 +1,159 @@
+import threading
+import time
+
+import numpy as np
+
+from backends import criar_backend, TAMANHO_JANELA
+
+
+# CARREGA O MODELO EM SEGUNDO PLANO, FORA DO IMPORT DOS ENDPOINTS
+class CarregadorModelo:
+    """Cria o backend em uma thread propria e roda algumas inferencias de
+    aquecimento antes de marcar o modelo como pronto. Enquanto isso o
+    processo ja aceita conexoes: /saude responde e /saude/pronto devolve
+    503 ate o aquecimento terminar. `ao_ficar_pronto` recebe o proprio
+    carregador quando a primeira carga falha e quando o modelo fica pronto.
+
+    Com um `registro` (registro_modelos.RegistroModelos) a mesma thread
+    continua vigiando a pasta a cada `intervalo_s`: uma nova versao ativa e
+    carregada e aquecida ao lado da atual e so entao substitui `backend`
+    (uma unica atribuicao; lotes em andamento terminam com o modelo antigo).
+    A versao candidata fica em `candidato`, para a avaliacao em sombra."""
+
+    def __init__(self, nome_backend, tamanhos_aquecimento=(1, 32), ao_ficar_pronto=None,
+                 registro=None, intervalo_s=2.0):
+        self.nome_backend = nome_backend
+        self.tamanhos_aquecimento = tamanhos_aquecimento
+        self.ao_ficar_pronto = ao_ficar_pronto
+        self.registro = registro
+        self.intervalo = intervalo_s
+        self.backend = None
+        self.candidato = None
+        self.trocas = 0
+        self.erro = None
+        self.tempo_carga = None
+        self.tempo_aquecimento = None
+        self.pronto_em = None
+        self._falhas = {}
+        self._pronto = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+
+    @property
+    def pronto(self):
+        return self._pronto.is_set()
+
+    @property
+    def versao(self):
+        return getattr(self.backend, "versao", None)
+
+    # LIMIARES DE DIAGNOSTICO DO MODELO CARREGADO (None = PADRAO DE utils.calcular_diagnostico)
+    @property
+    def limiares(self):
+        return getattr(self.backend, "limiares", None)
+
+    def iniciar(self):
+        if self._thread is None:
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._executar, name="carregador-modelo", daemon=True)
+            self._thread.start()
+
+    def parar(self, timeout=5.0):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def aguardar(self, timeout=None):
+        return self._pronto.wait(timeout)
+
+    # CRIA E AQUECE UM BACKEND SEM MEXER NO QUE ESTA SENDO SERVIDO
+    def _preparar(self, caminho, versao):
+        inicio = time.perf_counter()
+        backend = criar_backend(self.nome_backend, caminho)
+        carregado = time.perf_counter()
+
+        # A PRIMEIRA CHAMADA DO MODELO E MAIS LENTA (CONSTRUCAO DO GRAFO, ALOCACOES)
+        for n in self.tamanhos_aquecimento:
+            backend.reconstruir(np.zeros((n, TAMANHO_JANELA), dtype=np.float32))
+
+        backend.versao = versao
+        return backend, carregado - inicio, time.perf_counter() - carregado
+
+    def _ativar(self, backend, tempo_carga, tempo_aquecimento):
+        ja_pronto = self.pronto
+        self.backend = backend
+        if ja_pronto:
+            self.trocas += 1
+            print(f"Modelo trocado para a versão '{backend.versao}' "
+                  f"(carga {tempo_carga:.2f}s, aquecimento {tempo_aquecimento:.3f}s)", flush=True)
+            return
+        self.tempo_carga = tempo_carga
+        self.tempo_aquecimento = tempo_aquecimento
+        self.erro = None
+        self.pronto_em = time.time()
+        self._pronto.set()
+        if self.ao_ficar_pronto is not None:
+            self.ao_ficar_pronto(self)
+
+    def carregar(self):
+        versao = None
+        try:
+            if self.registro is None:
+                versao, caminho = "padrao", None
+            else:
+                versao, caminho = self.registro.ativa()
+                if caminho is None:
+                    raise ValueError(f"nenhuma versão ativa em {self.registro.pasta} (use registro_modelos.py ativar)")
+            self._ativar(*self._preparar(caminho, versao))
+        except Exception as e:
+            self._falhas["ativo"] = versao
+            self.erro = f"Falha ao carregar os pesos do modelo: {e}"
+            if self.ao_ficar_pronto is not None:
+                self.ao_ficar_pronto(self)
+
+    # COMPARA O REGISTRO COM O QUE ESTA CARREGADO E TROCA O QUE MUDOU
+    def verificar_registro(self):
+        versao, caminho = self.registro.ativa()
+        if caminho is not None and versao != self.versao and self._falhas.get("ativo") != versao:
+            try:
+                self._ativar(*self._preparar(caminho, versao))
+            except Exception as e:
+                self._falhas["ativo"] = versao
+                print(f"Falha ao carregar a versão '{versao}' do modelo: {e}", flush=True)
+
+        versao, caminho = self.registro.candidata()
+        if caminho is None:
+            self.candidato = None
+        elif versao != getattr(self.candidato, "versao", None) and self._falhas.get("candidato") != versao:
+            try:
+                self.candidato = self._preparar(caminho, versao)[0]
+                print(f"Modelo candidato '{versao}' carregado para avaliação em sombra", flush=True)
+            except Exception as e:
+                self._falhas["candidato"] = versao
+                print(f"Falha ao carregar o candidato '{versao}': {e}", flush=True)
+
+    def _executar(self):
+        self.carregar()
+        if self.registro is None:
+            return
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.verificar_registro()
+            except OSError as e:
+                print(f"Erro ao ler o registro de modelos: {e}", flush=True)
+
+    def estatisticas(self):
+        return {
+            "backend": self.nome_backend,
+            "versao": self.versao,
+            "candidato": getattr(self.candidato, "versao", None),
+            "trocas": self.trocas,
+            "pronto": self.pronto,
+            "erro": self.erro,
+            "tempo_carga_s": self.tempo_carga,
+            "tempo_aquecimento_s": self.tempo_aquecimento,
+            "pesos_mapeados": getattr(self.backend, "mapeado", False),
+            "precisao": getattr(self.backend, "precisao", "float32"),
+            "limiares": self.limiares,
+        }
@@ -0,0 +1,147 @@
+import base64
+import json
+from typing import Optional
+
+import numpy as np
+from fastapi import HTTPException, Query, Request, Response
+
+try:
+    import orjson
+except ImportError:  # SEM orjson: json DA BIBLIOTECA PADRAO
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # SEM msgpack: SO JSON
+    msgpack = None
+
+# CODIFICACAO DAS RESPOSTAS DE LEITURA (/ultimo_dado, /ultimos_5_dados, /dados_por_data, ...)
+#
+# O formato vem do cabecalho Accept:
+#   application/json (padrao):          orjson quando instalado, senao json
+#   application/msgpack (ou x-msgpack): MessagePack
+# As amostras (batimentos e reconstrucao) chegam aqui como arrays float32 e
+# `bat` escolhe como saem:
+#   lista:  lista de numeros (o formato de sempre)
+#   base64: string base64 dos float32 little-endian (141 amostras = 752 caracteres)
+#   f32:    os mesmos bytes crus (so em MessagePack, tipo bin)
+# `projecao=status` reduz cada registro ao que um dispositivo precisa para acender o LED.
+
+MIDIA_JSON = "application/json"
+MIDIA_MSGPACK = "application/msgpack"
+
+_MIDIAS = {
+    "application/json": MIDIA_JSON,
+    "application/*": MIDIA_JSON,
+    "*/*": MIDIA_JSON,
+    "application/msgpack": MIDIA_MSGPACK,
+    "application/x-msgpack": MIDIA_MSGPACK,
+}
+
+CODIFICACOES_BAT = ("lista", "base64", "f32")
+CAMPOS_AMOSTRAS = ("batimentos", "reconstrucao")
+CAMPOS_STATUS = ("id", "user_id", "diagnostico_ia", "status_local", "perda", "data", "hora")
+
+
+def midias_disponiveis():
+    return [MIDIA_JSON] + ([MIDIA_MSGPACK] if msgpack is not None else [])
+
+
+# ESCOLHE A MIDIA PELO Accept (RESPEITANDO q=); None SE NENHUMA SERVE
+def negociar(accept):
+    if not accept:
+        return MIDIA_JSON
+    opcoes = []
+    for ordem, parte in enumerate(accept.split(",")):
+        tipo, *parametros = [p.strip() for p in parte.split(";")]
+        q = 1.0
+        for parametro in parametros:
+            nome, _, valor = parametro.partition("=")
+            if nome.strip() == "q":
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            opcoes.append((-q, ordem, tipo.lower()))
+    for _, _, tipo in sorted(opcoes):
+        midia = _MIDIAS.get(tipo)
+        if midia is not None and midia in midias_disponiveis():
+            return midia
+    return None
+
+
+def _amostras(valores, bat):
+    if bat == "lista" or valores is None:
+        return valores
+    dados = np.asarray(valores, dtype="<f4").tobytes()
+    return dados if bat == "f32" else base64.b64encode(dados).decode("ascii")
+
+
+# O QUE O SERIALIZADOR NAO CONHECE (ARRAYS QUE O orjson NAO SERIALIZA DIRETO, ESCALARES DO numpy)
+def _padrao(objeto):
+    if isinstance(objeto, np.ndarray):
+        return objeto.tolist()
+    if isinstance(objeto, np.generic):
+        return objeto.item()
+    raise TypeError(f"Tipo não serializável: {type(objeto).__name__}")
+
+
+def codificar(conteudo, midia=MIDIA_JSON):
+    if midia == MIDIA_MSGPACK:
+        return msgpack.packb(conteudo, default=_padrao)
+    if orjson is not None:
+        return orjson.dumps(conteudo, default=_padrao, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(conteudo, default=_padrao, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class Codificacao:
+    def __init__(self, midia=MIDIA_JSON, bat="lista", projecao=None):
+        self.midia = midia
+        self.bat = bat
+        self.projecao = projecao
+
+    # IDENTIFICA A REPRESENTACAO NO ETag (A MESMA URL SERVE VARIOS FORMATOS)
+    @property
+    def sufixo(self):
+        if self.midia == MIDIA_JSON and self.bat == "lista" and self.projecao is None:
+            return ""
+        return f"-{'msgpack' if self.midia == MIDIA_MSGPACK else 'json'}-{self.projecao or self.bat}"
+
+    # NOVO DICIONARIO (OS REGISTROS DO CACHE NAO SAO ALTERADOS)
+    def registro(self, registro):
+        if self.projecao == "status":
+            return {campo: registro.get(campo) for campo in CAMPOS_STATUS}
+        if self.bat == "lista":
+            return registro
+        return {
+            chave: _amostras(valor, self.bat) if chave in CAMPOS_AMOSTRAS else valor
+            for chave, valor in registro.items()
+        }
+
+    def registros(self, registros):
+        return [self.registro(r) for r in registros]
+
+    def resposta(self, conteudo, status_code=200, headers=None):
+        return Response(
+            content=codificar(conteudo, self.midia),
+            status_code=status_code,
+            media_type=self.midia,
+            headers={"Vary": "Accept", **(headers or {})},
+        )
+
+
+# DEPENDENCIA DO FASTAPI DOS ENDPOINTS DE LEITURA
+def codificacao_leitura(
+    request: Request,
+    bat: str = Query("lista", pattern=f"^({'|'.join(CODIFICACOES_BAT)})$"),
+    projecao: Optional[str] = Query(None, pattern="^status$"),
+):
+    midia = negociar(request.headers.get("accept"))
+    if midia is None:
+        raise HTTPException(
+            status_code=406, detail=f"Formatos disponíveis: {', '.join(midias_disponiveis())}"
+        )
+    if bat == "f32" and midia != MIDIA_MSGPACK:
+        raise HTTPException(status_code=406, detail="bat=f32 requer Accept: application/msgpack")
+    return Codificacao(midia, bat, projecao)
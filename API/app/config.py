@@ -0,0 +1,103 @@
+import os
+
+# CONFIGURACOES DA API (PODEM SER SOBRESCRITAS POR VARIAVEIS DE AMBIENTE)
+
+# PASTA API/ (OS PADROES ABAIXO NAO DEPENDEM DA PASTA DE ONDE O PROCESSO FOI INICIADO)
+PASTA_API = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ARQUIVO DO BANCO SQLITE
+CAMINHO_DB = os.environ.get("EASY_HEART_DB", os.path.join(PASTA_API, "dados_locais.db"))
+
+# PASTA COM OS FRAGMENTOS POR user_id (fragmentos.json + UM .db POR FRAGMENTO, VER fragmentos.py)
+# VAZIO = UM UNICO BANCO EM CAMINHO_DB
+FRAGMENTOS = os.environ.get("EASY_HEART_FRAGMENTOS", "")
+
+# PARTICOES MENSAIS ARQUIVADAS EM .npz (particoes.py): PASTA, MESES MANTIDOS NO
+# BANCO (0 = NAO ARQUIVA SOZINHO) E INTERVALO ENTRE AS VERIFICACOES
+PASTA_ARQUIVO = os.environ.get("EASY_HEART_PASTA_ARQUIVO", os.path.join(PASTA_API, "arquivo"))
+RETENCAO_MESES = int(os.environ.get("EASY_HEART_RETENCAO_MESES", "0"))
+ARQUIVAMENTO_INTERVALO_S = float(os.environ.get("EASY_HEART_ARQUIVAMENTO_INTERVALO_S", "3600"))
+
+# INFERENCIA EM LOTE
+LOTE_MAXIMO = int(os.environ.get("EASY_HEART_LOTE_MAXIMO", "32"))
+ESPERA_MAXIMA_MS = float(os.environ.get("EASY_HEART_ESPERA_MAXIMA_MS", "5"))
+# QUANTO UMA REQUISICAO ESPERA PELO MODELO OU PELO COMMIT DA INGESTAO ANTES DE RESPONDER 503
+ESPERA_RESULTADO_S = float(os.environ.get("EASY_HEART_ESPERA_RESULTADO_S", "10"))
+
+# BACKEND DO MODELO: "keras" (TensorFlow) OU "numpy" (pesos exportados por exportar_pesos.py)
+BACKEND_MODELO = os.environ.get("EASY_HEART_BACKEND", "keras")
+CAMINHO_PESOS = os.environ.get("EASY_HEART_PESOS", os.path.join(PASTA_API, "PESO.weights.h5"))
+CAMINHO_PESOS_NUMPY = os.environ.get("EASY_HEART_PESOS_NUMPY", os.path.join(PASTA_API, "PESO.npz"))
+
+# REGISTRO DE VERSOES DO MODELO (registro_modelos.py); VAZIO = USA O ARQUIVO FIXO ACIMA
+REGISTRO_MODELOS = os.environ.get("EASY_HEART_REGISTRO_MODELOS", "")
+REGISTRO_INTERVALO_S = float(os.environ.get("EASY_HEART_REGISTRO_INTERVALO_S", "2"))
+
+# FRACAO DAS JANELAS REAVALIADAS PELO MODELO CANDIDATO (EM SOMBRA) E TAMANHO DA FILA
+SOMBRA_FRACAO = float(os.environ.get("EASY_HEART_SOMBRA_FRACAO", "0.1"))
+SOMBRA_FILA = int(os.environ.get("EASY_HEART_SOMBRA_FILA", "64"))
+
+# MAPEIA O .npz EM MEMORIA (mmap) EM VEZ DE COPIAR OS PESOS PARA CADA WORKER
+PESOS_MMAP = os.environ.get("EASY_HEART_PESOS_MMAP", "1") == "1"
+
+# MODO DE PRODUCAO (python main.py --producao): NUMERO DE PROCESSOS DO UVICORN
+WORKERS = int(os.environ.get("EASY_HEART_WORKERS", str(os.cpu_count() or 1)))
+
+# PROCESSOS QUE ATENDEM A API AO MESMO TEMPO (main.py --producao PREENCHE COM --workers;
+# DEFINA A MAO SE SUBIR COM `uvicorn main:app --workers N`). COM MAIS DE UM, CADA PROCESSO
+# SO VE OS COMMITS DO PROPRIO ESCRITOR: O CACHE DE RECENTES E CONFERIDO NO BANCO E O HUB
+# DE EVENTOS PASSA A LER OS ids NOVOS DO BANCO
+PROCESSOS = int(os.environ.get("EASY_HEART_PROCESSOS", "1"))
+
+# INGESTAO EM SEGUNDO PLANO (GROUP COMMIT)
+# ACK_INGESTAO = "sync": /analisar so responde depois do commit do lote
+# ACK_INGESTAO = "async": /analisar responde assim que a linha entra na fila
+ACK_INGESTAO = os.environ.get("EASY_HEART_ACK_INGESTAO", "async")
+INGESTAO_LOTE_MAXIMO = int(os.environ.get("EASY_HEART_INGESTAO_LOTE_MAXIMO", "256"))
+INGESTAO_INTERVALO_MS = float(os.environ.get("EASY_HEART_INGESTAO_INTERVALO_MS", "50"))
+
+# FORMATO DE GRAVACAO DA COLUNA `bat`: "f32", "f16", "delta" OU "json" (LEGADO)
+FORMATO_BAT = os.environ.get("EASY_HEART_FORMATO_BAT", "f32")
+
+# CONEXOES SQLITE (armazenamento.py)
+POOL_LEITURA_MAXIMO = int(os.environ.get("EASY_HEART_POOL_LEITURA", "16"))
+SQLITE_MMAP_SIZE = int(os.environ.get("EASY_HEART_SQLITE_MMAP", str(256 * 1024 * 1024)))
+SQLITE_CACHE_KB = int(os.environ.get("EASY_HEART_SQLITE_CACHE_KB", str(16 * 1024)))
+
+# CACHE DOS REGISTROS MAIS RECENTES (cache_recentes.py)
+CACHE_RECENTES_GLOBAL = int(os.environ.get("EASY_HEART_CACHE_RECENTES_GLOBAL", "100"))
+CACHE_RECENTES_USUARIO = int(os.environ.get("EASY_HEART_CACHE_RECENTES_USUARIO", "5"))
+# PACIENTES COM FILA NO CACHE; ACIMA DISSO SAI O MENOS USADO (VOLTA A SER LIDO DO BANCO)
+CACHE_RECENTES_USUARIOS = int(os.environ.get("EASY_HEART_CACHE_RECENTES_USUARIOS", "10000"))
+
+# RECONSTRUCOES DO MODELO GUARDADAS EM MEMORIA (/reconstrucao) E MAXIMO DE ids POR PEDIDO
+CACHE_RECONSTRUCAO = int(os.environ.get("EASY_HEART_CACHE_RECONSTRUCAO", "1024"))
+RECONSTRUCAO_MAXIMO_IDS = int(os.environ.get("EASY_HEART_RECONSTRUCAO_MAXIMO_IDS", "100"))
+
+# MAXIMO DE JANELAS POR REQUISICAO EM /analisar_lote
+LOTE_MAXIMO_JANELAS = int(os.environ.get("EASY_HEART_LOTE_MAXIMO_JANELAS", "1024"))
+
+# PROFILER POR AMOSTRAGEM EM /metrics/profiler ("1" PARA HABILITAR)
+PROFILER_HABILITADO = os.environ.get("EASY_HEART_PROFILER", "0") == "1"
+
+# QUALIDADE DO SINAL ANTES DO MODELO (qualidade.py): "0" DESLIGA A VERIFICACAO
+QUALIDADE_HABILITADA = os.environ.get("EASY_HEART_QUALIDADE", "1") == "1"
+QUALIDADE_ADC_MAXIMO = float(os.environ.get("EASY_HEART_QUALIDADE_ADC_MAXIMO", "4095"))
+QUALIDADE_SATURACAO_MAXIMA = float(os.environ.get("EASY_HEART_QUALIDADE_SATURACAO_MAXIMA", "0.05"))
+QUALIDADE_REPETICAO_MAXIMA = float(os.environ.get("EASY_HEART_QUALIDADE_REPETICAO_MAXIMA", "0.9"))
+QUALIDADE_RUIDO_MAXIMO = float(os.environ.get("EASY_HEART_QUALIDADE_RUIDO_MAXIMO", "0.12"))
+QUALIDADE_DERIVA_MAXIMA = float(os.environ.get("EASY_HEART_QUALIDADE_DERIVA_MAXIMA", "0.3"))
+# MOTIVOS QUE DESCARTAM A JANELA (SEM INFERENCIA E SEM GRAVACAO); OS OUTROS SO MARCAM A RESPOSTA
+QUALIDADE_REJEITAR = tuple(
+    m for m in os.environ.get("EASY_HEART_QUALIDADE_REJEITAR", "linha_reta,saturacao,ruido").split(",") if m
+)
+
+# EVENTOS EM TEMPO REAL (notificacoes.py, /eventos E /ws/eventos): TAMANHO DA FILA DE CADA ASSINANTE,
+# POLITICA QUANDO ELA ENCHE ("descartar_antigos", "descartar_novos" OU "desconectar"),
+# MAXIMO DE ASSINANTES POR PROCESSO E INTERVALO DO KEEPALIVE
+NOTIFICACOES_FILA = int(os.environ.get("EASY_HEART_NOTIFICACOES_FILA", "64"))
+NOTIFICACOES_POLITICA = os.environ.get("EASY_HEART_NOTIFICACOES_POLITICA", "descartar_antigos")
+NOTIFICACOES_MAXIMO_ASSINANTES = int(os.environ.get("EASY_HEART_NOTIFICACOES_MAXIMO_ASSINANTES", "10000"))
+NOTIFICACOES_KEEPALIVE_S = float(os.environ.get("EASY_HEART_NOTIFICACOES_KEEPALIVE_S", "15"))
+# COM PROCESSOS > 1: INTERVALO ENTRE AS LEITURAS DOS ids NOVOS NO BANCO (ATRASO MAXIMO DOS EVENTOS)
+NOTIFICACOES_INTERVALO_MS = float(os.environ.get("EASY_HEART_NOTIFICACOES_INTERVALO_MS", "200"))
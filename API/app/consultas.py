@@ -0,0 +1,123 @@
+# CONSULTAS DE LEITURA EM dados_locais COM PAGINACAO POR CURSOR (after_id)
+#
+# As listas por periodo e de anormais sao ordenadas por (data_hora, id)
+# decrescente; a pagina seguinte comeca logo depois do `cursor`, o par
+# (data_hora, id) da linha `after_id` (resolvido antes, porque a linha pode
+# estar em outro fragmento ou ja arquivada). Isso usa os indices criados em
+# inicializar_db em vez de OFFSET.
+
+COLUNAS = "id, user_id, bat, spo2, press, status_local, diagnostico_ia, perda, data, hora"
+
+# MESMA CONDICAO DOS INDICES PARCIAIS idx_dados_anormais*
+CONDICAO_ANORMAL = "(diagnostico_ia = 'anormal' OR perda >= 0.5)"
+
+_APOS_CURSOR = "(data_hora, id) < (?, ?)"
+
+
+def _montar(condicoes, parametros, ordem, limite):
+    where = f"WHERE {' AND '.join(condicoes)} " if condicoes else ""
+    query = f"SELECT {COLUNAS} FROM dados_locais {where}ORDER BY {ordem} LIMIT ?"
+    return query, (*parametros, limite)
+
+
+def consulta_ultimos(limite, user_id=None, after_id=None):
+    condicoes, parametros = [], []
+    if user_id is not None:
+        condicoes.append("user_id = ?")
+        parametros.append(user_id)
+    if after_id is not None:
+        condicoes.append("id < ?")
+        parametros.append(after_id)
+    return _montar(condicoes, parametros, "id DESC", limite)
+
+
+# MAIOR id GRAVADO (NA VISAO GLOBAL OU DE UM PACIENTE); UMA BUSCA NO INDICE
+def consulta_maior_id(user_id=None):
+    if user_id is None:
+        return "SELECT MAX(id) FROM dados_locais", ()
+    return "SELECT MAX(id) FROM dados_locais WHERE user_id = ?", (user_id,)
+
+
+# LINHAS GRAVADAS DEPOIS DE apos_id, NA ORDEM DE id, NO FORMATO (id, valores da insercao) DO ESCRITOR
+# (SEM OS BATIMENTOS, QUE OS EVENTOS NAO USAM)
+def consulta_novos(apos_id, limite):
+    return (
+        "SELECT id, user_id, NULL, spo2, press, status_local, diagnostico_ia, perda, data, hora, data_hora "
+        "FROM dados_locais WHERE id > ? ORDER BY id LIMIT ?",
+        (apos_id, limite)
+    )
+
+
+# `excluir`: (condicao, parametros) EXTRA, COMO particoes.condicao_nao_arquivadas
+def consulta_por_data(data_inicio, data_fim, limite, user_id=None, cursor=None, excluir=None):
+    condicoes = ["data_hora >= ?", "data_hora < date(?, '+1 day')"]
+    parametros = [data_inicio, data_fim]
+    if excluir is not None:
+        condicoes.append(excluir[0])
+        parametros.extend(excluir[1])
+    if user_id is not None:
+        condicoes.append("user_id = ?")
+        parametros.append(user_id)
+    if cursor is not None:
+        condicoes.append(_APOS_CURSOR)
+        parametros.extend(cursor)
+    return _montar(condicoes, parametros, "data_hora DESC, id DESC", limite)
+
+
+def consulta_anormais(limite, user_id=None, cursor=None):
+    condicoes, parametros = [CONDICAO_ANORMAL], []
+    if user_id is not None:
+        condicoes.append("user_id = ?")
+        parametros.append(user_id)
+    if cursor is not None:
+        condicoes.append(_APOS_CURSOR)
+        parametros.extend(cursor)
+    return _montar(condicoes, parametros, "data_hora DESC, id DESC", limite)
+
+
+# CURSOR DA PROXIMA PAGINA (None QUANDO NAO HA MAIS LINHAS)
+def proximo_cursor(registros, limite):
+    return registros[-1]["id"] if len(registros) == limite else None
+
+
+def consulta_data_hora(registro_id):
+    return "SELECT data_hora FROM dados_locais WHERE id = ?", (registro_id,)
+
+
+# CAMPOS QUE PODEM SER PROJETADOS NA EXPORTACAO -> COLUNA NO BANCO
+CAMPOS_EXPORTACAO = {
+    "id": "id",
+    "user_id": "user_id",
+    "batimentos": "bat",
+    "spo2": "spo2",
+    "press": "press",
+    "status_local": "status_local",
+    "diagnostico_ia": "diagnostico_ia",
+    "perda": "perda",
+    "data": "data",
+    "hora": "hora",
+}
+
+
+# AS DUAS ULTIMAS COLUNAS (data_hora, id) SAO A CHAVE PARA JUNTAR OS FRAGMENTOS NA ORDEM
+def consulta_exportacao(campos, data_inicio, data_fim, user_id=None, excluir=None):
+    colunas = ", ".join([CAMPOS_EXPORTACAO[campo] for campo in campos] + ["data_hora", "id"])
+    condicoes = ["data_hora >= ?", "data_hora < date(?, '+1 day')"]
+    parametros = [data_inicio, data_fim]
+    if excluir is not None:
+        condicoes.append(excluir[0])
+        parametros.extend(excluir[1])
+    if user_id is not None:
+        condicoes.append("user_id = ?")
+        parametros.append(user_id)
+    query = (
+        f"SELECT {colunas} FROM dados_locais WHERE {' AND '.join(condicoes)} "
+        "ORDER BY data_hora DESC, id DESC"
+    )
+    return query, tuple(parametros)
+
+
+# BATIMENTOS DE VARIOS REGISTROS PELO id (USADO EM /reconstrucao)
+def consulta_batimentos(ids):
+    marcadores = ", ".join("?" * len(ids))
+    return f"SELECT id, bat FROM dados_locais WHERE id IN ({marcadores})", tuple(ids)
@@ -1,9 +1,39 @@
 import sqlite3
 
-db_path = "dados_locais.db"
+from config import FORMATO_BAT, CAMINHO_DB
+from resumos import criar_tabelas_resumo, reconstruir_resumos
+from particoes import criar_catalogo, travar_arquivo
 
-def inicializar_db():
-    with sqlite3.connect(db_path) as conn:
+db_path = CAMINHO_DB
+
+# VERSAO 1: `bat` EM TEXTO JSON
+# VERSAO 2: `bat` EM BLOB BINARIO (VER formato_bat.py), LINHAS ANTIGAS CONTINUAM EM JSON
+# VERSAO 3: COLUNA `data_hora` ORDENAVEL E INDICES PARA AS CONSULTAS PAGINADAS
+# VERSAO 4: TABELAS resumo_hora E resumo_dia (VER resumos.py)
+# VERSAO 5: CATALOGO particoes_arquivadas DOS MESES ARQUIVADOS EM .npz (VER particoes.py)
+VERSAO_ESQUEMA = 5
+
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_dados_data_hora ON dados_locais (data_hora, id)",
+    "CREATE INDEX IF NOT EXISTS idx_dados_user_data_hora ON dados_locais (user_id, data_hora, id)",
+    "CREATE INDEX IF NOT EXISTS idx_dados_user_id ON dados_locais (user_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_dados_diagnostico ON dados_locais (diagnostico_ia, perda)",
+    # INDICES PARCIAIS SO COM AS LINHAS ANORMAIS (MESMA CONDICAO DE consultas.CONDICAO_ANORMAL)
+    "CREATE INDEX IF NOT EXISTS idx_dados_anormais ON dados_locais (data_hora, id) "
+    "WHERE (diagnostico_ia = 'anormal' OR perda >= 0.5)",
+    "CREATE INDEX IF NOT EXISTS idx_dados_anormais_user ON dados_locais (user_id, data_hora, id) "
+    "WHERE (diagnostico_ia = 'anormal' OR perda >= 0.5)",
+]
+
+# OS WORKERS DO --producao SOBEM JUNTOS: A TRAVA AO LADO DO BANCO DEIXA SO UM MIGRAR POR VEZ
+# (OS PASSOS SAO IDEMPOTENTES, OS SEGUINTES NAO TEM O QUE FAZER)
+def inicializar_db(caminho=None):
+    caminho = caminho or db_path
+    with travar_arquivo(f"{caminho}.trava"):
+        _inicializar_db(caminho)
+
+def _inicializar_db(caminho):
+    with sqlite3.connect(caminho) as conn:
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS dados_locais (
@@ -16,7 +46,67 @@ def inicializar_db():
                 diagnostico_ia TEXT,
                 perda FLOAT,
                 data TEXT,
-                hora TEXT
+                hora TEXT,
+                data_hora TEXT
+            )
+        """)
+        migrar_data_hora(conn)
+        for indice in INDICES:
+            cursor.execute(indice)
+        migrar_resumos(conn)
+        criar_catalogo(conn)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS metadados (
+                chave TEXT PRIMARY KEY,
+                valor TEXT
             )
         """)
+        cursor.execute(
+            "INSERT OR REPLACE INTO metadados (chave, valor) VALUES ('versao_esquema', ?)",
+            (str(VERSAO_ESQUEMA),)
+        )
+        cursor.execute(
+            "INSERT OR REPLACE INTO metadados (chave, valor) VALUES ('formato_bat', ?)",
+            (FORMATO_BAT,)
+        )
         conn.commit()
+
+# BANCOS ANTIGOS NAO TEM `data_hora`: CRIA A COLUNA E PREENCHE A PARTIR DE data/hora EM BLOCOS
+def migrar_data_hora(conn, bloco=50000):
+    colunas = [c[1] for c in conn.execute("PRAGMA table_info(dados_locais)")]
+    if "data_hora" not in colunas:
+        conn.execute("ALTER TABLE dados_locais ADD COLUMN data_hora TEXT")
+        conn.commit()
+    elif not conn.execute("SELECT 1 FROM dados_locais WHERE data_hora IS NULL LIMIT 1").fetchone():
+        return
+
+    # FAIXAS DE ATE `bloco` LINHAS ANDANDO PELO INDICE DE id (COM FRAGMENTOS OS ids SAO ESPARSOS)
+    inicio = 0
+    while True:
+        linha = conn.execute(
+            "SELECT id FROM dados_locais WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?", (inicio, bloco - 1)
+        ).fetchone()
+        fim = linha[0] if linha else conn.execute("SELECT MAX(id) FROM dados_locais").fetchone()[0]
+        if fim is None or fim <= inicio:
+            return
+        conn.execute(
+            "UPDATE dados_locais SET data_hora = data || ' ' || hora "
+            "WHERE id > ? AND id <= ? AND data_hora IS NULL",
+            (inicio, fim)
+        )
+        conn.commit()
+        inicio = fim
+
+# BANCOS SEM RESUMOS (OU COM RESUMOS VAZIOS) SAO RESUMIDOS A PARTIR DE dados_locais
+def migrar_resumos(conn):
+    criar_tabelas_resumo(conn)
+    vazio = not conn.execute("SELECT 1 FROM resumo_dia LIMIT 1").fetchone()
+    if vazio and conn.execute("SELECT 1 FROM dados_locais LIMIT 1").fetchone():
+        reconstruir_resumos(conn)
+
+def ler_metadados(conn):
+    try:
+        return dict(conn.execute("SELECT chave, valor FROM metadados").fetchall())
+    except sqlite3.OperationalError:
+        # BANCO ANTERIOR A TABELA DE METADADOS
+        return {"versao_esquema": "1", "formato_bat": "json"}
@@ -0,0 +1,19 @@
+import tensorflow as tf
+
+# Modelo de IA
+class Detector(tf.keras.Model):
+    def __init__(self, camadas=(32, 16, 8), saida=141):
+        super(Detector, self).__init__()
+        self.encoder = tf.keras.Sequential([
+            tf.keras.layers.Dense(n, activation='relu') for n in camadas
+        ])
+        self.decoder = tf.keras.Sequential([
+            tf.keras.layers.Dense(n, activation='relu') for n in reversed(camadas[:-1])
+        ] + [
+            tf.keras.layers.Dense(saida, activation='sigmoid')
+        ])
+
+    def call(self, x):
+        encoded = self.encoder(x)
+        decoded = self.decoder(encoded)
+        return decoded
@@ -0,0 +1,93 @@
+import csv
+import heapq
+import io
+import json
+from itertools import islice
+
+from consultas import consulta_exportacao
+from formato_bat import decodificar_batimentos
+from particoes import meses_arquivados, condicao_nao_arquivadas
+
+# GERADORES QUE PERCORREM O CURSOR EM BLOCOS E PRODUZEM NDJSON OU CSV,
+# SEM MONTAR A LISTA COMPLETA DE REGISTROS EM MEMORIA. COM `arquivo`
+# (particoes.LeitorArquivo) AS LINHAS DOS MESES ARQUIVADOS SAO INTERCALADAS
+# COM AS DO BANCO. COM FRAGMENTOS, AS LINHAS DE CADA BANCO SAO INTERCALADAS POR (data_hora, id)
+
+
+# LINHAS QUE AINDA ESTAO NO BANCO (FORA DAS PARTICOES DE `meses`)
+def _linhas_sql(conn, campos, data_inicio, data_fim, user_id, bloco, meses, indice_bat):
+    query, parametros = consulta_exportacao(
+        campos, data_inicio, data_fim, user_id, condicao_nao_arquivadas(meses)
+    )
+    cursor = conn.execute(query, parametros)
+    while True:
+        registros = cursor.fetchmany(bloco)
+        if not registros:
+            break
+        if indice_bat is not None:
+            registros = [
+                r[:indice_bat] + (decodificar_batimentos(r[indice_bat]).tolist(),) + r[indice_bat + 1:]
+                for r in registros
+            ]
+        yield from registros
+
+
+# LINHAS DAS PARTICOES, NO MESMO FORMATO DAS DO BANCO
+def _linhas_arquivo(arquivo, conn, campos, data_inicio, data_fim, user_id, bloco, indice_bat):
+    for registros in arquivo.blocos(conn, campos + ["data", "hora", "id"], data_inicio, data_fim,
+                                    user_id, bloco):
+        for r in registros:
+            if indice_bat is not None:
+                r = r[:indice_bat] + (r[indice_bat].tolist(),) + r[indice_bat + 1:]
+            yield r[:-3] + (f"{r[-3]} {r[-2]}", r[-1])
+
+
+# LINHAS DE UM BANCO NA ORDEM (data_hora, id) DECRESCENTE, COM (data_hora, id) NO FINAL DE CADA TUPLA
+def _linhas_banco(banco, campos, data_inicio, data_fim, user_id, bloco, arquivo=None):
+    indice_bat = campos.index("batimentos") if "batimentos" in campos else None
+
+    # CONEXAO PROPRIA ENQUANTO O STREAMING DURAR (FECHADA NO FIM OU QUANDO O CLIENTE DESISTE)
+    with banco.leitura_dedicada() as conn:
+        meses = meses_arquivados(conn, data_inicio, data_fim) if arquivo is not None else {}
+        linhas = _linhas_sql(conn, campos, data_inicio, data_fim, user_id, bloco, meses, indice_bat)
+        if meses:
+            # UM MES ARQUIVADO PODE TER LINHAS ATRASADAS NO BANCO: AS DUAS FONTES SAO INTERCALADAS
+            linhas = heapq.merge(
+                linhas,
+                _linhas_arquivo(arquivo, conn, campos, data_inicio, data_fim, user_id, bloco, indice_bat),
+                key=lambda r: r[-2:], reverse=True,
+            )
+        yield from linhas
+
+
+def _linhas(armazenamento, campos, data_inicio, data_fim, user_id, bloco, arquivo=None):
+    fontes = [
+        _linhas_banco(armazenamento.bancos[nome], campos, data_inicio, data_fim, user_id, bloco, arquivo)
+        for nome in armazenamento.selecionar(user_id)
+    ]
+    linhas = fontes[0] if len(fontes) == 1 else heapq.merge(*fontes, key=lambda r: r[-2:], reverse=True)
+    while True:
+        registros = list(islice(linhas, bloco))
+        if not registros:
+            break
+        yield [r[:-2] for r in registros]
+
+
+def gerar_ndjson(armazenamento, campos, data_inicio, data_fim, user_id=None, bloco=500, arquivo=None):
+    for registros in _linhas(armazenamento, campos, data_inicio, data_fim, user_id, bloco, arquivo):
+        yield "".join(json.dumps(dict(zip(campos, r))) + "\n" for r in registros)
+
+
+def gerar_csv(armazenamento, campos, data_inicio, data_fim, user_id=None, bloco=500, arquivo=None):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(campos)
+    for registros in _linhas(armazenamento, campos, data_inicio, data_fim, user_id, bloco, arquivo):
+        for r in registros:
+            # A LISTA DE BATIMENTOS VAI EM UMA UNICA CELULA COMO ARRAY JSON
+            escritor.writerow([json.dumps(v) if isinstance(v, list) else v for v in r])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
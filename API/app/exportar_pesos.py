@@ -0,0 +1,99 @@
+import argparse
+import json
+import re
+
+import h5py
+import numpy as np
+
+from config import CAMINHO_PESOS, CAMINHO_PESOS_NUMPY
+
+# EXPORTA OS PESOS DO DETECTOR (.weights.h5 DO KERAS) PARA UM .npz DO NUMPY
+#
+# Uso (a partir da pasta API):
+#   python app/exportar_pesos.py --entrada PESO.weights.h5 --saida PESO.npz --verificar
+
+
+def _ordem(nome):
+    # "dense" -> 0, "dense_1" -> 1, ...
+    encontrado = re.search(r"_(\d+)$", nome)
+    return int(encontrado.group(1)) if encontrado else 0
+
+
+def ler_camadas_h5(caminho):
+    camadas = []
+    with h5py.File(caminho, "r") as arquivo:
+        for bloco in ("encoder", "decoder"):
+            grupo = arquivo[bloco]["layers"]
+            for nome in sorted(grupo.keys(), key=_ordem):
+                variaveis = grupo[nome]["vars"]
+                camadas.append((np.array(variaveis["0"], dtype=np.float32),
+                                np.array(variaveis["1"], dtype=np.float32)))
+    return camadas
+
+
+# GRAVA O .npz LIDO PELO BackendNumpy: kernel_i, bias_i E UM JSON `metadados`
+# (SEM COMPRESSAO, PARA QUE OS PESOS POSSAM SER MAPEADOS EM MEMORIA)
+# KERNELS float16/int8 (quantizar_pesos.py) MANTEM O TIPO; `arrays_extras` GUARDA AS ESCALAS
+def salvar_artefato(saida, camadas, origem, arrays_extras=None, **extras):
+    metadados = {
+        "num_camadas": len(camadas),
+        "dimensoes": [camadas[0][0].shape[0]] + [kernel.shape[1] for kernel, _ in camadas],
+        "ativacoes": ["relu"] * (len(camadas) - 1) + ["sigmoid"],
+        "origem": str(origem),
+        **extras,
+    }
+    arrays = {"metadados": np.array(json.dumps(metadados))}
+    for i, (kernel, bias) in enumerate(camadas):
+        kernel = np.asarray(kernel)
+        arrays[f"kernel_{i}"] = kernel if kernel.dtype in (np.float16, np.int8) else kernel.astype(np.float32)
+        arrays[f"bias_{i}"] = np.asarray(bias, dtype=np.float32)
+    arrays.update(arrays_extras or {})
+    np.savez(saida, **arrays)
+    return metadados
+
+
+def exportar(entrada, saida):
+    return salvar_artefato(saida, ler_camadas_h5(entrada), entrada)
+
+
+# COMPARA A SAIDA DO BACKEND NUMPY COM O MODELO KERAS CARREGADO DO MESMO .h5
+def verificar_paridade(entrada, saida, amostras=256, tolerancia=1e-5):
+    import tensorflow as tf
+    from detector import Detector
+    from backends import BackendNumpy
+
+    with np.load(saida) as arquivo:
+        dimensoes = json.loads(str(arquivo["metadados"]))["dimensoes"]
+    modelo = Detector(camadas=tuple(dimensoes[1:len(dimensoes) // 2 + 1]), saida=dimensoes[-1])
+    modelo(tf.zeros((1, dimensoes[0])))
+    modelo.load_weights(entrada)
+
+    backend = BackendNumpy(saida, tamanho_janela=dimensoes[0])
+
+    lote = np.random.default_rng(0).random((amostras, dimensoes[0]), dtype=np.float32)
+    esperado = modelo(tf.constant(lote)).numpy()
+    obtido = backend.reconstruir(lote)
+    diferenca = float(np.max(np.abs(esperado - obtido)))
+    perdas_keras = np.mean(np.abs(lote - esperado), axis=1)
+    diferenca_perda = float(np.max(np.abs(perdas_keras - backend.calcular_perdas(lote))))
+    return diferenca, diferenca_perda, max(diferenca, diferenca_perda) <= tolerancia
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta os pesos do Detector para NumPy")
+    parser.add_argument("--entrada", default=CAMINHO_PESOS)
+    parser.add_argument("--saida", default=CAMINHO_PESOS_NUMPY)
+    parser.add_argument("--verificar", action="store_true",
+                        help="compara a saída com o modelo Keras (requer TensorFlow)")
+    args = parser.parse_args()
+
+    metadados = exportar(args.entrada, args.saida)
+    print(f"Exportado {args.saida}: camadas {metadados['dimensoes']}")
+
+    if args.verificar:
+        diferenca, diferenca_perda, ok = verificar_paridade(args.entrada, args.saida)
+        print(f"Maior diferença na reconstrução: {diferenca:.3e}")
+        print(f"Maior diferença na perda: {diferenca_perda:.3e}")
+        if not ok:
+            raise SystemExit("Paridade com o Keras FALHOU")
+        print("Paridade com o Keras OK")
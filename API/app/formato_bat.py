@@ -0,0 +1,54 @@
+import json
+import zlib
+
+import numpy as np
+
+# FORMATOS DA COLUNA `bat`
+# Cada BLOB comeca com 1 byte indicando o formato; linhas antigas continuam
+# como texto JSON e sao reconhecidas pelo tipo (str).
+FORMATO_JSON = "json"
+FORMATO_F32 = "f32"
+FORMATO_F16 = "f16"
+FORMATO_DELTA = "delta"
+
+_PREFIXOS = {
+    FORMATO_F32: b"\x01",
+    FORMATO_F16: b"\x02",
+    FORMATO_DELTA: b"\x03",
+}
+_FORMATOS = {prefixo[0]: formato for formato, prefixo in _PREFIXOS.items()}
+
+# O FORMATO DELTA QUANTIZA [0, 1] EM 16 BITS, GUARDA AS DIFERENCAS E COMPRIME
+_ESCALA_DELTA = 65535.0
+
+
+def codificar_batimentos(batimentos, formato=FORMATO_F32):
+    valores = np.asarray(batimentos, dtype=np.float32).ravel()
+    if formato == FORMATO_JSON:
+        return json.dumps([float(x) for x in valores])
+    if formato == FORMATO_F32:
+        return _PREFIXOS[formato] + valores.astype("<f4").tobytes()
+    if formato == FORMATO_F16:
+        return _PREFIXOS[formato] + valores.astype("<f2").tobytes()
+    if formato == FORMATO_DELTA:
+        quantizado = np.rint(np.clip(valores, 0, 1) * _ESCALA_DELTA).astype(np.uint16)
+        deltas = np.diff(quantizado, prepend=np.uint16(0)).astype("<u2")
+        return _PREFIXOS[formato] + zlib.compress(deltas.tobytes())
+    raise ValueError(f"Formato de batimentos desconhecido: {formato}")
+
+
+def decodificar_batimentos(valor):
+    if isinstance(valor, str):
+        return np.asarray(json.loads(valor), dtype=np.float32)
+
+    dados = memoryview(valor)
+    formato = _FORMATOS.get(dados[0])
+    if formato == FORMATO_F32:
+        return np.frombuffer(dados, dtype="<f4", offset=1)
+    if formato == FORMATO_F16:
+        return np.frombuffer(dados, dtype="<f2", offset=1).astype(np.float32)
+    if formato == FORMATO_DELTA:
+        deltas = np.frombuffer(zlib.decompress(dados[1:]), dtype="<u2")
+        return np.cumsum(deltas, dtype=np.uint16).astype(np.float32) / np.float32(_ESCALA_DELTA)
+    raise ValueError(f"Prefixo de formato desconhecido: {dados[0]}")
+
@@ -0,0 +1,449 @@
+import argparse
+import bisect
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import sqlite3
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from armazenamento import Armazenamento
+from config import CAMINHO_DB, FRAGMENTOS, PASTA_ARQUIVO
+from database import inicializar_db
+from ingestao import EscritorIngestao
+from particoes import mover_arquivados
+from resumos import copiar_resumos, resumos_faltando, apagar_resumos
+
+# FRAGMENTACAO DE dados_locais POR user_id EM VARIOS ARQUIVOS SQLITE
+#
+# Cada paciente pertence a um fragmento, escolhido por hashing consistente
+# (anel com `vnodes` pontos por fragmento). Cada fragmento e um banco completo
+# (dados_locais, resumos, catalogo de particoes) com o seu proprio pool de
+# leitura e o seu proprio escritor: um dispositivo muito ativo so segura a
+# trava de escrita do arquivo dele, e a leitura de um paciente so toca o
+# fragmento dele. Consultas sem user_id leem todos os fragmentos em paralelo
+# e juntam os resultados na ordem da consulta.
+#
+# Os ids continuam unicos entre fragmentos: (sequencia << 6) | slot, com a
+# sequencia partindo do relogio em ms (ids novos ficam maiores que os antigos
+# e abaixo de 2**53). O mapa fica em <pasta>/fragmentos.json e os bancos em
+# <pasta>/<nome>.db; as particoes arquivadas de cada um em PASTA_ARQUIVO/<nome>.
+#
+# Adicionar fragmentos ou rebalancear e feito com a API parada. Se o processo
+# cair no meio, rodar `rebalancear` de novo termina o que faltou (ver
+# mover_usuarios). Os scripts
+# que recebem --db (repontuar.py, particoes.py, reconstruir_resumos.py)
+# rodam em cada <nome>.db separadamente.
+#
+# Uso (a partir da pasta API):
+#   python app/fragmentos.py --pasta fragmentos iniciar --fragmentos 4 --origem dados_locais.db
+#   python app/fragmentos.py --pasta fragmentos adicionar --quantidade 2
+#   python app/fragmentos.py --pasta fragmentos rebalancear --vacuum
+#   python app/fragmentos.py --pasta fragmentos listar
+# Depois: EASY_HEART_FRAGMENTOS=fragmentos python app/main.py
+
+ARQUIVO_MAPA = "fragmentos.json"
+VNODES = 64
+
+# O SLOT DO FRAGMENTO OCUPA OS BITS BAIXOS DO id (ATE 64 FRAGMENTOS)
+BITS_FRAGMENTO = 6
+MAXIMO_FRAGMENTOS = 1 << BITS_FRAGMENTO
+
+_COLUNAS = "id, user_id, bat, spo2, press, status_local, diagnostico_ia, perda, data, hora, data_hora"
+
+
+# RESERVA `n` ids PARA O FRAGMENTO `slot` (CHAMAR DENTRO DA TRANSACAO DO INSERT, COM A ESCRITA TRAVADA)
+def gerar_ids(conn, n, slot):
+    linha = conn.execute("SELECT valor FROM metadados WHERE chave = 'ultima_sequencia'").fetchone()
+    sequencia = max(int(linha[0]) + 1 if linha else 0, time.time_ns() // 1_000_000 * 16)
+    conn.execute(
+        "INSERT OR REPLACE INTO metadados (chave, valor) VALUES ('ultima_sequencia', ?)",
+        (str(sequencia + n - 1),)
+    )
+    return [(sequencia + i) << BITS_FRAGMENTO | slot for i in range(n)]
+
+
+def _hash(chave):
+    return int.from_bytes(hashlib.md5(str(chave).encode()).digest()[:8], "big")
+
+
+# ANEL DE HASHING CONSISTENTE: AO ADICIONAR UM FRAGMENTO SO ~1/N DOS PACIENTES MUDAM DE LUGAR
+class AnelConsistente:
+    def __init__(self, nomes, vnodes=VNODES):
+        pontos = sorted((_hash(f"{nome}#{i}"), nome) for nome in nomes for i in range(vnodes))
+        self._chaves = [ponto for ponto, _ in pontos]
+        self._nomes = [nome for _, nome in pontos]
+
+    def fragmento(self, user_id):
+        return self._nomes[bisect.bisect(self._chaves, _hash(user_id)) % len(self._chaves)]
+
+
+def ler_mapa(pasta):
+    with open(os.path.join(pasta, ARQUIVO_MAPA), encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def gravar_mapa(pasta, mapa):
+    caminho = os.path.join(pasta, ARQUIVO_MAPA)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as arquivo:
+        json.dump(mapa, arquivo, indent=2)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def caminho_fragmento(pasta, nome):
+    return os.path.join(pasta, f"{nome}.db")
+
+
+# JUNTA LISTAS JA ORDENADAS DE FORMA DECRESCENTE POR `chave` E FICA COM AS `limite` PRIMEIRAS
+def juntar_ordenados(listas, chave, limite):
+    if len(listas) == 1:
+        return listas[0][:limite]
+    return list(islice(heapq.merge(*listas, key=chave, reverse=True), limite))
+
+
+# CONJUNTO DE BANCOS ATRAS DA API: UM Armazenamento POR FRAGMENTO
+class ArmazenamentoFragmentado:
+    """`bancos` guarda o Armazenamento de cada fragmento, `slots` o slot
+    usado nos ids (None = AUTOINCREMENT, so com um banco) e `pastas_arquivo`
+    a pasta das particoes arquivadas de cada um. Com um unico banco
+    (`unico`) tudo funciona como antes da fragmentacao."""
+
+    def __init__(self, fragmentos, vnodes=VNODES):
+        self.bancos = {nome: Armazenamento(caminho) for nome, caminho, _, _ in fragmentos}
+        self.slots = {nome: slot for nome, _, slot, _ in fragmentos}
+        self.pastas_arquivo = {nome: pasta for nome, _, _, pasta in fragmentos}
+        self.nomes = list(self.bancos)
+        self.anel = AnelConsistente(self.nomes, vnodes)
+        self._executor = ThreadPoolExecutor(4 * len(self.nomes), thread_name_prefix="leitura-fragmentos")
+
+    @classmethod
+    def unico(cls, caminho_db=CAMINHO_DB, pasta_arquivo=PASTA_ARQUIVO):
+        return cls([("principal", caminho_db, None, pasta_arquivo)])
+
+    @classmethod
+    def de_pasta(cls, pasta, pasta_arquivo=PASTA_ARQUIVO):
+        mapa = ler_mapa(pasta)
+        return cls([
+            (f["nome"], caminho_fragmento(pasta, f["nome"]), f["slot"], os.path.join(pasta_arquivo, f["nome"]))
+            for f in mapa["fragmentos"]
+        ], mapa.get("vnodes", VNODES))
+
+    def do_usuario(self, user_id):
+        return self.nomes[0] if len(self.nomes) == 1 else self.anel.fragmento(user_id)
+
+    # FRAGMENTOS QUE UMA CONSULTA PRECISA LER: O DO PACIENTE OU TODOS
+    def selecionar(self, user_id=None):
+        return [self.do_usuario(user_id)] if user_id is not None else self.nomes
+
+    # RODA funcao(conn) EM CADA FRAGMENTO SELECIONADO, EM PARALELO, E DEVOLVE OS RESULTADOS NA ORDEM DE `nomes`
+    def ler_em_paralelo(self, funcao, user_id=None):
+        def ler(nome):
+            with self.bancos[nome].leitura() as conn:
+                return funcao(conn)
+
+        nomes = self.selecionar(user_id)
+        if len(nomes) == 1:
+            return [ler(nomes[0])]
+        return list(self._executor.map(ler, nomes))
+
+    def inicializar(self):
+        for banco in self.bancos.values():
+            inicializar_db(banco.caminho_db)
+
+    def fechar(self):
+        for banco in self.bancos.values():
+            banco.fechar()
+
+
+def abrir_armazenamento(pasta=FRAGMENTOS, caminho_db=CAMINHO_DB):
+    return ArmazenamentoFragmentado.de_pasta(pasta) if pasta else ArmazenamentoFragmentado.unico(caminho_db)
+
+
+# UM EscritorIngestao POR FRAGMENTO; CADA LINHA VAI PARA O FRAGMENTO DO SEU user_id
+class EscritorFragmentado:
+    def __init__(self, armazenamento, tamanho_lote=256, intervalo_ms=50.0, ao_gravar=None):
+        self.armazenamento = armazenamento
+        self.escritores = {}
+        for nome, banco in armazenamento.bancos.items():
+            slot = armazenamento.slots[nome]
+            self.escritores[nome] = EscritorIngestao(
+                banco, tamanho_lote, intervalo_ms, ao_gravar,
+                gerador_ids=None if slot is None else partial(gerar_ids, slot=slot),
+                nome="escritor-ingestao" if len(armazenamento.bancos) == 1 else f"escritor-{nome}",
+            )
+
+    def iniciar(self):
+        for escritor in self.escritores.values():
+            escritor.iniciar()
+
+    def parar(self, timeout=10.0):
+        for escritor in self.escritores.values():
+            escritor.parar(timeout)
+
+    def _escritor(self, valores):
+        return self.escritores[self.armazenamento.do_usuario(valores[0])]
+
+    def enfileirar(self, valores):
+        return self._escritor(valores).enfileirar(valores)
+
+    # LINHAS DE VARIOS PACIENTES SAO SEPARADAS POR FRAGMENTO; O Future RESOLVE COM OS ids NA ORDEM ORIGINAL
+    def enfileirar_muitos(self, linhas):
+        grupos = {}
+        for posicao, valores in enumerate(linhas):
+            grupos.setdefault(self.armazenamento.do_usuario(valores[0]), []).append((posicao, valores))
+        if len(grupos) <= 1:
+            return self.escritores[next(iter(grupos), self.armazenamento.nomes[0])].enfileirar_muitos(linhas)
+
+        futuro = Future()
+        parciais = {
+            nome: self.escritores[nome].enfileirar_muitos([valores for _, valores in itens])
+            for nome, itens in grupos.items()
+        }
+
+        def concluir(_):
+            if futuro.done() or not all(p.done() for p in parciais.values()):
+                return
+            ids = [None] * len(linhas)
+            for nome, parcial in parciais.items():
+                if parcial.exception() is not None:
+                    futuro.set_exception(parcial.exception())
+                    return
+                for (posicao, _), id_ in zip(grupos[nome], parcial.result()):
+                    ids[posicao] = id_
+            futuro.set_result(ids)
+
+        for parcial in parciais.values():
+            parcial.add_done_callback(concluir)
+        return futuro
+
+    @property
+    def linhas_gravadas(self):
+        return sum(escritor.linhas_gravadas for escritor in self.escritores.values())
+
+    def tamanho_fila(self):
+        return sum(escritor.fila.qsize() for escritor in self.escritores.values())
+
+    def estatisticas(self):
+        if len(self.escritores) == 1:
+            return next(iter(self.escritores.values())).estatisticas()
+        por_fragmento = {nome: escritor.estatisticas() for nome, escritor in self.escritores.items()}
+        return {
+            "fila": sum(e["fila"] for e in por_fragmento.values()),
+            "linhas_gravadas": sum(e["linhas_gravadas"] for e in por_fragmento.values()),
+            "lotes_gravados": sum(e["lotes_gravados"] for e in por_fragmento.values()),
+            "falhas": sum(e["falhas"] for e in por_fragmento.values()),
+            "fragmentos": por_fragmento,
+        }
+
+
+# ---------------------------------------------------------------------------
+# MIGRACAO OFFLINE (API PARADA)
+# ---------------------------------------------------------------------------
+
+def _condicao_usuarios(usuarios):
+    valores = [u for u in usuarios if u is not None]
+    partes = [f"user_id IN ({', '.join('?' * len(valores))})"] if valores else []
+    if len(valores) < len(usuarios):
+        partes.append("user_id IS NULL")
+    return f"({' OR '.join(partes)})", tuple(valores)
+
+
+# PACIENTES COM LINHAS NO BANCO OU NAS PARTICOES ARQUIVADAS (OS RESUMOS COBREM AS DUAS)
+def usuarios_do_banco(conn):
+    return [u for u, in conn.execute("SELECT user_id FROM dados_locais UNION SELECT user_id FROM resumo_dia")]
+
+
+# MOVE TUDO DE `usuarios` (LINHAS, RESUMOS E PARTICOES ARQUIVADAS) DO FRAGMENTO `origem` PARA `destino`
+#
+# Em modo WAL uma transacao com ATTACH nao e atomica entre os dois arquivos, entao
+# cada etapa escreve em um arquivo so e todas podem ser repetidas:
+#   1. copia linhas e resumos para o destino (ids ja copiados sao ignorados,
+#      resumos sao substituidos)
+#   2. confere que tudo o que a origem tem desses pacientes esta no destino
+#   3. apaga da origem so as linhas que estao no destino
+#   4. particoes arquivadas (o destino e gravado antes da origem e ids repetidos
+#      sao descartados ao juntar)
+def mover_usuarios(pasta, origem, destino, usuarios, pasta_arquivo=PASTA_ARQUIVO):
+    condicao, parametros = _condicao_usuarios(usuarios)
+    conn = sqlite3.connect(caminho_fragmento(pasta, destino))
+    try:
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("ATTACH DATABASE ? AS origem", (caminho_fragmento(pasta, origem),))
+        # OS ids SAO MANTIDOS: SAO UNICOS ENTRE TODOS OS FRAGMENTOS
+        with conn:
+            conn.execute(
+                f"INSERT OR IGNORE INTO main.dados_locais ({_COLUNAS}) "
+                f"SELECT {_COLUNAS} FROM origem.dados_locais WHERE {condicao}",
+                parametros
+            )
+            copiar_resumos(conn, "origem", "main", condicao, parametros)
+
+        linhas, faltando = conn.execute(
+            f"SELECT COUNT(*), COUNT(*) - COALESCE(SUM(EXISTS "
+            f"(SELECT 1 FROM main.dados_locais AS c WHERE c.id = o.id)), 0) "
+            f"FROM origem.dados_locais AS o WHERE {condicao}",
+            parametros
+        ).fetchone()
+        faltando += resumos_faltando(conn, "origem", "main", condicao, parametros)
+        if faltando:
+            raise ValueError(
+                f"{origem} -> {destino}: {faltando} linhas/resumos não chegaram ao destino; "
+                "nada foi apagado da origem (rode rebalancear de novo)"
+            )
+
+        with conn:
+            conn.execute(
+                f"DELETE FROM origem.dados_locais WHERE {condicao} AND EXISTS "
+                f"(SELECT 1 FROM main.dados_locais AS c WHERE c.id = dados_locais.id)",
+                parametros
+            )
+            apagar_resumos(conn, "origem", condicao, parametros)
+        conn.execute("DETACH DATABASE origem")
+
+        conn_origem = sqlite3.connect(caminho_fragmento(pasta, origem))
+        try:
+            arquivadas = mover_arquivados(
+                conn_origem, os.path.join(pasta_arquivo, origem), conn, os.path.join(pasta_arquivo, destino),
+                [-1 if u is None else u for u in usuarios]
+            )
+        finally:
+            conn_origem.close()
+    finally:
+        conn.close()
+    return linhas, arquivadas
+
+
+# LEVA CADA PACIENTE PARA O FRAGMENTO QUE O ANEL ATUAL INDICA
+def rebalancear(pasta, pasta_arquivo=PASTA_ARQUIVO, progresso=None):
+    mapa = ler_mapa(pasta)
+    nomes = [f["nome"] for f in mapa["fragmentos"]]
+    anel = AnelConsistente(nomes, mapa.get("vnodes", VNODES))
+    resultado = {"usuarios": 0, "linhas": 0, "arquivadas": 0}
+    for origem in nomes:
+        with sqlite3.connect(caminho_fragmento(pasta, origem)) as conn:
+            usuarios = usuarios_do_banco(conn)
+        destinos = {}
+        for user_id in usuarios:
+            dono = anel.fragmento(user_id)
+            if dono != origem:
+                destinos.setdefault(dono, []).append(user_id)
+
+        for destino, lista in destinos.items():
+            # BLOCOS DE PACIENTES: CADA BLOCO E UMA TRANSACAO
+            for inicio in range(0, len(lista), 500):
+                bloco = lista[inicio:inicio + 500]
+                linhas, arquivadas = mover_usuarios(pasta, origem, destino, bloco, pasta_arquivo)
+                resultado["usuarios"] += len(bloco)
+                resultado["linhas"] += linhas
+                resultado["arquivadas"] += arquivadas
+                if progresso is not None:
+                    progresso(origem, destino, len(bloco), linhas, arquivadas)
+    return resultado
+
+
+def _novos_fragmentos(mapa, quantidade):
+    usados_nomes = {f["nome"] for f in mapa["fragmentos"]}
+    usados_slots = {f["slot"] for f in mapa["fragmentos"]}
+    livres = [slot for slot in range(MAXIMO_FRAGMENTOS) if slot not in usados_slots]
+    if len(livres) < quantidade:
+        raise ValueError(f"No máximo {MAXIMO_FRAGMENTOS} fragmentos")
+    novos = []
+    indice = 0
+    for slot in livres[:quantidade]:
+        while f"f{indice}" in usados_nomes:
+            indice += 1
+        usados_nomes.add(f"f{indice}")
+        novos.append({"nome": f"f{indice}", "slot": slot})
+    return novos
+
+
+# COPIA UM BANCO UNICO (E AS PARTICOES DELE) PARA O PRIMEIRO FRAGMENTO
+def _copiar_origem(origem, destino, pasta_arquivo_destino):
+    with sqlite3.connect(origem) as fonte, sqlite3.connect(destino) as copia:
+        fonte.backup(copia)
+    with sqlite3.connect(destino) as conn:
+        inicializar_db(destino)
+        for mes, caminho in conn.execute("SELECT mes, caminho FROM particoes_arquivadas").fetchall():
+            os.makedirs(pasta_arquivo_destino, exist_ok=True)
+            novo = os.path.abspath(os.path.join(pasta_arquivo_destino, f"{mes}.npz"))
+            shutil.copyfile(caminho, novo)
+            conn.execute("UPDATE particoes_arquivadas SET caminho = ? WHERE mes = ?", (novo, mes))
+
+
+def iniciar(pasta, quantidade, origem=None, pasta_arquivo=PASTA_ARQUIVO, vnodes=VNODES):
+    if os.path.exists(os.path.join(pasta, ARQUIVO_MAPA)):
+        raise ValueError(f"{pasta} já tem um {ARQUIVO_MAPA} (use adicionar ou rebalancear)")
+    os.makedirs(pasta, exist_ok=True)
+    mapa = {"vnodes": vnodes, "fragmentos": []}
+    mapa["fragmentos"] = _novos_fragmentos(mapa, quantidade)
+    for fragmento in mapa["fragmentos"]:
+        caminho = caminho_fragmento(pasta, fragmento["nome"])
+        if fragmento is mapa["fragmentos"][0] and origem is not None:
+            _copiar_origem(origem, caminho, os.path.join(pasta_arquivo, fragmento["nome"]))
+        else:
+            inicializar_db(caminho)
+    gravar_mapa(pasta, mapa)
+    return mapa
+
+
+def adicionar(pasta, quantidade):
+    mapa = ler_mapa(pasta)
+    novos = _novos_fragmentos(mapa, quantidade)
+    for fragmento in novos:
+        inicializar_db(caminho_fragmento(pasta, fragmento["nome"]))
+    mapa["fragmentos"] += novos
+    gravar_mapa(pasta, mapa)
+    return novos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cria, amplia e rebalanceia os fragmentos de dados_locais")
+    parser.add_argument("--pasta", default=FRAGMENTOS or "fragmentos", help="pasta com fragmentos.json")
+    parser.add_argument("--pasta-arquivo", default=PASTA_ARQUIVO, help="particoes arquivadas (uma subpasta por fragmento)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comando_iniciar = comandos.add_parser("iniciar")
+    comando_iniciar.add_argument("--fragmentos", type=int, required=True)
+    comando_iniciar.add_argument("--origem", default=None, help="banco único a dividir entre os fragmentos")
+    comando_iniciar.add_argument("--vnodes", type=int, default=VNODES)
+    comando_adicionar = comandos.add_parser("adicionar")
+    comando_adicionar.add_argument("--quantidade", type=int, default=1)
+    comandos.add_parser("rebalancear")
+    comandos.add_parser("listar")
+    for comando in (comando_iniciar, comando_adicionar, comandos.choices["rebalancear"]):
+        comando.add_argument("--vacuum", action="store_true", help="recupera o espaço liberado nos fragmentos")
+    args = parser.parse_args()
+
+    def progresso(origem, destino, usuarios, linhas, arquivadas):
+        print(f"  {origem} -> {destino}: {usuarios} pacientes, {linhas} linhas, {arquivadas} arquivadas")
+
+    try:
+        inicio = time.perf_counter()
+        if args.comando == "iniciar":
+            iniciar(args.pasta, args.fragmentos, args.origem, args.pasta_arquivo, args.vnodes)
+        elif args.comando == "adicionar":
+            novos = adicionar(args.pasta, args.quantidade)
+            print(f"Fragmentos novos: {', '.join(f['nome'] for f in novos)}")
+        if args.comando != "listar":
+            resultado = rebalancear(args.pasta, args.pasta_arquivo, progresso)
+            print(f"{resultado['usuarios']} pacientes movidos ({resultado['linhas']} linhas no banco, "
+                  f"{resultado['arquivadas']} arquivadas) em {time.perf_counter() - inicio:.2f}s")
+            if args.vacuum:
+                for fragmento in ler_mapa(args.pasta)["fragmentos"]:
+                    conn = sqlite3.connect(caminho_fragmento(args.pasta, fragmento["nome"]))
+                    conn.execute("VACUUM")
+                    conn.close()
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    for fragmento in ler_mapa(args.pasta)["fragmentos"]:
+        caminho = caminho_fragmento(args.pasta, fragmento["nome"])
+        with sqlite3.connect(caminho) as conn:
+            linhas = conn.execute("SELECT COUNT(*) FROM dados_locais").fetchone()[0]
+            usuarios = len(usuarios_do_banco(conn))
+            arquivadas = conn.execute("SELECT COALESCE(SUM(linhas), 0) FROM particoes_arquivadas").fetchone()[0]
+        print(f"{fragmento['nome']} (slot {fragmento['slot']}): {usuarios} pacientes, {linhas} linhas, "
+              f"{arquivadas} arquivadas, {os.path.getsize(caminho) / 2**20:.1f} MiB")
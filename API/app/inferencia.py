@@ -0,0 +1,111 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from metricas import Histograma
+
+
+class AgendadorParado(RuntimeError):
+    pass
+
+
+# AGENDADOR QUE AGRUPA JANELAS EM LOTES PARA O MODELO
+class AgendadorInferencia:
+    """Junta as janelas que chegam em lotes de ate `lote_maximo` itens,
+    esperando no maximo `espera_maxima_ms` pelo primeiro item do lote, e
+    chama `pontuar` uma unica vez por lote. `pontuar` recebe um array
+    (n, 141) e devolve a perda de cada linha."""
+
+    def __init__(self, pontuar, lote_maximo=32, espera_maxima_ms=5.0):
+        self.pontuar = pontuar
+        self.lote_maximo = max(1, int(lote_maximo))
+        self.espera_maxima = max(0.0, espera_maxima_ms) / 1000.0
+        self.fila = queue.Queue()
+        self.hist_lote = Histograma([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.hist_espera_ms = Histograma([0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250])
+        self._thread = None
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._laco, name="agendador-inferencia", daemon=True)
+            self._thread.start()
+
+    def parar(self, timeout=5.0):
+        self._parar.set()
+        self.fila.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # SEM A THREAD NINGUEM CONSOME A FILA: O Future FALHA NA HORA EM VEZ DE FICAR PENDURADO
+    def submeter(self, janela):
+        futuro = Future()
+        if self._thread is None or not self._thread.is_alive():
+            futuro.set_exception(AgendadorParado("Agendador de inferência parado"))
+            return futuro
+        self.fila.put((np.asarray(janela, dtype=np.float32), futuro, time.perf_counter()))
+        return futuro
+
+    def estatisticas(self):
+        return {
+            "lote_maximo": self.lote_maximo,
+            "espera_maxima_ms": self.espera_maxima * 1000.0,
+            "fila": self.fila.qsize(),
+            "tamanho_lote": self.hist_lote.resumo(),
+            "espera_fila_ms": self.hist_espera_ms.resumo(),
+        }
+
+    def _coletar_lote(self, primeiro):
+        lote = [primeiro]
+        prazo = primeiro[2] + self.espera_maxima
+        while len(lote) < self.lote_maximo:
+            restante = prazo - time.perf_counter()
+            try:
+                item = self.fila.get(timeout=restante) if restante > 0 else self.fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._parar.set()
+                break
+            lote.append(item)
+        return lote
+
+    def _processar(self, lote):
+        inicio = time.perf_counter()
+        for _, _, chegada in lote:
+            self.hist_espera_ms.observar((inicio - chegada) * 1000.0)
+        self.hist_lote.observar(len(lote))
+
+        try:
+            perdas = self.pontuar(np.stack([janela for janela, _, _ in lote]))
+        except Exception as e:
+            for _, futuro, _ in lote:
+                futuro.set_exception(e)
+            return
+
+        for (_, futuro, _), perda in zip(lote, perdas):
+            futuro.set_result(perda)
+
+    def _laco(self):
+        while not self._parar.is_set():
+            primeiro = self.fila.get()
+            if primeiro is None:
+                continue
+            self._processar(self._coletar_lote(primeiro))
+
+        # ESVAZIA A FILA ANTES DE ENCERRAR PARA NAO DEIXAR REQUISICOES PENDURADAS
+        pendentes = []
+        while True:
+            try:
+                item = self.fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                pendentes.append(item)
+        for i in range(0, len(pendentes), self.lote_maximo):
+            self._processar(pendentes[i:i + self.lote_maximo])
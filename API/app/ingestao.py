@@ -0,0 +1,161 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from metricas import Histograma
+from resumos import atualizar_resumos
+
+QUERY_INSERCAO = """
+    INSERT INTO dados_locais (
+        user_id, bat, spo2, press, status_local, diagnostico_ia, perda, data, hora, data_hora
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# COM FRAGMENTOS O id VEM DE fragmentos.gerar_ids (UNICO ENTRE TODOS OS ARQUIVOS)
+QUERY_INSERCAO_COM_ID = """
+    INSERT INTO dados_locais (
+        id, user_id, bat, spo2, press, status_local, diagnostico_ia, perda, data, hora, data_hora
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+# ESCRITOR EM SEGUNDO PLANO: ACUMULA LINHAS E GRAVA EM UMA UNICA TRANSACAO
+class EscritorIngestao:
+    """Recebe linhas de `dados_locais` numa fila em memoria e as grava com
+    `executemany` quando juntar `tamanho_lote` linhas ou quando passar
+    `intervalo_ms` desde a primeira linha pendente. `enfileirar` devolve um
+    Future resolvido com o id gravado apos o commit do lote em que a linha
+    entrou; `enfileirar_muitos` grava todas as linhas no mesmo lote e
+    resolve com a lista de ids. `ao_gravar`, se informado, recebe a lista de (id, valores) de
+    cada lote gravado. `gerador_ids(conn, n)`, se informado, escolhe os ids
+    dentro da transacao em vez do AUTOINCREMENT."""
+
+    def __init__(self, armazenamento, tamanho_lote=256, intervalo_ms=50.0, ao_gravar=None,
+                 gerador_ids=None, nome="escritor-ingestao"):
+        self.armazenamento = armazenamento
+        self.ao_gravar = ao_gravar
+        self.gerador_ids = gerador_ids
+        self.nome = nome
+        self.tamanho_lote = max(1, int(tamanho_lote))
+        self.intervalo = max(0.0, intervalo_ms) / 1000.0
+        self.fila = queue.Queue()
+        self.linhas_gravadas = 0
+        self.lotes_gravados = 0
+        self.falhas = 0
+        self.hist_flush_ms = Histograma([0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000])
+        self.hist_lote = Histograma([1, 2, 4, 8, 16, 32, 64, 128, 256, 512])
+        self._thread = None
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._laco, name=self.nome, daemon=True)
+            self._thread.start()
+
+    def parar(self, timeout=10.0):
+        self._parar.set()
+        self.fila.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def enfileirar(self, valores):
+        futuro = Future()
+        self.fila.put(([valores], futuro, time.perf_counter(), True))
+        return futuro
+
+    def enfileirar_muitos(self, linhas):
+        futuro = Future()
+        self.fila.put((list(linhas), futuro, time.perf_counter(), False))
+        return futuro
+
+    def estatisticas(self):
+        return {
+            "fila": self.fila.qsize(),
+            "linhas_gravadas": self.linhas_gravadas,
+            "lotes_gravados": self.lotes_gravados,
+            "falhas": self.falhas,
+            "tamanho_lote": self.hist_lote.resumo(),
+            "tempo_flush_ms": self.hist_flush_ms.resumo(),
+        }
+
+    def _coletar_lote(self, primeiro):
+        lote = [primeiro]
+        linhas = len(primeiro[0])
+        prazo = primeiro[2] + self.intervalo
+        while linhas < self.tamanho_lote:
+            restante = prazo - time.perf_counter()
+            try:
+                item = self.fila.get(timeout=restante) if restante > 0 else self.fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._parar.set()
+                break
+            lote.append(item)
+            linhas += len(item[0])
+        return lote
+
+    def _gravar(self, conn, lote):
+        linhas = [valores for itens, _, _, _ in lote for valores in itens]
+        inicio = time.perf_counter()
+        try:
+            with conn:
+                if self.gerador_ids is None:
+                    conn.executemany(QUERY_INSERCAO, linhas)
+                    # SO ESTA CONEXAO ESCREVE E O LOTE E UMA TRANSACAO: OS ids SAO CONSECUTIVOS
+                    ultimo_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                    ids = list(range(ultimo_id - len(linhas) + 1, ultimo_id + 1))
+                else:
+                    # A TRAVA DE ESCRITA VEM ANTES DE LER O ULTIMO id (OUTROS PROCESSOS PODEM GRAVAR NO MESMO ARQUIVO)
+                    conn.execute("BEGIN IMMEDIATE")
+                    ids = self.gerador_ids(conn, len(linhas))
+                    conn.executemany(QUERY_INSERCAO_COM_ID, [(id_,) + tuple(v) for id_, v in zip(ids, linhas)])
+                # OS RESUMOS POR HORA/DIA SAO ATUALIZADOS NA MESMA TRANSACAO
+                atualizar_resumos(conn, ids[0], ids[-1])
+        except sqlite3.Error as err:
+            self.falhas += len(linhas)
+            for _, futuro, _, _ in lote:
+                futuro.set_exception(err)
+            return
+
+        self.hist_flush_ms.observar((time.perf_counter() - inicio) * 1000.0)
+        self.hist_lote.observar(len(linhas))
+        self.linhas_gravadas += len(linhas)
+        self.lotes_gravados += 1
+
+        gravados = list(zip(ids, linhas))
+        if self.ao_gravar is not None:
+            try:
+                self.ao_gravar(gravados)
+            except Exception as e:
+                print(f"Erro no callback do escritor: {e}")
+
+        posicao = 0
+        for itens, futuro, _, unico in lote:
+            ids_itens = ids[posicao:posicao + len(itens)]
+            futuro.set_result(ids_itens[0] if unico else ids_itens)
+            posicao += len(itens)
+
+    def _laco(self):
+        conn = self.armazenamento.escrita()
+        while not self._parar.is_set():
+            primeiro = self.fila.get()
+            if primeiro is None:
+                continue
+            self._gravar(conn, self._coletar_lote(primeiro))
+
+        # DRENA O QUE SOBROU NA FILA ANTES DE ENCERRAR
+        pendentes = []
+        while True:
+            try:
+                item = self.fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                pendentes.append(item)
+        for i in range(0, len(pendentes), self.tamanho_lote):
+            self._gravar(conn, pendentes[i:i + self.tamanho_lote])
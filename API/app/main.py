@@ -1,8 +1,44 @@
-from fastapi import FastAPI
+import argparse
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from routes import endpoints
+from config import BACKEND_MODELO, WORKERS
 
-app = FastAPI()
+# AS CONEXOES DE /eventos NAO TERMINAM SOZINHAS: SEM LIMITE O UVICORN ESPERARIA POR ELAS PARA SEMPRE
+ESPERA_DESLIGAMENTO_S = 5
+
+
+# INICIALIZA O BANCO, SOBE AS THREADS E COMECA A CARREGAR O MODELO;
+# AO DESLIGAR, DRENA AS FILAS DE INFERENCIA E GRAVACAO
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    endpoints.armazenamento.inicializar()
+    endpoints.agendador.iniciar()
+    endpoints.agendador_reconstrucao.iniciar()
+    endpoints.escritor.iniciar()
+    endpoints.hub.iniciar()
+    endpoints.leitor_eventos.iniciar()
+    endpoints.sombra.iniciar()
+    endpoints.carregador.iniciar()
+    for arquivador in endpoints.arquivadores:
+        arquivador.iniciar()
+    yield
+    for arquivador in endpoints.arquivadores:
+        arquivador.parar()
+    endpoints.leitor_eventos.parar()
+    endpoints.hub.parar()
+    endpoints.carregador.parar()
+    endpoints.sombra.parar()
+    endpoints.agendador.parar()
+    endpoints.agendador_reconstrucao.parar()
+    endpoints.escritor.parar()
+    endpoints.armazenamento.fechar()
+
+
+app = FastAPI(lifespan=ciclo_de_vida)
 
 origins = [
     "http://192.168.0.6",
@@ -19,8 +55,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# MARCA O INICIO DA REQUISICAO E MEDE O TEMPO TOTAL POR ROTA
+@app.middleware("http")
+async def medir_requisicao(request: Request, call_next):
+    request.state.inicio = time.perf_counter()
+    resposta = await call_next(request)
+
+    # TEMPO ATE A PRIMEIRA REQUISICAO ATENDIDA (SONDAS DE /saude NAO CONTAM)
+    if resposta.status_code < 500 and not request.url.path.startswith("/saude"):
+        primeira = endpoints.metricas.marcar_primeira_requisicao()
+        if primeira is not None:
+            print(f"Primeira requisição atendida {primeira:.2f}s após o início do processo", flush=True)
+
+    rota = request.scope.get("route")
+    endpoints.metricas.observar_rota(
+        rota.path if rota is not None else "desconhecida",
+        request.method,
+        time.perf_counter() - request.state.inicio,
+    )
+    return resposta
+
+
 app.include_router(endpoints.router)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+
+    parser = argparse.ArgumentParser(description="Servidor da API Easy Heart")
+    parser.add_argument("--producao", action="store_true",
+                        help="vários processos e sem reload (padrão: desenvolvimento com reload)")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--porta", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.producao:
+        # MIGRACOES UMA VEZ SO (EM CADA FRAGMENTO), ANTES DE SUBIR OS WORKERS
+        endpoints.armazenamento.inicializar()
+        # OS WORKERS HERDAM O AMBIENTE: config.PROCESSOS LIGA A CONFERENCIA DO CACHE E A LEITURA DOS EVENTOS NO BANCO
+        os.environ["EASY_HEART_PROCESSOS"] = str(args.workers)
+        if BACKEND_MODELO == "keras" and args.workers > 1:
+            print("Aviso: com o backend keras cada worker importa o TensorFlow; "
+                  "use EASY_HEART_BACKEND=numpy para compartilhar os pesos mapeados", flush=True)
+        uvicorn.run("main:app", host=args.host, port=args.porta, workers=args.workers,
+                    timeout_graceful_shutdown=ESPERA_DESLIGAMENTO_S)
+    else:
+        uvicorn.run("main:app", host=args.host, port=args.porta, reload=True,
+                    timeout_graceful_shutdown=ESPERA_DESLIGAMENTO_S)
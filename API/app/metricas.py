@@ -0,0 +1,253 @@
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+# HISTOGRAMA SIMPLES COM LIMITES FIXOS (CONTAGEM POR FAIXA)
+class Histograma:
+    def __init__(self, limites):
+        self.limites = list(limites)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+        self._trava = threading.Lock()
+
+    def observar(self, valor):
+        i = bisect.bisect_left(self.limites, valor)
+        with self._trava:
+            self.contagens[i] += 1
+            self.soma += valor
+            self.total += 1
+
+    def resumo(self):
+        with self._trava:
+            faixas = {f"<={limite:g}": c for limite, c in zip(self.limites, self.contagens)}
+            faixas[f">{self.limites[-1]:g}"] = self.contagens[-1]
+            return {
+                "faixas": faixas,
+                "total": self.total,
+                "media": self.soma / self.total if self.total else 0.0,
+            }
+
+    # LINHAS NO FORMATO TEXTO DO PROMETHEUS (BUCKETS ACUMULADOS)
+    def prometheus(self, nome, rotulos=None):
+        with self._trava:
+            contagens, soma, total = list(self.contagens), self.soma, self.total
+        base = ",".join(f'{k}="{v}"' for k, v in (rotulos or {}).items())
+        separador = "," if base else ""
+        linhas = []
+        acumulado = 0
+        for limite, c in zip(self.limites, contagens):
+            acumulado += c
+            linhas.append(f'{nome}_bucket{{{base}{separador}le="{limite:g}"}} {acumulado}')
+        linhas.append(f'{nome}_bucket{{{base}{separador}le="+Inf"}} {total}')
+        chaves = f"{{{base}}}" if base else ""
+        linhas.append(f"{nome}_sum{chaves} {soma}")
+        linhas.append(f"{nome}_count{chaves} {total}")
+        return linhas
+
+
+# MOMENTO (time.time) EM QUE O PROCESSO FOI CRIADO; FORA DO LINUX USA O IMPORT DESTE MODULO
+def inicio_processo():
+    try:
+        with open("/proc/self/stat") as arquivo:
+            campos = arquivo.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as arquivo:
+            ligado_ha = float(arquivo.read().split()[0])
+        return time.time() - ligado_ha + int(campos[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return _IMPORTADO_EM
+
+
+_IMPORTADO_EM = time.time()
+
+
+# MEMORIA DO PROCESSO: RSS E PSS (PSS DIVIDE AS PAGINAS COMPARTILHADAS, COMO OS PESOS MAPEADOS)
+def memoria_processo():
+    memoria = {"rss_bytes": None, "pss_bytes": None}
+    try:
+        with open("/proc/self/smaps_rollup") as arquivo:
+            for linha in arquivo:
+                chave, _, valor = linha.partition(":")
+                if chave in ("Rss", "Pss"):
+                    memoria[f"{chave.lower()}_bytes"] = int(valor.split()[0]) * 1024
+    except OSError:
+        import resource
+        memoria["rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return memoria
+
+
+LIMITES_SEGUNDOS = [0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+
+
+# TEMPOS POR ETAPA DO CAMINHO DE /analisar E CONTADORES DA API
+class Metricas:
+    def __init__(self):
+        self.etapas = {}
+        self.rotas = {}
+        self.diagnosticos = Counter()
+        self.qualidade = Counter()
+        self.inicio_processo = inicio_processo()
+        self.primeira_requisicao = None
+        self._trava = threading.Lock()
+
+    def _histograma(self, tabela, chave):
+        histograma = tabela.get(chave)
+        if histograma is None:
+            with self._trava:
+                histograma = tabela.setdefault(chave, Histograma(LIMITES_SEGUNDOS))
+        return histograma
+
+    def observar_etapa(self, etapa, segundos):
+        self._histograma(self.etapas, etapa).observar(segundos)
+
+    def observar_rota(self, rota, metodo, segundos):
+        self._histograma(self.rotas, (rota, metodo)).observar(segundos)
+
+    def contar_diagnostico(self, endpoint, diagnostico, quantidade=1):
+        with self._trava:
+            self.diagnosticos[(endpoint, diagnostico)] += quantidade
+
+    # acao: "rejeitada" (NAO FOI AVALIADA NEM GRAVADA) OU "marcada"
+    def contar_qualidade(self, endpoint, motivo, acao, quantidade=1):
+        with self._trava:
+            self.qualidade[(endpoint, motivo, acao)] += quantidade
+
+    # SEGUNDOS ENTRE O INICIO DO PROCESSO E A PRIMEIRA RESPOSTA; None SE JA HOUVE UMA ANTES
+    def marcar_primeira_requisicao(self):
+        with self._trava:
+            if self.primeira_requisicao is not None:
+                return None
+            self.primeira_requisicao = time.time() - self.inicio_processo
+            return self.primeira_requisicao
+
+    def prometheus(self):
+        linhas = [
+            "# HELP easy_heart_etapa_segundos Tempo de cada etapa do processamento de um batimento",
+            "# TYPE easy_heart_etapa_segundos histogram",
+        ]
+        for etapa, histograma in sorted(self.etapas.items()):
+            linhas += histograma.prometheus("easy_heart_etapa_segundos", {"etapa": etapa})
+
+        linhas += [
+            "# HELP easy_heart_requisicao_segundos Tempo total das requisicoes HTTP por rota",
+            "# TYPE easy_heart_requisicao_segundos histogram",
+        ]
+        for (rota, metodo), histograma in sorted(self.rotas.items()):
+            linhas += histograma.prometheus("easy_heart_requisicao_segundos", {"rota": rota, "metodo": metodo})
+
+        linhas += [
+            "# HELP easy_heart_diagnosticos_total Janelas avaliadas por diagnostico",
+            "# TYPE easy_heart_diagnosticos_total counter",
+        ]
+        with self._trava:
+            diagnosticos = sorted(self.diagnosticos.items())
+        for (endpoint, diagnostico), quantidade in diagnosticos:
+            linhas.append(
+                f'easy_heart_diagnosticos_total{{endpoint="{endpoint}",diagnostico="{diagnostico}"}} {quantidade}'
+            )
+
+        linhas += [
+            "# HELP easy_heart_qualidade_total Janelas com problema de qualidade do sinal",
+            "# TYPE easy_heart_qualidade_total counter",
+        ]
+        with self._trava:
+            qualidade = sorted(self.qualidade.items())
+        for (endpoint, motivo, acao), quantidade in qualidade:
+            linhas.append(
+                f'easy_heart_qualidade_total{{endpoint="{endpoint}",motivo="{motivo}",acao="{acao}"}} {quantidade}'
+            )
+        return linhas
+
+
+# CONTAGEM DE LINHAS E TAMANHO DO BANCO (COUNT(*) E CARO: GUARDA POR `validade` SEGUNDOS)
+class EstatisticasBanco:
+    def __init__(self, bancos, validade=30.0):
+        # UM Armazenamento POR FRAGMENTO (OU SO UM); OS VALORES SAO SOMADOS
+        self.bancos = bancos
+        self.validade = validade
+        self._linhas = None
+        self._lido_em = 0.0
+
+    def linhas(self):
+        if self._linhas is None or time.monotonic() - self._lido_em > self.validade:
+            total = 0
+            for banco in self.bancos:
+                with banco.leitura() as conn:
+                    total += conn.execute("SELECT COUNT(*) FROM dados_locais").fetchone()[0]
+            self._linhas = total
+            self._lido_em = time.monotonic()
+        return self._linhas
+
+    def bytes(self):
+        total = 0
+        for banco in self.bancos:
+            for sufixo in ("", "-wal", "-shm"):
+                caminho = banco.caminho_db + sufixo
+                if os.path.exists(caminho):
+                    total += os.path.getsize(caminho)
+        return total
+
+
+# PROFILER POR AMOSTRAGEM: COLETA AS PILHAS DE TODAS AS THREADS A CADA `intervalo_ms`
+class ProfilerAmostragem:
+    """Liga sob demanda por `segundos` e acumula pilhas no formato
+    "collapsed" (funcao;funcao;funcao contagem), que pode ser convertido
+    em flame graph. Nao precisa de dependencias externas."""
+
+    def __init__(self):
+        self.pilhas = Counter()
+        self.amostras = 0
+        self.inicio = None
+        self.fim = None
+        self.intervalo = 0.0
+        self._thread = None
+        self._trava = threading.Lock()
+
+    @property
+    def ativo(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self, segundos, intervalo_ms=5.0):
+        with self._trava:
+            if self.ativo:
+                return False
+            self.pilhas = Counter()
+            self.amostras = 0
+            self.intervalo = max(0.001, intervalo_ms / 1000.0)
+            self.inicio = time.time()
+            self.fim = self.inicio + segundos
+            self._thread = threading.Thread(target=self._laco, name="profiler-amostragem", daemon=True)
+            self._thread.start()
+            return True
+
+    def _laco(self):
+        proprio = threading.get_ident()
+        while time.time() < self.fim:
+            for ident, quadro in sys._current_frames().items():
+                if ident == proprio:
+                    continue
+                pilha = []
+                while quadro is not None:
+                    codigo = quadro.f_code
+                    pilha.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                    quadro = quadro.f_back
+                self.pilhas[";".join(reversed(pilha))] += 1
+            self.amostras += 1
+            time.sleep(self.intervalo)
+
+    def relatorio(self, limite=50):
+        return {
+            "ativo": self.ativo,
+            "inicio": self.inicio,
+            "fim": self.fim,
+            "amostras": self.amostras,
+            "pilhas": [
+                {"pilha": pilha, "contagem": contagem}
+                for pilha, contagem in self.pilhas.most_common(limite)
+            ],
+        }
@@ -0,0 +1,80 @@
+import argparse
+import sqlite3
+import time
+
+from formato_bat import FORMATO_F32, FORMATO_F16, FORMATO_DELTA, FORMATO_JSON
+from formato_bat import codificar_batimentos, decodificar_batimentos
+from config import CAMINHO_DB
+from database import VERSAO_ESQUEMA, ler_metadados
+
+# CONVERTE A COLUNA `bat` DE UM BANCO EXISTENTE PARA OUTRO FORMATO, EM BLOCOS
+#
+# Uso (a partir da pasta API):
+#   python app/migrar_bat.py --db dados_locais.db --formato f32 --bloco 5000
+
+
+def migrar(caminho_db, formato, bloco=5000, vacuum=False):
+    convertidas = 0
+    inicio = time.perf_counter()
+    with sqlite3.connect(caminho_db) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS metadados (
+                chave TEXT PRIMARY KEY,
+                valor TEXT
+            )
+        """)
+        ultimo_id = 0
+        while True:
+            linhas = conn.execute(
+                "SELECT id, bat FROM dados_locais WHERE id > ? ORDER BY id LIMIT ?",
+                (ultimo_id, bloco)
+            ).fetchall()
+            if not linhas:
+                break
+            ultimo_id = linhas[-1][0]
+
+            novos = []
+            for id_, bat in linhas:
+                if bat is None:
+                    continue
+                novo = codificar_batimentos(decodificar_batimentos(bat), formato)
+                if novo != bat:
+                    novos.append((novo, id_))
+
+            # UMA TRANSACAO POR BLOCO PARA NAO SEGURAR O LOCK POR MUITO TEMPO
+            with conn:
+                conn.executemany("UPDATE dados_locais SET bat = ? WHERE id = ?", novos)
+            convertidas += len(novos)
+            print(f"  ate id {ultimo_id}: {convertidas} linhas convertidas")
+
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO metadados (chave, valor) VALUES ('versao_esquema', ?)",
+                (str(VERSAO_ESQUEMA),)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO metadados (chave, valor) VALUES ('formato_bat', ?)",
+                (formato,)
+            )
+
+    if vacuum:
+        conn = sqlite3.connect(caminho_db)
+        conn.execute("VACUUM")
+        conn.close()
+
+    return convertidas, time.perf_counter() - inicio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra a coluna bat para o formato binário")
+    parser.add_argument("--db", default=CAMINHO_DB)
+    parser.add_argument("--formato", default=FORMATO_F32,
+                        choices=[FORMATO_F32, FORMATO_F16, FORMATO_DELTA, FORMATO_JSON])
+    parser.add_argument("--bloco", type=int, default=5000)
+    parser.add_argument("--vacuum", action="store_true", help="recupera o espaço liberado ao final")
+    args = parser.parse_args()
+
+    with sqlite3.connect(args.db) as conn:
+        print(f"Metadados atuais: {ler_metadados(conn)}")
+    convertidas, duracao = migrar(args.db, args.formato, args.bloco, args.vacuum)
+    print(f"{convertidas} linhas convertidas para '{args.formato}' em {duracao:.2f}s")
@@ -1,6 +1,7 @@
 from typing import Optional
+from datetime import datetime
 from pydantic import BaseModel
-import tensorflow as tf
+import numpy as np
 
 # Modelo Pydantic
 class DadosECG(BaseModel):
@@ -16,22 +17,37 @@ class DadosECG(BaseModel):
         if len(self.batimentos) != 141:
             raise ValueError("A lista de batimentos deve conter exatamente 141 valores.")
 
-# Modelo de IA
-class Detector(tf.keras.Model):
-    def __init__(self):
-        super(Detector, self).__init__()
-        self.encoder = tf.keras.Sequential([
-            tf.keras.layers.Dense(32, activation='relu'),
-            tf.keras.layers.Dense(16, activation='relu'),
-            tf.keras.layers.Dense(8, activation='relu')
-        ])
-        self.decoder = tf.keras.Sequential([
-            tf.keras.layers.Dense(16, activation='relu'),
-            tf.keras.layers.Dense(32, activation='relu'),
-            tf.keras.layers.Dense(141, activation='sigmoid')
-        ])
 
-    def call(self, x):
-        encoded = self.encoder(x)
-        decoded = self.decoder(encoded)
-        return decoded
+# Lote de janelas de um mesmo dispositivo
+class LoteECG(BaseModel):
+    user_id: int
+    batimentos: list
+    timestamps: Optional[list] = None
+    spo2: Optional[float] = None
+    press: Optional[float] = None
+    status_local: str
+
+    # Valida o lote inteiro como um array 2-D (n janelas x 141)
+    def validar_batimentos(self, maximo_janelas):
+        try:
+            janelas = np.asarray(self.batimentos, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError("Os batimentos devem ser uma lista de janelas numéricas do mesmo tamanho.")
+        if janelas.ndim != 2 or janelas.shape[0] == 0:
+            raise ValueError("Os batimentos devem ser uma lista não vazia de janelas.")
+        if janelas.shape[1] != 141:
+            raise ValueError("Cada janela deve conter exatamente 141 valores.")
+        if janelas.shape[0] > maximo_janelas:
+            raise ValueError(f"O lote pode conter no máximo {maximo_janelas} janelas.")
+        return janelas
+
+    def validar_timestamps(self, quantidade):
+        if self.timestamps is None:
+            agora = datetime.now()
+            return [agora] * quantidade
+        if len(self.timestamps) != quantidade:
+            raise ValueError("Deve haver um timestamp para cada janela.")
+        try:
+            return [datetime.fromisoformat(str(t)) for t in self.timestamps]
+        except ValueError:
+            raise ValueError("Timestamps devem estar no formato ISO (AAAA-MM-DDTHH:MM:SS).")
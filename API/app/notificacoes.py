@@ -0,0 +1,266 @@
+import asyncio
+import sqlite3
+import threading
+
+from config import NOTIFICACOES_FILA, NOTIFICACOES_POLITICA, NOTIFICACOES_MAXIMO_ASSINANTES
+from config import NOTIFICACOES_INTERVALO_MS
+from consultas import consulta_maior_id, consulta_novos
+
+# PUBLICACAO DOS RESULTADOS GRAVADOS PARA OS CLIENTES INSCRITOS (/eventos E /ws/eventos)
+#
+# O escritor chama `publicar` (de sua propria thread) depois de cada commit;
+# o lote inteiro vai para o loop do asyncio em uma unica call_soon_threadsafe e
+# e distribuido la, sem trava. Cada assinante tem uma fila limitada; quando ela
+# enche a politica decide o que fazer:
+#   descartar_antigos: tira o evento mais antigo da fila e guarda o novo
+#   descartar_novos:   ignora o evento novo
+#   desconectar:       encerra a assinatura (o cliente reconecta e refaz a consulta)
+# Nos dois primeiros casos o cliente recebe um evento "descartados" antes do
+# proximo resultado, com quantos foram perdidos.
+#
+# Assinantes ociosos nao custam nada na publicacao: cada registro so visita os
+# assinantes do seu user_id e, se for anomalia, os inscritos em todas as anomalias.
+#
+# Com varios processos (--producao --workers N) o escritor de um worker nao
+# alcanca os assinantes dos outros. Nesse caso quem publica e o LeitorEventosBanco
+# de cada worker, que busca no banco os ids gravados por qualquer processo.
+
+POLITICAS = ("descartar_antigos", "descartar_novos", "desconectar")
+
+# MARCA DE FIM DA ASSINATURA DENTRO DA FILA
+FIM = object()
+
+
+# MESMA REGRA DE CONDICAO_ANORMAL (consultas.py)
+def eh_anomalia(diagnostico_ia, perda):
+    return diagnostico_ia == "anormal" or (perda is not None and perda >= 0.5)
+
+
+class Assinatura:
+    def __init__(self, user_id, so_anomalias, tamanho_fila):
+        self.user_id = user_id
+        self.so_anomalias = so_anomalias
+        self.fila = asyncio.Queue(tamanho_fila)
+        self.descartados = 0
+        self.nao_avisados = 0
+        self.encerrada = False
+        self._pendente = None
+
+    # PROXIMO EVENTO; None SE NADA CHEGOU EM `timeout` SEGUNDOS, FIM QUANDO A ASSINATURA TERMINA
+    async def proximo(self, timeout=None):
+        if self._pendente is not None:
+            evento, self._pendente = self._pendente, None
+            return evento
+        try:
+            evento = await asyncio.wait_for(self.fila.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        # O AVISO DE DESCARTE VEM ANTES DO PRIMEIRO EVENTO QUE SOBROU
+        if self.nao_avisados and evento is not FIM:
+            quantidade, self.nao_avisados = self.nao_avisados, 0
+            self._pendente = evento
+            return {"tipo": "descartados", "quantidade": quantidade}
+        return evento
+
+
+class HubNotificacoes:
+    def __init__(self, tamanho_fila=NOTIFICACOES_FILA, politica=NOTIFICACOES_POLITICA,
+                 maximo_assinantes=NOTIFICACOES_MAXIMO_ASSINANTES):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de descarte inválida: {politica} (use {', '.join(POLITICAS)})")
+        self.tamanho_fila = tamanho_fila
+        self.politica = politica
+        self.maximo_assinantes = maximo_assinantes
+        self._loop = None
+        # user_id -> ASSINATURAS; E AS INSCRITAS EM TODAS AS ANOMALIAS
+        self._por_usuario = {}
+        self._anomalias = set()
+        self.assinantes = 0
+
+        # CONTADORES (ALTERADOS SO NO LOOP, EXCETO publicados)
+        self._trava = threading.Lock()
+        self.publicados = 0
+        self.entregues = 0
+        self.descartados = 0
+        self.desconectados = 0
+
+    @property
+    def ativo(self):
+        return self._loop is not None
+
+    # CHAMADO NO STARTUP DO APP, DE DENTRO DO LOOP QUE ATENDE AS CONEXOES
+    def iniciar(self, loop=None):
+        self._loop = loop or asyncio.get_running_loop()
+
+    # ENCERRA TODAS AS ASSINATURAS (AS RESPOSTAS SSE/WS TERMINAM) E PARA DE PUBLICAR
+    def parar(self):
+        for assinatura in list(self._anomalias) + [a for s in self._por_usuario.values() for a in s]:
+            self._encerrar(assinatura)
+        self._loop = None
+
+    # CHAMADO NO LOOP
+    def assinar(self, user_id=None, so_anomalias=False):
+        if self.assinantes >= self.maximo_assinantes:
+            return None
+        assinatura = Assinatura(user_id, so_anomalias or user_id is None, self.tamanho_fila)
+        if user_id is None:
+            self._anomalias.add(assinatura)
+        else:
+            self._por_usuario.setdefault(user_id, set()).add(assinatura)
+        self.assinantes += 1
+        return assinatura
+
+    # CHAMADO NO LOOP; PODE SER CHAMADO MAIS DE UMA VEZ
+    def cancelar(self, assinatura):
+        if assinatura.user_id is None:
+            grupo = self._anomalias
+        else:
+            grupo = self._por_usuario.get(assinatura.user_id, ())
+        if assinatura in grupo:
+            grupo.discard(assinatura)
+            if assinatura.user_id is not None and not grupo:
+                del self._por_usuario[assinatura.user_id]
+            self.assinantes -= 1
+        self._encerrar(assinatura)
+
+    def _encerrar(self, assinatura):
+        if assinatura.encerrada:
+            return
+        assinatura.encerrada = True
+        # ABRE ESPACO PARA O FIM MESMO COM A FILA CHEIA
+        while assinatura.fila.full():
+            assinatura.fila.get_nowait()
+        assinatura.fila.put_nowait(FIM)
+
+    # CHAMADO PELO ESCRITOR (QUALQUER THREAD) COM [(id, valores da insercao)] DEPOIS DO COMMIT
+    def publicar(self, gravados):
+        loop = self._loop
+        if loop is None or not self.assinantes:
+            return
+        with self._trava:
+            self.publicados += len(gravados)
+        try:
+            loop.call_soon_threadsafe(self._distribuir, gravados)
+        except RuntimeError:
+            # LOOP JA FECHADO (DESLIGAMENTO)
+            pass
+
+    def _distribuir(self, gravados):
+        for id_, valores in gravados:
+            user_id, diagnostico_ia, perda = valores[0], valores[5], valores[6]
+            anomalia = eh_anomalia(diagnostico_ia, perda)
+            destinos = [a for a in self._por_usuario.get(user_id, ()) if anomalia or not a.so_anomalias]
+            if anomalia:
+                destinos += self._anomalias
+            if not destinos:
+                continue
+            evento = {
+                "tipo": "anomalia" if anomalia else "resultado",
+                "id": id_,
+                "user_id": user_id,
+                "spo2": valores[2],
+                "press": valores[3],
+                "status_local": valores[4],
+                "diagnostico_ia": diagnostico_ia,
+                "perda": perda,
+                "data": valores[7],
+                "hora": valores[8],
+            }
+            for assinatura in destinos:
+                self._entregar(assinatura, evento)
+
+    def _entregar(self, assinatura, evento):
+        if assinatura.encerrada:
+            return
+        fila = assinatura.fila
+        if not fila.full():
+            fila.put_nowait(evento)
+            self.entregues += 1
+            return
+
+        self.descartados += 1
+        if self.politica == "desconectar":
+            self.desconectados += 1
+            self.cancelar(assinatura)
+            return
+        assinatura.descartados += 1
+        assinatura.nao_avisados += 1
+        if self.politica == "descartar_antigos":
+            fila.get_nowait()
+            fila.put_nowait(evento)
+            self.entregues += 1
+
+    def estatisticas(self):
+        return {
+            "ativo": self.ativo,
+            "politica": self.politica,
+            "tamanho_fila": self.tamanho_fila,
+            "assinantes": self.assinantes,
+            "assinantes_anomalias": len(self._anomalias),
+            "usuarios_assinados": len(self._por_usuario),
+            "publicados": self.publicados,
+            "entregues": self.entregues,
+            "descartados": self.descartados,
+            "desconectados": self.desconectados,
+        }
+
+
+class LeitorEventosBanco:
+    """Thread que, a cada `intervalo_ms`, le de cada banco as linhas com id
+    maior que o ultimo visto e as publica no hub. Os ids crescem na ordem
+    dos commits em cada banco (AUTOINCREMENT ou fragmentos.gerar_ids dentro
+    da transacao), entao nenhuma linha e publicada duas vezes. Sem
+    assinantes so acompanha o maior id, sem ler as linhas."""
+
+    def __init__(self, hub, armazenamento, ativo=False, intervalo_ms=NOTIFICACOES_INTERVALO_MS, bloco=1000):
+        self.hub = hub
+        self.armazenamento = armazenamento
+        self.ativo = ativo
+        self.intervalo = intervalo_ms / 1000
+        self.bloco = bloco
+        self.erro = None
+        self._ultimos = {}
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        if self.ativo and self._thread is None:
+            self._ultimos = {nome: self._maior_id(banco) for nome, banco in self.armazenamento.bancos.items()}
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._laco, name="leitor-eventos", daemon=True)
+            self._thread.start()
+
+    def parar(self, timeout=5.0):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _maior_id(self, banco):
+        with banco.leitura() as conn:
+            return conn.execute(*consulta_maior_id()).fetchone()[0] or 0
+
+    def executar(self):
+        for nome, banco in self.armazenamento.bancos.items():
+            if not self.hub.assinantes:
+                self._ultimos[nome] = self._maior_id(banco)
+                continue
+            with banco.leitura() as conn:
+                while True:
+                    linhas = conn.execute(*consulta_novos(self._ultimos[nome], self.bloco)).fetchall()
+                    if not linhas:
+                        break
+                    self._ultimos[nome] = linhas[-1][0]
+                    self.hub.publicar([(linha[0], linha[1:]) for linha in linhas])
+                    if len(linhas) < self.bloco:
+                        break
+
+    def _laco(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.executar()
+                self.erro = None
+            except sqlite3.Error as e:
+                if self.erro != str(e):
+                    print(f"Erro ao ler eventos do banco: {e}", flush=True)
+                self.erro = str(e)
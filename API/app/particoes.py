@@ -0,0 +1,543 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from cache_recentes import CacheLRU, incrementar_geracao
+from config import CAMINHO_DB, PASTA_ARQUIVO, RETENCAO_MESES, ARQUIVAMENTO_INTERVALO_S
+from formato_bat import decodificar_batimentos
+
+try:
+    import fcntl
+except ImportError:  # WINDOWS: SEM TRAVA ENTRE PROCESSOS
+    fcntl = None
+
+# PARTICOES MENSAIS DE dados_locais
+#
+# O banco guarda os meses "quentes". Pela politica de retencao, cada mes mais
+# antigo que `RETENCAO_MESES` vira um arquivo colunar comprimido
+# (arquivo/AAAA-MM.npz) registrado em `particoes_arquivadas`, e as linhas
+# dele saem de dados_locais. Os resumos por hora/dia continuam no banco.
+#
+# Cada mes do catalogo guarda o maior id arquivado (ultimo_id) e ele decide
+# de onde cada linha e lida: no mes arquivado, id <= ultimo_id vem do .npz e
+# o resto vem do banco (`condicao_nao_arquivadas`). Assim nenhuma linha aparece
+# duas vezes nem some:
+#   - durante o DELETE em blocos, e se o processo cair entre gravar o .npz e
+#     apagar as linhas (o proximo arquivamento regrava o mes sem repetir ids);
+#   - com linhas atrasadas, que chegam com data_hora de um mes ja arquivado
+#     (continuam visiveis no banco ate o proximo arquivamento as levar);
+#   - com `arquivar --mes` de qualquer mes, nao so do mais antigo.
+#
+# Uso (a partir da pasta API):
+#   python app/particoes.py --db dados_locais.db listar
+#   python app/particoes.py --db dados_locais.db arquivar --retencao-meses 3
+#   python app/particoes.py --db dados_locais.db arquivar --mes 2024-01 --vacuum
+
+_COLUNAS_BANCO = "id, user_id, bat, spo2, press, status_local, diagnostico_ia, perda, data_hora"
+
+
+def criar_catalogo(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS particoes_arquivadas (
+            mes TEXT PRIMARY KEY,
+            caminho TEXT NOT NULL,
+            linhas INT NOT NULL,
+            primeiro_id INT,
+            ultimo_id INT,
+            arquivado_em TEXT
+        )
+    """)
+
+
+def proximo_mes(mes):
+    ano, numero = int(mes[:4]), int(mes[5:7])
+    return f"{ano + numero // 12:04d}-{numero % 12 + 1:02d}"
+
+
+# PRIMEIRO MES QUE AINDA FICA NO BANCO COM `retencao_meses` MESES (O ATUAL CONTA)
+def mes_de_corte(retencao_meses, hoje=None):
+    hoje = hoje or date.today()
+    indice = hoje.year * 12 + hoje.month - 1 - (retencao_meses - 1)
+    return f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+
+
+# MESES COM LINHAS NO BANCO ANTES DE `corte`, ANDANDO PELO INDICE DE data_hora
+def meses_no_banco(conn, corte):
+    meses, inicio = [], ""
+    while True:
+        linha = conn.execute(
+            "SELECT MIN(data_hora) FROM dados_locais WHERE data_hora >= ? AND data_hora < ?",
+            (inicio, corte)
+        ).fetchone()
+        if linha[0] is None:
+            return meses
+        meses.append(linha[0][:7])
+        inicio = proximo_mes(meses[-1])
+
+
+# {mes: ultimo_id} DOS MESES ARQUIVADOS (SO OS QUE TOCAM O PERIODO, SE INFORMADO)
+def meses_arquivados(conn, data_inicio=None, data_fim=None):
+    try:
+        if data_inicio is None:
+            return dict(conn.execute("SELECT mes, ultimo_id FROM particoes_arquivadas").fetchall())
+        return dict(conn.execute(
+            "SELECT mes, ultimo_id FROM particoes_arquivadas WHERE mes >= ? AND mes <= ?",
+            (data_inicio[:7], data_fim[:7])
+        ).fetchall())
+    except sqlite3.OperationalError:
+        return {}
+
+
+# (condicao, parametros) QUE DEIXA DE FORA DAS CONSULTAS AO BANCO AS LINHAS JA COBERTAS
+# PELAS PARTICOES; None SE NENHUM MES DO PERIODO FOI ARQUIVADO
+def condicao_nao_arquivadas(meses):
+    if not meses:
+        return None
+    partes, parametros = [], []
+    for mes, ultimo_id in sorted(meses.items()):
+        partes.append("(data_hora >= ? AND data_hora < ? AND id <= ?)")
+        parametros += [mes + "-01", proximo_mes(mes) + "-01", ultimo_id]
+    return f"NOT ({' OR '.join(partes)})", parametros
+
+
+def ler_colunas(caminho):
+    with np.load(caminho, allow_pickle=False) as arquivo:
+        return {nome: arquivo[nome] for nome in arquivo.files}
+
+
+# LINHAS DO BANCO -> COLUNAS; OS BATIMENTOS FICAM CONCATENADOS EM bat_valores COM bat_offsets
+def _para_colunas(linhas):
+    batimentos = [
+        decodificar_batimentos(r[2]) if r[2] is not None else np.empty(0, dtype=np.float32) for r in linhas
+    ]
+    offsets = np.zeros(len(linhas) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in batimentos], out=offsets[1:])
+
+    def numeros(indice):
+        return np.array([np.nan if r[indice] is None else r[indice] for r in linhas], dtype=np.float64)
+
+    return {
+        "id": np.array([r[0] for r in linhas], dtype=np.int64),
+        # user_id NULO VIRA -1
+        "user_id": np.array([-1 if r[1] is None else r[1] for r in linhas], dtype=np.int64),
+        "bat_valores": np.concatenate(batimentos).astype(np.float32) if batimentos else np.empty(0, np.float32),
+        "bat_offsets": offsets,
+        "spo2": numeros(3),
+        "press": numeros(4),
+        "status_local": np.array([r[5] or "" for r in linhas], dtype=str),
+        "diagnostico_ia": np.array([r[6] or "" for r in linhas], dtype=str),
+        "perda": numeros(7),
+        "data_hora": np.array([r[8] for r in linhas], dtype=str),
+    }
+
+
+# CONCATENA VARIAS PARTES NO FORMATO DE COLUNAS (DESLOCANDO OS bat_offsets DE CADA UMA)
+def _concatenar(partes):
+    deslocamentos = np.cumsum([0] + [parte["bat_offsets"][-1] for parte in partes[:-1]])
+    juntas = {
+        nome: np.concatenate([parte[nome] for parte in partes])
+        for nome in partes[0] if not nome.startswith("bat_")
+    }
+    juntas["bat_valores"] = np.concatenate([parte["bat_valores"] for parte in partes])
+    juntas["bat_offsets"] = np.concatenate(
+        [partes[0]["bat_offsets"][:1]]
+        + [parte["bat_offsets"][1:] + deslocamento for parte, deslocamento in zip(partes, deslocamentos)]
+    )
+    return juntas
+
+
+# JUNTA LINHAS NOVAS A UMA PARTICAO; UM id QUE JA ESTAVA NELA (ARQUIVAMENTO INTERROMPIDO
+# ANTES DO DELETE E REFEITO) FICA SO COM A VERSAO NOVA
+def _juntar(antigas, novas):
+    repetidas = np.isin(antigas["id"], novas["id"])
+    if repetidas.any():
+        antigas = _filtrar(antigas, ~repetidas)
+    return _concatenar([antigas, novas])
+
+
+# SUBCONJUNTO DAS COLUNAS DE UMA PARTICAO (mascara POR LINHA)
+def _filtrar(colunas, mascara):
+    offsets = colunas["bat_offsets"]
+    tamanhos = np.diff(offsets)[mascara]
+    filtradas = {nome: valores[mascara] for nome, valores in colunas.items() if not nome.startswith("bat_")}
+    # POSICAO EM bat_valores DE CADA AMOSTRA DAS LINHAS MANTIDAS
+    novos_offsets = np.concatenate([[0], np.cumsum(tamanhos)]).astype(np.int64)
+    posicoes = np.arange(novos_offsets[-1]) + np.repeat(offsets[:-1][mascara] - novos_offsets[:-1], tamanhos)
+    filtradas["bat_valores"] = colunas["bat_valores"][posicoes]
+    filtradas["bat_offsets"] = novos_offsets
+    return filtradas
+
+
+# TROCA O .npz DE UMA VEZ (ARQUIVO TEMPORARIO + os.replace): QUEM LE NUNCA VE UM ARQUIVO PELA METADE
+def _salvar_colunas(caminho, colunas):
+    temporario = f"{caminho}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(temporario, **colunas)
+    with open(temporario, "rb") as arquivo:
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+
+
+# TRAVA ENTRE PROCESSOS NUM ARQUIVO (esperar=False DEVOLVE False SE OUTRO PROCESSO JA ESTA COM ELA)
+@contextmanager
+def travar_arquivo(caminho, esperar=True):
+    with open(caminho, "w") as trava:
+        if fcntl is not None:
+            try:
+                fcntl.flock(trava, fcntl.LOCK_EX if esperar else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+        yield True
+
+
+# TRAVA DA PASTA DAS PARTICOES: SO UM PROCESSO REESCREVE OS .npz POR VEZ
+def travar_pasta(pasta, esperar=True):
+    os.makedirs(pasta, exist_ok=True)
+    return travar_arquivo(os.path.join(pasta, ".trava"), esperar)
+
+
+# GRAVA perda E diagnostico_ia NOVOS DAS LINHAS `ids` DE UMA PARTICAO (REPONTUACAO)
+def atualizar_pontuacao(caminho, ids, perdas, diagnosticos):
+    with travar_pasta(os.path.dirname(caminho)):
+        colunas = ler_colunas(caminho)
+        ordem = np.argsort(colunas["id"], kind="stable")
+        posicoes = ordem[np.searchsorted(colunas["id"], ids, sorter=ordem)]
+        encontrados = colunas["id"][posicoes] == ids
+        posicoes = posicoes[encontrados]
+
+        colunas["perda"] = colunas["perda"].copy()
+        colunas["perda"][posicoes] = np.asarray(perdas, dtype=np.float64)[encontrados]
+        # COLUNA DE TEXTO COM LARGURA FIXA: REMONTADA PARA CABER UM DIAGNOSTICO MAIS LONGO
+        diagnostico = colunas["diagnostico_ia"].tolist()
+        for posicao, novo in zip(posicoes.tolist(), np.asarray(diagnosticos)[encontrados].tolist()):
+            diagnostico[posicao] = novo
+        colunas["diagnostico_ia"] = np.array(diagnostico, dtype=str)
+        _salvar_colunas(caminho, colunas)
+    return int(encontrados.sum())
+
+
+# GRAVA (OU COMPLETA) O .npz DE UM MES E REGISTRA NO CATALOGO DO BANCO `conn`
+# (substituir=True REESCREVE O ARQUIVO SO COM `colunas`)
+def gravar_particao(conn, mes, colunas, pasta=PASTA_ARQUIVO, substituir=False):
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f"{mes}.npz")
+    # LINHAS QUE CHEGARAM DEPOIS DE UM ARQUIVAMENTO ANTERIOR DO MESMO MES
+    if os.path.exists(caminho) and not substituir:
+        colunas = _juntar(ler_colunas(caminho), colunas)
+
+    _salvar_colunas(caminho, colunas)
+
+    with conn:
+        criar_catalogo(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO particoes_arquivadas VALUES (?, ?, ?, ?, ?, ?)",
+            (mes, os.path.abspath(caminho), len(colunas["id"]), int(colunas["id"].min()),
+             int(colunas["id"].max()), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+
+
+# ARQUIVA UM MES: GRAVA O .npz, REGISTRA NO CATALOGO E APAGA AS LINHAS EM BLOCOS
+# AS LINHAS SAO LIDAS EM BLOCOS E JA CONVERTIDAS EM COLUNAS (BATIMENTOS EM float32),
+# SEM GUARDAR AS TUPLAS COM OS BLOBs DO MES INTEIRO
+def arquivar_mes(conn, mes, pasta=PASTA_ARQUIVO, bloco=5000):
+    inicio, fim = mes + "-01", proximo_mes(mes) + "-01"
+    cursor = conn.execute(
+        f"SELECT {_COLUNAS_BANCO} FROM dados_locais WHERE data_hora >= ? AND data_hora < ? ORDER BY id",
+        (inicio, fim)
+    )
+    partes = []
+    while True:
+        linhas = cursor.fetchmany(bloco)
+        if not linhas:
+            break
+        partes.append(_para_colunas(linhas))
+    if not partes:
+        return 0
+    colunas = _concatenar(partes) if len(partes) > 1 else partes[0]
+    del partes
+    gravar_particao(conn, mes, colunas, pasta)
+
+    # UMA TRANSACAO POR BLOCO PARA NAO SEGURAR O LOCK DE ESCRITA
+    total, ultimo_id = len(colunas["id"]), int(colunas["id"][-1])
+    del colunas
+    while True:
+        with conn:
+            apagadas = conn.execute(
+                "DELETE FROM dados_locais WHERE id IN (SELECT id FROM dados_locais "
+                "WHERE data_hora >= ? AND data_hora < ? AND id <= ? LIMIT ?)",
+                (inicio, fim, ultimo_id, bloco)
+            ).rowcount
+            if apagadas:
+                incrementar_geracao(conn)
+        if apagadas < bloco:
+            return total
+
+
+# LEVA AS LINHAS ARQUIVADAS DE `usuarios` PARA AS PARTICOES DE OUTRO BANCO (REBALANCEAMENTO DE FRAGMENTOS)
+# user_id NULO E -1, COMO NAS COLUNAS ARQUIVADAS
+def mover_arquivados(origem, pasta_origem, destino, pasta_destino, usuarios):
+    movidas = 0
+    criar_catalogo(origem)
+    for mes, caminho in origem.execute("SELECT mes, caminho FROM particoes_arquivadas ORDER BY mes").fetchall():
+        colunas = ler_colunas(caminho)
+        mascara = np.isin(colunas["user_id"], list(usuarios))
+        if not mascara.any():
+            continue
+        gravar_particao(destino, mes, _filtrar(colunas, mascara), pasta_destino)
+        if mascara.all():
+            with origem:
+                origem.execute("DELETE FROM particoes_arquivadas WHERE mes = ?", (mes,))
+            os.remove(caminho)
+        else:
+            gravar_particao(origem, mes, _filtrar(colunas, ~mascara), pasta_origem, substituir=True)
+        movidas += int(mascara.sum())
+
+    # COM ids DE OUTRO FRAGMENTO O ultimo_id DE UM MES DO DESTINO PODE PASSAR DE LINHAS QUE
+    # AINDA ESTAO NO BANCO DELE (E QUE SUMIRIAM DAS CONSULTAS): OS MESES ARQUIVADOS QUE TEM
+    # LINHAS NO BANCO SAO REARQUIVADOS PARA INCLUI-LAS
+    for mes in sorted(meses_arquivados(destino)):
+        arquivar_mes(destino, mes, pasta_destino)
+    return movidas
+
+
+def arquivar_vencidas(conn, retencao_meses, pasta=PASTA_ARQUIVO, hoje=None, progresso=None):
+    arquivadas = {}
+    for mes in meses_no_banco(conn, mes_de_corte(retencao_meses, hoje) + "-01"):
+        arquivadas[mes] = arquivar_mes(conn, mes, pasta)
+        if progresso is not None:
+            progresso(mes, arquivadas[mes])
+    return arquivadas
+
+
+# LEITURA DAS PARTICOES ARQUIVADAS (USADA POR /dados_por_data E PELA EXPORTACAO)
+class LeitorArquivo:
+    """Consulta o catalogo a cada chamada (e uma tabela minuscula), pula os
+    meses fora do intervalo pedido e guarda as colunas dos ultimos meses
+    lidos em memoria. Devolve as linhas na ordem das consultas do banco:
+    (data_hora, id) decrescente."""
+
+    def __init__(self, capacidade=4):
+        self.colunas = CacheLRU(capacidade)
+
+    def _carregar(self, caminho):
+        chave = (caminho, os.path.getmtime(caminho))
+        colunas = self.colunas.obter(chave)
+        if colunas is None:
+            colunas = ler_colunas(caminho)
+            self.colunas.guardar(chave, colunas)
+        return colunas
+
+    def particoes(self, conn, data_inicio, data_fim):
+        try:
+            return conn.execute(
+                "SELECT mes, caminho, ultimo_id FROM particoes_arquivadas WHERE mes >= ? AND mes <= ? "
+                "ORDER BY mes DESC",
+                (data_inicio[:7], data_fim[:7])
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return []
+
+    # (data_hora, id) DE UM REGISTRO ARQUIVADO, PARA CONTINUAR A PAGINACAO A PARTIR DELE
+    def localizar(self, conn, id_):
+        try:
+            particoes = conn.execute(
+                "SELECT caminho FROM particoes_arquivadas WHERE ? BETWEEN primeiro_id AND ultimo_id", (id_,)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return None
+        for caminho, in particoes:
+            colunas = self._carregar(caminho)
+            encontrados = np.flatnonzero(colunas["id"] == id_)
+            if len(encontrados):
+                return str(colunas["data_hora"][encontrados[0]]), id_
+        return None
+
+    # GERA (colunas, indices) POR MES, JA FILTRADOS E ORDENADOS
+    # (SO ATE O ultimo_id DO CATALOGO: O RESTO, SE HOUVER, AINDA E LIDO DO BANCO)
+    def _selecionar(self, conn, data_inicio, data_fim, user_id=None, cursor=None):
+        try:
+            fim = (date.fromisoformat(data_fim) + timedelta(days=1)).isoformat()
+        except ValueError:
+            return
+        for _, caminho, ultimo_id in self.particoes(conn, data_inicio, data_fim):
+            colunas = self._carregar(caminho)
+            data_hora = colunas["data_hora"]
+            filtro = (data_hora >= data_inicio) & (data_hora < fim) & (colunas["id"] <= ultimo_id)
+            if user_id is not None:
+                filtro &= colunas["user_id"] == user_id
+            if cursor is not None:
+                filtro &= (data_hora < cursor[0]) | ((data_hora == cursor[0]) & (colunas["id"] < cursor[1]))
+            indices = np.flatnonzero(filtro)
+            if len(indices):
+                ordem = np.lexsort((colunas["id"][indices], data_hora[indices]))[::-1]
+                yield colunas, indices[ordem]
+
+    def buscar_por_data(self, conn, data_inicio, data_fim, limite, user_id=None, cursor=None):
+        registros = []
+        for colunas, indices in self._selecionar(conn, data_inicio, data_fim, user_id, cursor):
+            for i in indices[:limite - len(registros)]:
+                registros.append(formatar_arquivado(colunas, i))
+            if len(registros) >= limite:
+                break
+        return registros
+
+    # TUPLAS NA ORDEM DE `campos` (NOMES DE consultas.CAMPOS_EXPORTACAO), EM BLOCOS
+    def blocos(self, conn, campos, data_inicio, data_fim, user_id=None, bloco=500):
+        for colunas, indices in self._selecionar(conn, data_inicio, data_fim, user_id):
+            for inicio in range(0, len(indices), bloco):
+                yield [
+                    tuple(registro[campo] for campo in campos)
+                    for registro in (formatar_arquivado(colunas, i) for i in indices[inicio:inicio + bloco])
+                ]
+
+
+# LINHAS VISIVEIS DE CADA MES ARQUIVADO (id <= ultimo_id), UMA LISTA POR MES, COM AS COLUNAS QUE
+# OS RESUMOS USAM: (id, user_id, data_hora, diagnostico_ia, perda, spo2, press)
+def linhas_arquivadas(conn):
+    try:
+        particoes = conn.execute("SELECT caminho, ultimo_id FROM particoes_arquivadas ORDER BY mes").fetchall()
+    except sqlite3.OperationalError:
+        return
+    for caminho, ultimo_id in particoes:
+        colunas = ler_colunas(caminho)
+        mascara = colunas["id"] <= ultimo_id
+
+        def valores(nome):
+            coluna = colunas[nome][mascara]
+            return [None if np.isnan(v) else v for v in coluna.tolist()]
+
+        user_ids = [None if u < 0 else u for u in colunas["user_id"][mascara].tolist()]
+        yield list(zip(
+            colunas["id"][mascara].tolist(), user_ids, colunas["data_hora"][mascara].tolist(),
+            colunas["diagnostico_ia"][mascara].tolist(), valores("perda"), valores("spo2"), valores("press"),
+        ))
+
+
+# MESMO FORMATO DE endpoints.formatar_registro
+def formatar_arquivado(colunas, i):
+    def numero(nome):
+        valor = colunas[nome][i]
+        return None if np.isnan(valor) else float(valor)
+
+    data_hora = str(colunas["data_hora"][i])
+    inicio, fim = colunas["bat_offsets"][i], colunas["bat_offsets"][i + 1]
+    return {
+        "id": int(colunas["id"][i]),
+        "user_id": None if colunas["user_id"][i] < 0 else int(colunas["user_id"][i]),
+        "batimentos": colunas["bat_valores"][inicio:fim],
+        "spo2": numero("spo2"),
+        "press": numero("press"),
+        "status_local": str(colunas["status_local"][i]),
+        "diagnostico_ia": str(colunas["diagnostico_ia"][i]),
+        "perda": numero("perda"),
+        "data": data_hora[:10],
+        "hora": data_hora[11:],
+    }
+
+
+# ARQUIVAMENTO PERIODICO DENTRO DA API (SO COM RETENCAO_MESES > 0)
+class ArquivadorParticoes:
+    """Thread que roda `arquivar_vencidas` a cada `intervalo_s`. Com varios
+    workers, uma trava de arquivo na pasta garante que so um arquiva por vez."""
+
+    def __init__(self, caminho_db=CAMINHO_DB, retencao_meses=RETENCAO_MESES, pasta=PASTA_ARQUIVO,
+                 intervalo_s=ARQUIVAMENTO_INTERVALO_S):
+        self.caminho_db = caminho_db
+        self.retencao_meses = retencao_meses
+        self.pasta = pasta
+        self.intervalo = intervalo_s
+        self.arquivadas = {}
+        self.ultima_execucao = None
+        self.erro = None
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        if self.retencao_meses > 0 and self._thread is None:
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._laco, name="arquivador-particoes", daemon=True)
+            self._thread.start()
+
+    def parar(self, timeout=5.0):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def executar(self):
+        with travar_pasta(self.pasta, esperar=False) as travada:
+            if not travada:
+                return {}
+            conn = sqlite3.connect(self.caminho_db)
+            try:
+                conn.execute("PRAGMA busy_timeout=5000")
+                arquivadas = arquivar_vencidas(conn, self.retencao_meses, self.pasta)
+            finally:
+                conn.close()
+        for mes, linhas in arquivadas.items():
+            print(f"Mês {mes} arquivado ({linhas} linhas)", flush=True)
+        self.arquivadas.update(arquivadas)
+        return arquivadas
+
+    def _laco(self):
+        while not self._parar.is_set():
+            try:
+                self.executar()
+                self.erro = None
+            except (OSError, sqlite3.Error) as e:
+                self.erro = str(e)
+                print(f"Erro ao arquivar partições: {e}", flush=True)
+            self.ultima_execucao = time.time()
+            self._parar.wait(self.intervalo)
+
+    def estatisticas(self):
+        return {
+            "retencao_meses": self.retencao_meses,
+            "pasta": self.pasta,
+            "meses_arquivados": self.arquivadas,
+            "ultima_execucao": self.ultima_execucao,
+            "erro": self.erro,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arquiva meses antigos de dados_locais em .npz")
+    parser.add_argument("--db", default=CAMINHO_DB)
+    parser.add_argument("--pasta", default=PASTA_ARQUIVO)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("listar")
+    arquivar = comandos.add_parser("arquivar")
+    arquivar.add_argument("--retencao-meses", type=int, default=RETENCAO_MESES or 3)
+    arquivar.add_argument("--mes", default=None, help="arquiva só este mês (AAAA-MM)")
+    arquivar.add_argument("--vacuum", action="store_true", help="recupera o espaço liberado ao final")
+    args = parser.parse_args()
+
+    with sqlite3.connect(args.db) as conn:
+        conn.execute("PRAGMA busy_timeout=5000")
+        if args.comando == "arquivar":
+            inicio = time.perf_counter()
+            if args.mes:
+                arquivadas = {args.mes: arquivar_mes(conn, args.mes, args.pasta)}
+            else:
+                arquivadas = arquivar_vencidas(
+                    conn, args.retencao_meses, args.pasta,
+                    progresso=lambda mes, linhas: print(f"  {mes}: {linhas} linhas")
+                )
+            print(f"{sum(arquivadas.values())} linhas de {len(arquivadas)} meses arquivadas "
+                  f"em {time.perf_counter() - inicio:.2f}s")
+        criar_catalogo(conn)
+        for mes, caminho, linhas, primeiro_id, ultimo_id, _ in conn.execute(
+                "SELECT * FROM particoes_arquivadas ORDER BY mes"):
+            tamanho = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+            print(f"{mes}: {linhas} linhas (ids {primeiro_id}..{ultimo_id}), {tamanho / 2**20:.1f} MiB em {caminho}")
+
+    if args.comando == "arquivar" and args.vacuum:
+        conn = sqlite3.connect(args.db)
+        conn.execute("VACUUM")
+        conn.close()
@@ -0,0 +1,84 @@
+import numpy as np
+
+from config import (
+    QUALIDADE_ADC_MAXIMO, QUALIDADE_SATURACAO_MAXIMA, QUALIDADE_REPETICAO_MAXIMA,
+    QUALIDADE_RUIDO_MAXIMO, QUALIDADE_DERIVA_MAXIMA, QUALIDADE_REJEITAR,
+)
+
+# QUALIDADE DO SINAL DE CADA JANELA, ANTES DO MODELO
+#
+# Tudo e calculado de uma vez para o lote (n, 141), sobre os valores crus do
+# ADC, com a primeira e a segunda diferenca:
+#   saturacao:  fracao das amostras no teto do ADC (4095 no ESP32)
+#   repeticao:  fracao de amostras seguidas iguais (eletrodo solto, linha reta)
+#   ruido:      RMS da segunda diferenca / amplitude (energia de alta frequencia)
+#   deriva:     |media do fim - media do inicio| / amplitude (linha de base andando)
+# Uma janela sem amplitude (pico a pico 0) e sempre "linha_reta". Uma janela
+# com NaN/inf (null no JSON) e "nao_finito" e e sempre descartada, qualquer que
+# seja QUALIDADE_REJEITAR: nenhuma das medidas acima vale para ela.
+#
+# Cada janela recebe no maximo um motivo, na ordem de MOTIVOS. Os motivos em
+# QUALIDADE_REJEITAR descartam a janela antes da inferencia e da gravacao; os
+# demais so marcam a resposta.
+
+NAO_FINITO = "nao_finito"
+MOTIVOS = (NAO_FINITO, "linha_reta", "saturacao", "ruido", "deriva_linha_base")
+
+# codigo 0 = SEM PROBLEMA; codigo i = MOTIVOS[i - 1]
+_NOMES = np.array(("",) + MOTIVOS)
+
+# AMOSTRAS DO INICIO E DO FIM USADAS PARA A DERIVA
+_BORDA = 10
+
+
+def avaliar_qualidade(lote, adc_maximo=QUALIDADE_ADC_MAXIMO, saturacao_maxima=QUALIDADE_SATURACAO_MAXIMA,
+                      repeticao_maxima=QUALIDADE_REPETICAO_MAXIMA, ruido_maximo=QUALIDADE_RUIDO_MAXIMO,
+                      deriva_maxima=QUALIDADE_DERIVA_MAXIMA):
+    lote = np.asarray(lote, dtype=np.float64)
+    if lote.ndim == 1:
+        lote = lote[None, :]
+
+    finitas = np.isfinite(lote).all(axis=1)
+
+    # COM NaN/inf AS MEDIDAS DAQUELA JANELA SAEM NaN (AS COMPARACOES ABAIXO FICAM FALSAS)
+    with np.errstate(invalid="ignore", over="ignore"):
+        amplitude = lote.max(axis=1) - lote.min(axis=1)
+        escala = np.where(amplitude > 0, amplitude, 1.0)
+        primeira = np.diff(lote, axis=1)
+        segunda = np.diff(primeira, axis=1)
+
+        metricas = {
+            "amplitude": amplitude,
+            "saturacao": np.mean(lote >= adc_maximo, axis=1),
+            "repeticao": np.mean(primeira == 0, axis=1),
+            "ruido": np.sqrt(np.mean(segunda * segunda, axis=1)) / escala,
+            "deriva": np.abs(lote[:, -_BORDA:].mean(axis=1) - lote[:, :_BORDA].mean(axis=1)) / escala,
+        }
+
+        # DO MENOS PARA O MAIS PRIORITARIO: A ULTIMA CONDICAO VERDADEIRA FICA
+        codigo = np.zeros(len(lote), dtype=np.intp)
+        codigo[metricas["deriva"] > deriva_maxima] = 5
+        codigo[metricas["ruido"] > ruido_maximo] = 4
+        codigo[metricas["saturacao"] > saturacao_maxima] = 3
+        codigo[(amplitude <= 0) | (metricas["repeticao"] >= repeticao_maxima)] = 2
+    codigo[~finitas] = 1
+    metricas["codigo"] = codigo
+    metricas["motivo"] = _NOMES[codigo]
+    return metricas
+
+
+# JANELAS QUE NAO DEVEM SER AVALIADAS NEM GRAVADAS
+def rejeitadas(avaliacao, rejeitar=QUALIDADE_REJEITAR):
+    return np.array([False] + [motivo == NAO_FINITO or motivo in rejeitar for motivo in MOTIVOS])[avaliacao["codigo"]]
+
+
+# METRICAS DA JANELA i NO FORMATO DEVOLVIDO PELA API
+def resumo_qualidade(metricas, i):
+    return {
+        "motivo": str(metricas["motivo"][i]) or None,
+        # NaN NAO E JSON VALIDO
+        **{
+            nome: float(metricas[nome][i]) if np.isfinite(metricas[nome][i]) else None
+            for nome in ("saturacao", "repeticao", "ruido", "deriva")
+        },
+    }
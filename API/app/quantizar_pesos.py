@@ -0,0 +1,113 @@
+import argparse
+import sqlite3
+
+import numpy as np
+
+from backends import BackendNumpy, TAMANHO_JANELA
+from config import CAMINHO_DB, CAMINHO_PESOS_NUMPY
+from exportar_pesos import salvar_artefato
+from formato_bat import decodificar_batimentos
+
+# GERA UMA VARIANTE float16 OU int8 DE UM ARTEFATO .npz float32
+#
+# float16: kernels gravados em meia precisao (metade do tamanho); as contas
+#          continuam em float32.
+# int8:    kernels int8 com uma escala por neuronio de saida e entrada de cada
+#          camada quantizada em int8 com uma escala calibrada nos batimentos
+#          normais ja gravados no banco (percentil de |ativacao| x margem: os
+#          batimentos anormais geram ativacoes maiores que as da calibracao e
+#          nao podem ser cortados, senao a perda deles cai).
+#
+# O backend numpy converte os kernels para float32 na carga e calcula em
+# float32: as variantes ocupam a mesma memoria e rodam na mesma velocidade que
+# o float32. O ganho e so no tamanho do arquivo (disco, download, registro).
+#
+# O artefato gerado e lido pelo backend numpy como qualquer outro
+# (EASY_HEART_PESOS_NUMPY ou registro_modelos.py); a precisao vai nos
+# metadados. Compare com o float32 antes de trocar: benchmarks/precisao.py
+#
+# Uso (a partir da pasta API):
+#   python app/quantizar_pesos.py --entrada PESO.npz --saida PESO_int8.npz --precisao int8 --db dados_locais.db
+#   python app/quantizar_pesos.py --entrada PESO.npz --saida PESO_f16.npz --precisao float16
+
+# CHAVES QUE salvar_artefato RECALCULA
+_METADADOS_GERADOS = ("num_camadas", "dimensoes", "ativacoes", "origem")
+
+
+# ULTIMOS `quantidade` BATIMENTOS GRAVADOS (SO OS NORMAIS, SE `diagnostico` FOR "normal"), JA NORMALIZADOS
+def carregar_janelas(caminho_db, quantidade, diagnostico=None):
+    filtro = "AND diagnostico_ia = ? " if diagnostico else ""
+    parametros = (diagnostico, quantidade) if diagnostico else (quantidade,)
+    with sqlite3.connect(caminho_db) as conn:
+        linhas = conn.execute(
+            f"SELECT bat FROM dados_locais WHERE bat IS NOT NULL {filtro}ORDER BY id DESC LIMIT ?",
+            parametros
+        ).fetchall()
+    janelas = [decodificar_batimentos(bat) for bat, in linhas]
+    janelas = [j for j in janelas if len(j) == TAMANHO_JANELA]
+    if not janelas:
+        return np.empty((0, TAMANHO_JANELA), dtype=np.float32)
+    return np.clip(np.stack(janelas), 0, 1).astype(np.float32)
+
+
+# ESCALA DA ENTRADA DE CADA CAMADA: PERCENTIL DE |ativacao| NO MODELO float32 x margem / 127
+def calibrar_entradas(backend, janelas, percentil=99.99, margem=2.0):
+    escalas = []
+    x = janelas
+    ultima = len(backend.kernels) - 1
+    for i, (kernel, bias) in enumerate(zip(backend.kernels, backend.biases)):
+        limite = float(np.percentile(np.abs(x), percentil))
+        escalas.append(np.float32(max(limite * margem, 1e-8) / 127.0))
+        if i < ultima:
+            x = np.maximum(x @ kernel + bias, 0)
+    return escalas
+
+
+def quantizar(entrada, saida, precisao, janelas=None, percentil=99.99, margem=2.0):
+    base = BackendNumpy(entrada, mmap=False)
+    if base.precisao != "float32":
+        raise ValueError(f"{entrada} já está em {base.precisao}")
+    extras = {k: v for k, v in base.metadados.items() if k not in _METADADOS_GERADOS}
+    extras["precisao"] = precisao
+
+    if precisao == "float16":
+        camadas = [(k.astype(np.float16), b) for k, b in zip(base.kernels, base.biases)]
+        return salvar_artefato(saida, camadas, entrada, **extras)
+
+    if precisao != "int8":
+        raise ValueError(f"Precisão não suportada: {precisao} (use float16 ou int8)")
+    if janelas is None or len(janelas) == 0:
+        raise ValueError("A quantização int8 precisa de batimentos para calibrar")
+
+    camadas, arrays = [], {}
+    for i, (escala_entrada, kernel, bias) in enumerate(
+            zip(calibrar_entradas(base, janelas, percentil, margem), base.kernels, base.biases)):
+        # UMA ESCALA POR COLUNA (NEURONIO DE SAIDA), SIMETRICA EM -127..127
+        escala_kernel = np.maximum(np.abs(kernel).max(axis=0), 1e-12) / 127.0
+        camadas.append((np.clip(np.rint(kernel / escala_kernel), -127, 127).astype(np.int8), bias))
+        arrays[f"escala_kernel_{i}"] = escala_kernel.astype(np.float32)
+        arrays[f"escala_entrada_{i}"] = np.asarray(escala_entrada, dtype=np.float32)
+    extras["quantizacao"] = {"amostras_calibracao": int(len(janelas)), "percentil": percentil, "margem": margem}
+    return salvar_artefato(saida, camadas, entrada, arrays_extras=arrays, **extras)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera uma variante float16 ou int8 do modelo")
+    parser.add_argument("--entrada", default=CAMINHO_PESOS_NUMPY)
+    parser.add_argument("--saida", required=True)
+    parser.add_argument("--precisao", default="int8", choices=["float16", "int8"])
+    parser.add_argument("--db", default=CAMINHO_DB, help="batimentos normais para calibrar o int8")
+    parser.add_argument("--amostras", type=int, default=5000)
+    parser.add_argument("--percentil", type=float, default=99.99)
+    parser.add_argument("--margem", type=float, default=2.0, help="folga sobre o percentil calibrado")
+    args = parser.parse_args()
+
+    janelas = None
+    if args.precisao == "int8":
+        janelas = carregar_janelas(args.db, args.amostras, diagnostico="normal")
+        print(f"{len(janelas)} batimentos normais de {args.db} para calibração")
+    try:
+        metadados = quantizar(args.entrada, args.saida, args.precisao, janelas, args.percentil, args.margem)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f"Artefato {metadados['precisao']} gravado em {args.saida}: camadas {metadados['dimensoes']}")
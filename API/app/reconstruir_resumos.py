@@ -0,0 +1,31 @@
+import argparse
+import sqlite3
+import time
+
+from config import CAMINHO_DB
+from resumos import reconstruir_resumos
+
+# RECALCULA resumo_hora E resumo_dia A PARTIR DE dados_locais, EM BLOCOS DE id
+#
+# Pode rodar com a API no ar: os blocos sao gravados em tabelas novas e so no
+# final, numa transacao curta, elas substituem as atuais.
+#
+# Uso (a partir da pasta API):
+#   python app/reconstruir_resumos.py --db dados_locais.db --bloco 50000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstrói as tabelas de resumo por hora e por dia")
+    parser.add_argument("--db", default=CAMINHO_DB)
+    parser.add_argument("--bloco", type=int, default=50000)
+    args = parser.parse_args()
+
+    def progresso(feitas, total):
+        print(f"  ate id {feitas} de {total}")
+
+    inicio = time.perf_counter()
+    with sqlite3.connect(args.db) as conn:
+        conn.execute("PRAGMA busy_timeout=5000")
+        maior_id = reconstruir_resumos(conn, args.bloco, progresso)
+        baldes = conn.execute("SELECT COUNT(*) FROM resumo_hora").fetchone()[0]
+    print(f"Resumos reconstruídos até o id {maior_id} ({baldes} horas) em {time.perf_counter() - inicio:.2f}s")
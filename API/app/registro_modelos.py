@@ -0,0 +1,142 @@
+import argparse
+import os
+import re
+import shutil
+
+# REGISTRO DE VERSOES DO MODELO EM UMA PASTA LOCAL
+#
+#   modelos/
+#     v1.npz, v2.npz, v3.weights.h5 ...   UMA VERSAO POR ARQUIVO (NOME = VERSAO)
+#     ATIVO                               VERSAO SERVIDA (GRAVADO NA PRIMEIRA PUBLICACAO)
+#     CANDIDATO                           VERSAO AVALIADA EM SOMBRA (OPCIONAL)
+#
+# Publicar uma versao nova nao a coloca em producao: so `ativar` (ou
+# `publicar --ativar`) muda o ATIVO. Sem ATIVO nao ha versao ativa.
+#
+# A API vigia a pasta (carregador_modelo.py) e troca de modelo sozinha quando
+# ATIVO ou CANDIDATO mudam. Os arquivos sao sempre escritos com nome
+# temporario + os.replace, entao a API nunca le um arquivo pela metade.
+#
+# Uso (a partir da pasta API):
+#   python app/registro_modelos.py --pasta modelos publicar PESO.npz --versao v2
+#   python app/registro_modelos.py --pasta modelos ativar v2
+#   python app/registro_modelos.py --pasta modelos candidato v3
+#   python app/registro_modelos.py --pasta modelos candidato --remover
+#   python app/registro_modelos.py --pasta modelos listar
+
+EXTENSOES = (".weights.h5", ".npz")
+
+
+def _ordem_natural(versao):
+    return [int(p) if p.isdigit() else p for p in re.split(r"(\d+)", versao)]
+
+
+class RegistroModelos:
+    def __init__(self, pasta):
+        self.pasta = pasta
+
+    def _ler_ponteiro(self, nome):
+        try:
+            with open(os.path.join(self.pasta, nome), encoding="utf-8") as arquivo:
+                return arquivo.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _gravar_ponteiro(self, nome, versao):
+        caminho = os.path.join(self.pasta, nome)
+        if versao is None:
+            if os.path.exists(caminho):
+                os.remove(caminho)
+            return
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            arquivo.write(versao + "\n")
+        os.replace(temporario, caminho)
+
+    # {versao: caminho} EM ORDEM NATURAL (v2 ANTES DE v10)
+    def versoes(self):
+        encontradas = {}
+        if os.path.isdir(self.pasta):
+            for nome in os.listdir(self.pasta):
+                for extensao in EXTENSOES:
+                    if nome.endswith(extensao):
+                        encontradas[nome[:-len(extensao)]] = os.path.join(self.pasta, nome)
+        return dict(sorted(encontradas.items(), key=lambda item: _ordem_natural(item[0])))
+
+    def caminho(self, versao):
+        caminho = self.versoes().get(versao)
+        if caminho is None:
+            raise ValueError(f"Versão '{versao}' não existe em {self.pasta}")
+        return caminho
+
+    # (versao, caminho) DA VERSAO ATIVA, OU (None, None) SEM O PONTEIRO ATIVO
+    def ativa(self):
+        versao = self._ler_ponteiro("ATIVO")
+        return versao, self.versoes().get(versao) if versao else None
+
+    def candidata(self):
+        versao = self._ler_ponteiro("CANDIDATO")
+        return versao, self.versoes().get(versao) if versao else None
+
+    def publicar(self, arquivo, versao):
+        extensao = next((e for e in EXTENSOES if arquivo.endswith(e)), None)
+        if extensao is None:
+            raise ValueError(f"Extensão não suportada: {arquivo} (use {', '.join(EXTENSOES)})")
+        if versao in self.versoes():
+            raise ValueError(f"Versão '{versao}' já existe em {self.pasta}")
+        os.makedirs(self.pasta, exist_ok=True)
+        destino = os.path.join(self.pasta, versao + extensao)
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        shutil.copyfile(arquivo, temporario)
+        os.replace(temporario, destino)
+        # A PRIMEIRA VERSAO DO REGISTRO JA NASCE ATIVA; AS SEGUINTES ESPERAM O `ativar`
+        if self._ler_ponteiro("ATIVO") is None:
+            self._gravar_ponteiro("ATIVO", versao)
+        return destino
+
+    def ativar(self, versao):
+        self.caminho(versao)
+        self._gravar_ponteiro("ATIVO", versao)
+
+    def definir_candidata(self, versao):
+        if versao is not None:
+            self.caminho(versao)
+        self._gravar_ponteiro("CANDIDATO", versao)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gerencia as versões do modelo servidas pela API")
+    parser.add_argument("--pasta", default="modelos")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("listar")
+    publicar = comandos.add_parser("publicar")
+    publicar.add_argument("arquivo")
+    publicar.add_argument("--versao", required=True)
+    publicar.add_argument("--ativar", action="store_true")
+    ativar = comandos.add_parser("ativar")
+    ativar.add_argument("versao")
+    candidato = comandos.add_parser("candidato")
+    candidato.add_argument("versao", nargs="?")
+    candidato.add_argument("--remover", action="store_true")
+    args = parser.parse_args()
+
+    registro = RegistroModelos(args.pasta)
+    try:
+        if args.comando == "publicar":
+            print(f"Publicado {registro.publicar(args.arquivo, args.versao)}")
+            if args.ativar:
+                registro.ativar(args.versao)
+        elif args.comando == "ativar":
+            registro.ativar(args.versao)
+        elif args.comando == "candidato":
+            if not args.remover and args.versao is None:
+                raise ValueError("Informe a versão ou --remover")
+            registro.definir_candidata(None if args.remover else args.versao)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    ativa, _ = registro.ativa()
+    candidata, _ = registro.candidata()
+    for versao in registro.versoes():
+        marcas = [m for m, v in (("ativo", ativa), ("candidato", candidata)) if v == versao]
+        print(f"{versao}{'  [' + ', '.join(marcas) + ']' if marcas else ''}")
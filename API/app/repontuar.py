@@ -0,0 +1,266 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backends import criar_backend, TAMANHO_JANELA
+from config import BACKEND_MODELO, CAMINHO_DB
+from formato_bat import decodificar_batimentos
+from registro_modelos import RegistroModelos
+from cache_recentes import incrementar_geracao
+from particoes import ler_colunas, atualizar_pontuacao
+from resumos import reconstruir_resumos
+from utils import calcular_diagnosticos
+
+# RECALCULA perda E diagnostico_ia DE TODOS OS BATIMENTOS GRAVADOS COM OUTRO MODELO
+#
+# O processo principal divide dados_locais em faixas de id com `--bloco` linhas.
+# Cada faixa vai para um processo do pool, que le as linhas com a propria
+# conexao, monta um array (n, 141) e pontua o bloco inteiro numa chamada so.
+# O principal grava os resultados na ordem das faixas, uma transacao por
+# bloco, e na mesma transacao salva o ponto de parada em `metadados`: se o
+# job cair, rodar de novo com o mesmo modelo continua de onde parou.
+#
+# Depois do banco vem o arquivo: cada particao mensal (.npz) e pontuada num
+# processo do pool e regravada no principal, um mes por vez, com a mesma trava
+# de pasta do arquivamento; os meses feitos tambem ficam no ponto de parada.
+#
+# Linhas inseridas depois do inicio (id maior que o MAX(id) lido no comeco)
+# ficam como a API gravou. No final os resumos por hora/dia sao reconstruidos
+# (os meses arquivados a partir das particoes ja repontuadas), porque a perda
+# e o diagnostico mudaram. Prefira o backend numpy: cada
+# processo carrega o seu modelo e o TensorFlow pesa bem mais por processo.
+#
+# Uso (a partir da pasta API):
+#   python app/repontuar.py --db dados_locais.db --backend numpy --pesos PESO.npz
+#   python app/repontuar.py --db dados_locais.db --backend numpy --registro modelos --versao v3
+#   python app/repontuar.py --db dados_locais.db --pesos PESO.npz --reiniciar
+
+CHAVE_PONTO = "repontuacao"
+
+# ESTADO DE CADA PROCESSO DO POOL (PREENCHIDO POR _iniciar_processo)
+_backend = None
+_conn = None
+
+
+def _iniciar_processo(nome_backend, caminho_pesos, caminho_db):
+    global _backend, _conn
+    _backend = criar_backend(nome_backend, caminho_pesos)
+    _conn = sqlite3.connect(f"file:{caminho_db}?mode=ro", uri=True)
+    _conn.execute("PRAGMA busy_timeout=5000")
+
+
+# RODA NO PROCESSO DO POOL: LE A FAIXA (inicio, fim], PONTUA E DEVOLVE SO OS RESULTADOS
+def _pontuar_faixa(inicio, fim):
+    linhas = _conn.execute(
+        "SELECT id, bat FROM dados_locais WHERE id > ? AND id <= ? AND bat IS NOT NULL ORDER BY id",
+        (inicio, fim)
+    ).fetchall()
+
+    ids, janelas = [], []
+    for id_, bat in linhas:
+        janela = decodificar_batimentos(bat)
+        if len(janela) == TAMANHO_JANELA:
+            ids.append(id_)
+            janelas.append(janela)
+    if not ids:
+        return fim, [], len(linhas)
+
+    perdas, diagnosticos = _pontuar(np.stack(janelas))
+    resultados = list(zip(perdas.astype(float).tolist(), diagnosticos.tolist(), ids))
+    return fim, resultados, len(linhas) - len(ids)
+
+
+# RODA NO PROCESSO DO POOL: PONTUA AS LINHAS DE UMA PARTICAO ARQUIVADA (.npz)
+def _pontuar_particao(mes, caminho):
+    colunas = ler_colunas(caminho)
+    offsets = colunas["bat_offsets"]
+    validas = np.flatnonzero(np.diff(offsets) == TAMANHO_JANELA)
+    if not len(validas):
+        return mes, caminho, np.empty(0, np.int64), np.empty(0), np.empty(0, str), len(offsets) - 1
+
+    posicoes = offsets[validas][:, None] + np.arange(TAMANHO_JANELA)
+    perdas, diagnosticos = _pontuar(colunas["bat_valores"][posicoes])
+    return mes, caminho, colunas["id"][validas], perdas, diagnosticos, len(offsets) - 1 - len(validas)
+
+
+def _pontuar(janelas):
+    lote = np.clip(janelas, 0, 1).astype(np.float32)
+    perdas = _backend.calcular_perdas(lote)
+    return perdas, calcular_diagnosticos(perdas, _backend.limiares)
+
+
+def _ler_ponto(conn, modelo):
+    linha = conn.execute("SELECT valor FROM metadados WHERE chave = ?", (CHAVE_PONTO,)).fetchone()
+    if linha is None:
+        return None
+    ponto = json.loads(linha[0])
+    return ponto if ponto.get("modelo") == modelo else None
+
+
+def _gravar_ponto(conn, ponto):
+    conn.execute(
+        "INSERT OR REPLACE INTO metadados (chave, valor) VALUES (?, ?)",
+        (CHAVE_PONTO, json.dumps(ponto))
+    )
+
+
+# FAIXAS (inicio, fim] COM ATE `bloco` LINHAS CADA, ANDANDO PELO INDICE DE id
+def _faixas(conn, inicio, maior_id, bloco):
+    while inicio < maior_id:
+        linha = conn.execute(
+            "SELECT id FROM dados_locais WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?",
+            (inicio, bloco - 1)
+        ).fetchone()
+        fim = min(linha[0], maior_id) if linha else maior_id
+        yield inicio, fim
+        inicio = fim
+
+
+def _repontuar_particoes(conn, pool, ponto):
+    feitos = set(ponto.setdefault("meses", []))
+    try:
+        particoes = conn.execute("SELECT mes, caminho FROM particoes_arquivadas ORDER BY mes").fetchall()
+    except sqlite3.OperationalError:
+        return 0
+
+    atualizadas = 0
+    pendentes = [pool.submit(_pontuar_particao, mes, caminho) for mes, caminho in particoes if mes not in feitos]
+    for pendente in pendentes:
+        mes, caminho, ids, perdas, diagnosticos, ignoradas = pendente.result()
+        gravadas = atualizar_pontuacao(caminho, ids, perdas, diagnosticos) if len(ids) else 0
+        atualizadas += gravadas
+        ponto["atualizadas"] += gravadas
+        ponto["ignoradas"] += ignoradas
+        ponto["meses"].append(mes)
+        with conn:
+            if gravadas:
+                incrementar_geracao(conn)
+            _gravar_ponto(conn, ponto)
+        print(f"  mes arquivado {mes}: {gravadas} linhas", flush=True)
+    return atualizadas
+
+
+def repontuar(caminho_db, nome_backend, caminho_pesos, modelo, bloco=20000, processos=None,
+              reiniciar=False, resumos=True):
+    processos = processos or os.cpu_count() or 1
+    conn = sqlite3.connect(caminho_db)
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metadados (
+            chave TEXT PRIMARY KEY,
+            valor TEXT
+        )
+    """)
+
+    ponto = None if reiniciar else _ler_ponto(conn, modelo)
+    if ponto is not None and ponto.get("concluido"):
+        print(f"Já repontuado com '{modelo}' até o id {ponto['ultimo_id']} (use --reiniciar para refazer)")
+        conn.close()
+        return ponto
+    if ponto is None:
+        maior_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM dados_locais").fetchone()[0]
+        ponto = {"modelo": modelo, "ultimo_id": 0, "maior_id": maior_id,
+                 "atualizadas": 0, "ignoradas": 0, "concluido": False}
+    else:
+        print(f"Continuando do id {ponto['ultimo_id']} (de {ponto['maior_id']})")
+
+    # UMA THREAD DE BLAS POR PROCESSO: O PARALELISMO VEM DO POOL
+    for variavel in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(variavel, "1")
+
+    inicio = time.perf_counter()
+    feitas = 0
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(processos, mp_context=contexto, initializer=_iniciar_processo,
+                             initargs=(nome_backend, caminho_pesos, caminho_db)) as pool:
+        faixas = _faixas(conn, ponto["ultimo_id"], ponto["maior_id"], bloco)
+        pendentes = deque()
+
+        # ATE DOIS BLOCOS POR PROCESSO EM ANDAMENTO; A GRAVACAO SEGUE A ORDEM DAS FAIXAS
+        def enfileirar():
+            for faixa in faixas:
+                pendentes.append(pool.submit(_pontuar_faixa, *faixa))
+                if len(pendentes) >= 2 * processos:
+                    break
+
+        enfileirar()
+        while pendentes:
+            fim, resultados, ignoradas = pendentes.popleft().result()
+            ponto["ultimo_id"] = fim
+            ponto["atualizadas"] += len(resultados)
+            ponto["ignoradas"] += ignoradas
+            with conn:
+                conn.executemany(
+                    "UPDATE dados_locais SET perda = ?, diagnostico_ia = ? WHERE id = ?", resultados
+                )
+                # A API (CACHE DE RECENTES E ETags) VE QUE LINHAS JA SERVIDAS MUDARAM
+                if resultados:
+                    incrementar_geracao(conn)
+                _gravar_ponto(conn, ponto)
+            enfileirar()
+
+            feitas += len(resultados)
+            duracao = time.perf_counter() - inicio
+            print(f"  ate id {fim} de {ponto['maior_id']}: {ponto['atualizadas']} linhas "
+                  f"({feitas / duracao:.0f} linhas/s)", flush=True)
+
+        # MESES ARQUIVADOS: CADA PARTICAO E PONTUADA NUM PROCESSO DO POOL E REGRAVADA AQUI
+        feitas += _repontuar_particoes(conn, pool, ponto)
+
+    duracao = time.perf_counter() - inicio
+    ponto["concluido"] = True
+    ponto["linhas_por_s"] = feitas / duracao if duracao else None
+    with conn:
+        _gravar_ponto(conn, ponto)
+
+    if resumos:
+        print("Reconstruindo os resumos por hora e por dia...")
+        reconstruir_resumos(conn)
+    conn.close()
+    return ponto
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcula perda e diagnóstico dos batimentos gravados")
+    parser.add_argument("--db", default=CAMINHO_DB)
+    parser.add_argument("--backend", default=BACKEND_MODELO, choices=["keras", "numpy"])
+    parser.add_argument("--pesos", default=None, help="arquivo de pesos (padrão: o do backend em config.py)")
+    parser.add_argument("--registro", default=None, help="pasta do registro de modelos (com --versao)")
+    parser.add_argument("--versao", default=None, help="versão do registro (padrão: a ativa)")
+    parser.add_argument("--bloco", type=int, default=20000)
+    parser.add_argument("--processos", type=int, default=None, help="padrão: número de CPUs")
+    parser.add_argument("--reiniciar", action="store_true", help="ignora o ponto de parada salvo")
+    parser.add_argument("--sem-resumos", action="store_true", help="não reconstrói os resumos no final")
+    args = parser.parse_args()
+
+    caminho_pesos = args.pesos
+    if args.registro is not None:
+        registro = RegistroModelos(args.registro)
+        try:
+            versao = args.versao or registro.ativa()[0]
+            if versao is None:
+                raise ValueError(f"Nenhuma versão ativa em {args.registro} (use --versao)")
+            caminho_pesos = registro.caminho(versao)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        modelo = f"{args.backend}:{versao}"
+    else:
+        # SEM REGISTRO O MODELO E IDENTIFICADO PELO ARQUIVO (CAMINHO, TAMANHO E DATA)
+        caminho = caminho_pesos or "padrao"
+        if os.path.exists(caminho):
+            estado = os.stat(caminho)
+            caminho = f"{os.path.abspath(caminho)}:{estado.st_size}:{int(estado.st_mtime)}"
+        modelo = f"{args.backend}:{caminho}"
+
+    ponto = repontuar(args.db, args.backend, caminho_pesos, modelo, args.bloco, args.processos,
+                      args.reiniciar, not args.sem_resumos)
+    taxa = ponto.get("linhas_por_s")
+    print(f"{ponto['atualizadas']} linhas repontuadas com '{modelo}', {ponto['ignoradas']} ignoradas"
+          + (f" ({taxa:.0f} linhas/s)" if taxa else ""))
@@ -0,0 +1,224 @@
+# RESUMOS POR user_id E POR HORA/DIA, MANTIDOS A CADA INSERCAO EM dados_locais
+#
+# Cada balde guarda contagem, anormais, soma/maximo da perda e soma/min/max de
+# SpO2 e pressao (com contagem propria, porque esses campos podem ser nulos).
+# As medias sao calculadas na consulta. Assim /estatisticas le um balde por
+# hora ou dia em vez de todas as linhas.
+
+from consultas import CONDICAO_ANORMAL
+from particoes import linhas_arquivadas
+
+# GRANULARIDADE -> (TABELA, TAMANHO DO PREFIXO DE data_hora QUE IDENTIFICA O BALDE)
+TABELAS_RESUMO = {
+    "hora": ("resumo_hora", 13),  # "YYYY-MM-DD HH"
+    "dia": ("resumo_dia", 10),    # "YYYY-MM-DD"
+}
+
+_COLUNAS = """
+    user_id INT NOT NULL,
+    periodo TEXT NOT NULL,
+    registros INT NOT NULL,
+    anormais INT NOT NULL,
+    soma_perda FLOAT,
+    max_perda FLOAT,
+    spo2_registros INT NOT NULL,
+    soma_spo2 FLOAT,
+    min_spo2 FLOAT,
+    max_spo2 FLOAT,
+    press_registros INT NOT NULL,
+    soma_press FLOAT,
+    min_press FLOAT,
+    max_press FLOAT,
+    PRIMARY KEY (user_id, periodo)
+"""
+
+# min()/max() ESCALARES DO SQLITE DEVOLVEM NULL SE UM LADO FOR NULL: O COALESCE PEGA O OUTRO
+_ATUALIZACAO = """
+    registros = registros + excluded.registros,
+    anormais = anormais + excluded.anormais,
+    soma_perda = COALESCE(soma_perda + excluded.soma_perda, soma_perda, excluded.soma_perda),
+    max_perda = COALESCE(max(max_perda, excluded.max_perda), max_perda, excluded.max_perda),
+    spo2_registros = spo2_registros + excluded.spo2_registros,
+    soma_spo2 = COALESCE(soma_spo2 + excluded.soma_spo2, soma_spo2, excluded.soma_spo2),
+    min_spo2 = COALESCE(min(min_spo2, excluded.min_spo2), min_spo2, excluded.min_spo2),
+    max_spo2 = COALESCE(max(max_spo2, excluded.max_spo2), max_spo2, excluded.max_spo2),
+    press_registros = press_registros + excluded.press_registros,
+    soma_press = COALESCE(soma_press + excluded.soma_press, soma_press, excluded.soma_press),
+    min_press = COALESCE(min(min_press, excluded.min_press), min_press, excluded.min_press),
+    max_press = COALESCE(max(max_press, excluded.max_press), max_press, excluded.max_press)
+"""
+
+
+def criar_tabelas_resumo(conn, sufixo=""):
+    for tabela, _ in TABELAS_RESUMO.values():
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {tabela}{sufixo} ({_COLUNAS}) WITHOUT ROWID")
+
+
+# SOMA AOS RESUMOS AS LINHAS DE `origem` (dados_locais OU A TABELA TEMPORARIA DAS ARQUIVADAS) QUE ATENDEM `condicao`
+def _somar_linhas(conn, origem, condicao, parametros, sufixo=""):
+    for tabela, tamanho in TABELAS_RESUMO.values():
+        conn.execute(f"""
+            INSERT INTO {tabela}{sufixo}
+            SELECT user_id, substr(data_hora, 1, {tamanho}), COUNT(*),
+                   COALESCE(SUM({CONDICAO_ANORMAL}), 0), SUM(perda), MAX(perda),
+                   COUNT(spo2), SUM(spo2), MIN(spo2), MAX(spo2),
+                   COUNT(press), SUM(press), MIN(press), MAX(press)
+            FROM {origem}
+            WHERE {condicao} AND data_hora IS NOT NULL
+            GROUP BY user_id, substr(data_hora, 1, {tamanho})
+            ON CONFLICT (user_id, periodo) DO UPDATE SET {_ATUALIZACAO}
+        """, parametros)
+
+
+# SOMA AOS RESUMOS AS LINHAS COM id ENTRE primeiro_id E ultimo_id (CHAMAR NA MESMA TRANSACAO DO INSERT)
+def atualizar_resumos(conn, primeiro_id, ultimo_id, sufixo=""):
+    _somar_linhas(conn, "dados_locais", "id BETWEEN ? AND ?", (primeiro_id, ultimo_id), sufixo)
+
+
+# SOMA AOS RESUMOS AS LINHAS DAS PARTICOES ARQUIVADAS QUE NAO ESTAO MAIS EM dados_locais
+# (AS QUE AINDA ESTAO, COMO AS DE UM ARQUIVAMENTO INTERROMPIDO, SAO CONTADAS PELO BANCO)
+def _somar_arquivadas(conn, sufixo=""):
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS linhas_arquivadas (
+            id INTEGER PRIMARY KEY, user_id INT, data_hora TEXT, diagnostico_ia TEXT,
+            perda FLOAT, spo2 FLOAT, press FLOAT
+        )
+    """)
+    for linhas in linhas_arquivadas(conn):
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO temp.linhas_arquivadas VALUES (?, ?, ?, ?, ?, ?, ?)", linhas)
+            _somar_linhas(
+                conn, "temp.linhas_arquivadas AS a",
+                "NOT EXISTS (SELECT 1 FROM main.dados_locais AS d WHERE d.id = a.id)", (), sufixo
+            )
+            conn.execute("DELETE FROM temp.linhas_arquivadas")
+    conn.execute("DROP TABLE temp.linhas_arquivadas")
+
+
+# RECALCULA OS RESUMOS DO ZERO EM BLOCOS DE id, EM TABELAS NOVAS QUE SUBSTITUEM AS ATUAIS NO FINAL
+def reconstruir_resumos(conn, bloco=50000, progresso=None):
+    for tabela, _ in TABELAS_RESUMO.values():
+        conn.execute(f"DROP TABLE IF EXISTS {tabela}_novo")
+    criar_tabelas_resumo(conn, "_novo")
+
+    conn.commit()
+
+    # MESES JA ARQUIVADOS (particoes.py) SAO RECALCULADOS A PARTIR DOS .npz; AS LINHAS DELES QUE
+    # AINDA ESTAO NO BANCO (ATRASADAS OU DE UM ARQUIVAMENTO INTERROMPIDO) ENTRAM PELOS BLOCOS ABAIXO
+    _somar_arquivadas(conn, "_novo")
+
+    # OS BLOCOS ANDAM PELO INDICE DE id (COM FRAGMENTOS OS ids NAO SAO CONSECUTIVOS)
+    maior_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM dados_locais").fetchone()[0]
+    inicio = 0
+    while inicio < maior_id:
+        linha = conn.execute(
+            "SELECT id FROM dados_locais WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?", (inicio, bloco - 1)
+        ).fetchone()
+        fim = min(linha[0], maior_id) if linha else maior_id
+        with conn:
+            atualizar_resumos(conn, inicio + 1, fim, "_novo")
+        if progresso is not None:
+            progresso(fim, maior_id)
+        inicio = fim
+
+    # O QUE FOI INSERIDO DURANTE A RECONSTRUCAO ENTRA AQUI, JA COM A ESCRITA TRAVADA
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        atualizar_resumos(conn, maior_id + 1, 2 ** 63 - 1, "_novo")
+        for tabela, _ in TABELAS_RESUMO.values():
+            conn.execute(f"DROP TABLE IF EXISTS {tabela}")
+            conn.execute(f"ALTER TABLE {tabela}_novo RENAME TO {tabela}")
+    return maior_id
+
+
+# COPIA OS BALDES DE `usuarios` ENTRE DOIS ESQUEMAS DA MESMA CONEXAO (REBALANCEAMENTO DE FRAGMENTOS)
+# SUBSTITUI EM VEZ DE SOMAR: REPETIR UMA COPIA INTERROMPIDA NAO CONTA OS REGISTROS DUAS VEZES
+def copiar_resumos(conn, origem, destino, condicao, parametros):
+    for tabela, _ in TABELAS_RESUMO.values():
+        conn.execute(
+            f"INSERT OR REPLACE INTO {destino}.{tabela} SELECT * FROM {origem}.{tabela} WHERE {condicao}",
+            parametros
+        )
+
+
+# BALDES DE `usuarios` QUE ESTAO EM `origem` E FALTAM EM `destino`
+def resumos_faltando(conn, origem, destino, condicao, parametros):
+    return sum(
+        conn.execute(
+            f"SELECT COUNT(*) FROM {origem}.{tabela} AS o WHERE {condicao} AND NOT EXISTS "
+            f"(SELECT 1 FROM {destino}.{tabela} AS c WHERE c.user_id IS o.user_id AND c.periodo = o.periodo)",
+            parametros
+        ).fetchone()[0]
+        for tabela, _ in TABELAS_RESUMO.values()
+    )
+
+
+def apagar_resumos(conn, esquema, condicao, parametros):
+    for tabela, _ in TABELAS_RESUMO.values():
+        conn.execute(f"DELETE FROM {esquema}.{tabela} WHERE {condicao}", parametros)
+
+
+_TOTAIS = """
+    SUM(registros), SUM(anormais), SUM(soma_perda), MAX(max_perda),
+    SUM(spo2_registros), SUM(soma_spo2), MIN(min_spo2), MAX(max_spo2),
+    SUM(press_registros), SUM(soma_press), MIN(min_press), MAX(max_press)
+"""
+
+
+def _filtros(user_id, inicio, fim):
+    condicoes, parametros = [], []
+    if user_id is not None:
+        condicoes.append("user_id = ?")
+        parametros.append(user_id)
+    if inicio is not None:
+        condicoes.append("periodo >= ?")
+        parametros.append(inicio)
+    if fim is not None:
+        # "2024-05-01 23" < "2024-05-01~": PEGA TODAS AS HORAS DO ULTIMO DIA
+        condicoes.append("periodo <= ?")
+        parametros.append(fim + "~")
+    where = f"WHERE {' AND '.join(condicoes)} " if condicoes else ""
+    return where, parametros
+
+
+def consulta_totais(user_id=None, data_inicio=None, data_fim=None):
+    where, parametros = _filtros(user_id, data_inicio, data_fim)
+    return f"SELECT {_TOTAIS} FROM resumo_dia {where}", tuple(parametros)
+
+
+def consulta_serie(granularidade, user_id=None, data_inicio=None, data_fim=None):
+    tabela, _ = TABELAS_RESUMO[granularidade]
+    where, parametros = _filtros(user_id, data_inicio, data_fim)
+    query = f"SELECT periodo, {_TOTAIS} FROM {tabela} {where}GROUP BY periodo ORDER BY periodo"
+    return query, tuple(parametros)
+
+
+# JUNTA LINHAS DE _TOTAIS DE VARIOS BANCOS (UMA POR FRAGMENTO) NUMA SO
+_COMBINACAO_TOTAIS = (sum, sum, sum, max, sum, sum, min, max, sum, sum, min, max)
+
+
+def combinar_totais(linhas):
+    if len(linhas) == 1:
+        return linhas[0]
+    combinada = []
+    for i, funcao in enumerate(_COMBINACAO_TOTAIS):
+        valores = [linha[i] for linha in linhas if linha[i] is not None]
+        combinada.append(funcao(valores) if valores else None)
+    return tuple(combinada)
+
+
+# CONVERTE UMA LINHA DE _TOTAIS NO DICIONARIO DEVOLVIDO PELA API
+def formatar_totais(r):
+    registros = r[0] or 0
+
+    def media(soma, quantidade):
+        return soma / quantidade if quantidade else None
+
+    return {
+        "total_registros": registros,
+        "registros_anormais": r[1] or 0,
+        "perda_media": media(r[2], registros),
+        "perda_maxima": r[3],
+        "spo2": {"minimo": r[6], "media": media(r[5], r[4]), "maximo": r[7]},
+        "press": {"minimo": r[10], "media": media(r[9], r[8]), "maximo": r[11]},
+    }
@@ -1,109 +1,863 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from typing import Optional
 import sqlite3
-import tensorflow as tf
-import numpy as np
+import asyncio
+import time
 import json
+import os
+import numpy as np
 from datetime import datetime
 
-from models import DadosECG, Detector
-from utils import normalizar_dados, calcular_diagnostico
-from database import db_path
+from models import DadosECG, LoteECG
+from utils import normalizar_dados, normalizar_lote, calcular_diagnostico
+from inferencia import AgendadorInferencia, AgendadorParado
+from carregador_modelo import CarregadorModelo
+from registro_modelos import RegistroModelos
+from sombra import AvaliadorSombra
+from backends import TAMANHO_JANELA
+from fragmentos import abrir_armazenamento, EscritorFragmentado, juntar_ordenados
+from cache_recentes import CacheRecentes, CacheLRU, calcular_etag, ler_geracao
+from formato_bat import codificar_batimentos, decodificar_batimentos
+from consultas import consulta_ultimos, consulta_por_data, consulta_anormais, consulta_maior_id, proximo_cursor
+from consultas import CAMPOS_EXPORTACAO, consulta_batimentos, consulta_data_hora
+from resumos import consulta_totais, consulta_serie, formatar_totais, combinar_totais
+from exportacao import gerar_ndjson, gerar_csv
+from particoes import LeitorArquivo, ArquivadorParticoes, meses_arquivados, condicao_nao_arquivadas, proximo_mes
+from segmentacao import SegmentadorBatimentos
+from qualidade import avaliar_qualidade, rejeitadas, resumo_qualidade
+from notificacoes import HubNotificacoes, LeitorEventosBanco, FIM
+from codificacao import Codificacao, codificacao_leitura
+from metricas import Metricas, EstatisticasBanco, ProfilerAmostragem, memoria_processo
+from config import (
+    BACKEND_MODELO, LOTE_MAXIMO, ESPERA_MAXIMA_MS, ESPERA_RESULTADO_S,
+    ACK_INGESTAO, INGESTAO_LOTE_MAXIMO, INGESTAO_INTERVALO_MS, FORMATO_BAT,
+    CACHE_RECENTES_GLOBAL, CACHE_RECENTES_USUARIO, CACHE_RECENTES_USUARIOS, LOTE_MAXIMO_JANELAS,
+    PROFILER_HABILITADO, CACHE_RECONSTRUCAO, RECONSTRUCAO_MAXIMO_IDS,
+    REGISTRO_MODELOS, REGISTRO_INTERVALO_S, SOMBRA_FRACAO, SOMBRA_FILA, QUALIDADE_HABILITADA, QUALIDADE_REJEITAR,
+    NOTIFICACOES_KEEPALIVE_S, PROCESSOS,
+)
 
 router = APIRouter()
 
-modelo = Detector()
-modelo.build(input_shape=(None, 141))
-try:
-    modelo.compile(optimizer='adam', loss='mae')
-    modelo.load_weights("./PESO.weights.h5")
-except Exception as e:
-    raise Exception("Falha ao carregar os pesos do modelo")
+# TEMPOS POR ETAPA E CONTADORES EXPOSTOS EM /metrics
+metricas = Metricas()
+profiler = ProfilerAmostragem()
+
+
+# REGISTRA NO LOG QUANTO O WORKER LEVOU PARA FICAR PRONTO E QUANTA MEMORIA USA
+def modelo_carregado(carregador):
+    if carregador.erro:
+        print(f"[pid {os.getpid()}] {carregador.erro}", flush=True)
+        return
+    memoria = memoria_processo()
+    pss = memoria["pss_bytes"]
+    print(
+        f"[pid {os.getpid()}] modelo '{carregador.nome_backend}' pronto em "
+        f"{carregador.pronto_em - metricas.inicio_processo:.2f}s desde o início do processo "
+        f"(carga {carregador.tempo_carga:.2f}s, aquecimento {carregador.tempo_aquecimento:.3f}s); "
+        f"RSS {memoria['rss_bytes'] / 2**20:.1f} MiB"
+        + (f", PSS {pss / 2**20:.1f} MiB" if pss is not None else ""),
+        flush=True,
+    )
+
+# O MODELO SO E CARREGADO NO STARTUP DO APP (main.py), NAO NO IMPORT
+# COM EASY_HEART_REGISTRO_MODELOS A VERSAO SERVIDA VEM DO REGISTRO E PODE SER TROCADA SEM REINICIAR
+registro_modelos = RegistroModelos(REGISTRO_MODELOS) if REGISTRO_MODELOS else None
+carregador = CarregadorModelo(
+    BACKEND_MODELO, (1, LOTE_MAXIMO), ao_ficar_pronto=modelo_carregado,
+    registro=registro_modelos, intervalo_s=REGISTRO_INTERVALO_S,
+)
+
+# COMPARACAO DO MODELO CANDIDATO DO REGISTRO COM O ATIVO
+sombra = AvaliadorSombra(SOMBRA_FRACAO, SOMBRA_FILA)
+
+
+# DEPENDENCIA DO FASTAPI: RECUSA A REQUISICAO ENQUANTO O MODELO NAO ESTA PRONTO
+def modelo_pronto():
+    if not carregador.pronto:
+        raise HTTPException(status_code=503, detail=carregador.erro or "Modelo ainda não está pronto")
+
+
+# ESPERA O Future DO AGENDADOR OU DO ESCRITOR; SEM RESPOSTA NO PRAZO (OU COM A THREAD PARADA) DA 503
+def aguardar(futuro, quem):
+    try:
+        return futuro.result(timeout=ESPERA_RESULTADO_S)
+    except TimeoutError:
+        raise HTTPException(status_code=503, detail=f"{quem} não respondeu em {ESPERA_RESULTADO_S:g} s")
+    except AgendadorParado as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+# CALCULA A PERDA (MAE) DE CADA JANELA DO LOTE, MEDINDO MODELO E MAE SEPARADAMENTE
+# DEVOLVE (perda, modelo) POR JANELA: O DIAGNOSTICO USA OS LIMIARES DO MESMO MODELO QUE PONTUOU,
+# MESMO QUE UMA TROCA ACONTECA NO MEIO DA REQUISICAO
+def pontuar(lote):
+    modelo = carregador.backend
+    inicio = time.perf_counter()
+    reconstruido = modelo.reconstruir(lote)
+    meio = time.perf_counter()
+    perdas = np.mean(np.abs(lote - reconstruido), axis=1)
+    metricas.observar_etapa("modelo", meio - inicio)
+    metricas.observar_etapa("perda_mae", time.perf_counter() - meio)
+    sombra.oferecer(lote, perdas, modelo, meio - inicio, carregador.candidato)
+    return [(perda, modelo) for perda in perdas]
+
+# O AGENDADOR AVALIA CADA LOTE DE JANELAS EM UMA UNICA CHAMADA DO MODELO
+agendador = AgendadorInferencia(pontuar, LOTE_MAXIMO, ESPERA_MAXIMA_MS)
+
+
+# DEVOLVE A RECONSTRUCAO COMPLETA DE CADA JANELA (PARA OS GRAFICOS DO DASHBOARD)
+def reconstruir(lote):
+    inicio = time.perf_counter()
+    reconstruido = carregador.backend.reconstruir(lote)
+    metricas.observar_etapa("reconstrucao", time.perf_counter() - inicio)
+    return reconstruido
+
+# RECONSTRUCOES PEDIDAS AO MESMO TEMPO SAO CALCULADAS NA MESMA CHAMADA DO MODELO
+agendador_reconstrucao = AgendadorInferencia(reconstruir, LOTE_MAXIMO, ESPERA_MAXIMA_MS)
+cache_reconstrucao = CacheLRU(CACHE_RECONSTRUCAO)
+
+# CONEXOES COMPARTILHADAS: POOL DE LEITURA + UMA CONEXAO DE ESCRITA POR BANCO
+# COM EASY_HEART_FRAGMENTOS OS PACIENTES FICAM DIVIDIDOS EM VARIOS BANCOS (fragmentos.py)
+armazenamento = abrir_armazenamento()
+
+# ULTIMOS REGISTROS EM MEMORIA PARA /ultimo_dado E /ultimos_5_dados
+cache = CacheRecentes(CACHE_RECENTES_GLOBAL, CACHE_RECENTES_USUARIO, CACHE_RECENTES_USUARIOS)
+
+
+# RESULTADOS EMPURRADOS PARA OS CLIENTES INSCRITOS EM /eventos E /ws/eventos
+hub = HubNotificacoes()
+# COM VARIOS PROCESSOS O HUB E ALIMENTADO PELO BANCO (COMMITS DE TODOS OS WORKERS)
+leitor_eventos = LeitorEventosBanco(hub, armazenamento, ativo=PROCESSOS > 1)
+
+
+# CHAMADO PELO ESCRITOR DEPOIS DE CADA COMMIT
+def registros_gravados(gravados):
+    cache.adicionar([formatar_registro((id_,) + valores[:9]) for id_, valores in gravados])
+    if not leitor_eventos.ativo:
+        hub.publicar(gravados)
+
+# AS INSERCOES VAO PARA UMA FILA E SAO GRAVADAS EM LOTE POR UMA THREAD SEPARADA (UMA POR BANCO)
+escritor = EscritorFragmentado(
+    armazenamento, INGESTAO_LOTE_MAXIMO, INGESTAO_INTERVALO_MS, ao_gravar=registros_gravados
+)
+
+estatisticas_banco = EstatisticasBanco(list(armazenamento.bancos.values()))
+
+# MESES ANTIGOS ARQUIVADOS EM .npz (particoes.py): LEITURA EM /dados_por_data E ARQUIVAMENTO PERIODICO
+arquivo = LeitorArquivo()
+arquivadores = [
+    ArquivadorParticoes(banco.caminho_db, pasta=armazenamento.pastas_arquivo[nome])
+    for nome, banco in armazenamento.bancos.items()
+]
+
+
+# ORDEM DAS LISTAS POR PERIODO E DE ANORMAIS: (data_hora, id) DECRESCENTE
+def chave_data_hora(registro):
+    return registro["data"], registro["hora"], registro["id"]
+
+
+def chave_id(registro):
+    return registro["id"]
+
+# CONVERTE UMA LINHA DE dados_locais NO DICIONARIO DEVOLVIDO PELA API
+# OS BATIMENTOS FICAM COMO ARRAY float32: QUEM CONVERTE E A CODIFICACAO DA RESPOSTA (codificacao.py)
+def formatar_registro(r):
+    return {
+        "id": r[0],
+        "user_id": r[1],
+        "batimentos": decodificar_batimentos(r[2]),
+        "spo2": r[3],
+        "press": r[4],
+        "status_local": r[5],
+        "diagnostico_ia": r[6],
+        "perda": r[7],
+        "data": r[8],
+        "hora": r[9],
+    }
+
+
+# OS `limite` MAIS RECENTES POR id, JUNTANDO OS FRAGMENTOS
+def buscar_ultimos(limite, user_id=None, after_id=None):
+    query, parametros = consulta_ultimos(limite, user_id, after_id)
+    resultados = armazenamento.ler_em_paralelo(
+        lambda conn: [formatar_registro(r) for r in conn.execute(query, parametros).fetchall()], user_id
+    )
+    return juntar_ordenados(resultados, chave_id, limite)
+
+
+# MAIOR id JA GRAVADO NA VISAO (POR QUALQUER PROCESSO), JUNTANDO OS FRAGMENTOS
+def buscar_maior_id(user_id=None):
+    query, parametros = consulta_maior_id(user_id)
+    return max(armazenamento.ler_em_paralelo(
+        lambda conn: conn.execute(query, parametros).fetchone()[0] or 0, user_id
+    ))
+
+
+# GERACAO DOS DADOS (SOMA DAS GERACOES DE TODOS OS FRAGMENTOS; UMA LEITURA POR CHAVE PRIMARIA)
+def buscar_geracao():
+    return sum(armazenamento.ler_em_paralelo(ler_geracao))
+
+
+# BUSCA OS n MAIS RECENTES NO CACHE, AQUECENDO-O PELO BANCO NA PRIMEIRA VEZ; DEVOLVE (registros, geracao)
+def buscar_recentes(n, user_id=None):
+    # LINHAS REPONTUADAS OU ARQUIVADAS DESDE A ULTIMA CARGA ESVAZIAM O CACHE
+    geracao = buscar_geracao()
+    cache.sincronizar(geracao)
+    registros = cache.ultimos(n, user_id)
+    # COM VARIOS PROCESSOS O CACHE SO RECEBE O QUE ESTE GRAVOU: SE OUTRO WORKER GRAVOU
+    # ALGO MAIS NOVO, RECARREGA (SENAO O ETag FICARIA PARADO E O CLIENTE RECEBERIA 304)
+    if registros is not None and PROCESSOS > 1:
+        if (registros[0]["id"] if registros else 0) != buscar_maior_id(user_id):
+            registros = None
+    if registros is not None:
+        return registros, geracao
+
+    capacidade = cache.capacidade_global if user_id is None else cache.capacidade_usuario
+    registros = buscar_ultimos(max(n, capacidade), user_id)
+    if n <= capacidade:
+        cache.carregar(registros, user_id, geracao)
+        do_cache = cache.ultimos(n, user_id)
+        if do_cache is not None:
+            return do_cache, geracao
+    return registros[:n], geracao
+
+
+# (data_hora, id) DO REGISTRO after_id, NO BANCO OU NAS PARTICOES ARQUIVADAS DE QUALQUER FRAGMENTO
+def resolver_cursor(after_id, user_id=None):
+    def localizar(conn):
+        linha = conn.execute(*consulta_data_hora(after_id)).fetchone()
+        return (linha[0], after_id) if linha else arquivo.localizar(conn, after_id)
+
+    for cursor in armazenamento.ler_em_paralelo(localizar, user_id):
+        if cursor is not None:
+            return cursor
+    return None
+
+
+# UMA PAGINA DE /dados_por_data EM UM BANCO: LINHAS DO BANCO E DOS MESES ARQUIVADOS,
+# INTERCALADAS POR (data_hora, id) (UM MES ARQUIVADO PODE TER LINHAS ATRASADAS NO BANCO)
+def buscar_por_data(conn, data_inicio, data_fim, limite, user_id=None, cursor=None):
+    meses = meses_arquivados(conn, data_inicio, data_fim)
+    query, parametros = consulta_por_data(
+        data_inicio, data_fim, limite, user_id, cursor, condicao_nao_arquivadas(meses)
+    )
+    registros = [formatar_registro(r) for r in conn.execute(query, parametros).fetchall()]
+    if not meses:
+        return registros
+
+    # PAGINA CHEIA SO COM LINHAS MAIS NOVAS QUE O ULTIMO MES ARQUIVADO: O ARQUIVO NAO ENTRA
+    if len(registros) == limite:
+        mais_antigo = f"{registros[-1]['data']} {registros[-1]['hora']}"
+        if mais_antigo >= proximo_mes(max(meses)) + "-01":
+            return registros
+    arquivados = arquivo.buscar_por_data(conn, data_inicio, data_fim, limite, user_id, cursor)
+    return juntar_ordenados([registros, arquivados], chave_data_hora, limite)
+
+
+# APLICA `busca(conn, cursor)` EM TODOS OS FRAGMENTOS E JUNTA POR (data_hora, id); after_id INEXISTENTE = PAGINA VAZIA
+def buscar_pagina(busca, limite, user_id=None, after_id=None):
+    cursor = None
+    if after_id is not None:
+        cursor = resolver_cursor(after_id, user_id)
+        if cursor is None:
+            return []
+    resultados = armazenamento.ler_em_paralelo(lambda conn: busca(conn, cursor), user_id)
+    return juntar_ordenados(resultados, chave_data_hora, limite)
+
+
+# RECONSTRUCOES DOS REGISTROS PEDIDOS, DO CACHE OU DO MODELO (NA ORDEM DE ids; ids INEXISTENTES FICAM DE FORA)
+def buscar_reconstrucoes(ids):
+    # A CHAVE INCLUI A VERSAO DO MODELO: DEPOIS DE UMA TROCA AS RECONSTRUCOES SAO REFEITAS
+    versao = carregador.versao
+    resultado = {}
+    faltando = []
+    for registro_id in ids:
+        item = cache_reconstrucao.obter((versao, registro_id))
+        if item is None:
+            faltando.append(registro_id)
+        else:
+            resultado[registro_id] = item
+
+    if faltando:
+        query, parametros = consulta_batimentos(faltando)
+        linhas = [
+            linha for linhas_fragmento in armazenamento.ler_em_paralelo(
+                lambda conn: conn.execute(query, parametros).fetchall()
+            ) for linha in linhas_fragmento
+        ]
+        janelas = [np.clip(decodificar_batimentos(bat), 0, 1).astype(np.float32) for _, bat in linhas]
+        invalidos = [id_ for (id_, _), janela in zip(linhas, janelas) if len(janela) != TAMANHO_JANELA]
+        if invalidos:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Registros sem {TAMANHO_JANELA} amostras: {', '.join(map(str, invalidos))}"
+            )
+
+        futuros = [agendador_reconstrucao.submeter(janela) for janela in janelas]
+        for (registro_id, _), janela, futuro in zip(linhas, janelas, futuros):
+            reconstrucao = aguardar(futuro, "O modelo")
+            item = {
+                "id": registro_id,
+                "reconstrucao": reconstrucao,
+                "perda": float(np.mean(np.abs(janela - reconstrucao))),
+            }
+            cache_reconstrucao.guardar((versao, registro_id), item)
+            resultado[registro_id] = item
+
+    return [resultado[registro_id] for registro_id in ids if registro_id in resultado]
+
+
+# QUALIDADE DO SINAL DAS JANELAS CRUAS (n, 141): DEVOLVE (avaliacao, mascara das rejeitadas)
+# COM A VERIFICACAO DESLIGADA SO AS JANELAS COM NaN/inf (null NO JSON) SAO REJEITADAS;
+# SE NAO HA NENHUMA, avaliacao E None
+def verificar_qualidade(janelas, endpoint):
+    rejeitar = QUALIDADE_REJEITAR
+    if not QUALIDADE_HABILITADA:
+        if np.isfinite(janelas).all():
+            return None, np.zeros(len(janelas), dtype=bool)
+        rejeitar = ()
+    inicio = time.perf_counter()
+    avaliacao = avaliar_qualidade(janelas)
+    descartar = rejeitadas(avaliacao, rejeitar)
+    metricas.observar_etapa("qualidade", time.perf_counter() - inicio)
+    for i in np.flatnonzero(avaliacao["codigo"]):
+        metricas.contar_qualidade(endpoint, str(avaliacao["motivo"][i]), "rejeitada" if descartar[i] else "marcada")
+    return avaliacao, descartar
+
+
+def motivo_qualidade(avaliacao, i):
+    return None if avaliacao is None else resumo_qualidade(avaliacao, i)["motivo"]
+
+
+# RESPONDE 304 SEM CORPO QUANDO O CLIENTE JA TEM A VERSAO ATUAL
+def resposta_nao_modificada(request, etag):
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+    return None
+
+
+# SERIALIZA NO FORMATO NEGOCIADO (JSON OU MessagePack), MEDINDO O TEMPO
+def responder(saida, conteudo, headers=None):
+    inicio = time.perf_counter()
+    resposta = saida.resposta(conteudo, headers=headers)
+    metricas.observar_etapa("serializacao", time.perf_counter() - inicio)
+    return resposta
+
 
 # RECEBE PARA ANALISAR O ECG
-@router.post("/analisar")
-def analisar_ecg(dados: DadosECG):
+@router.post("/analisar", dependencies=[Depends(modelo_pronto)])
+def analisar_ecg(dados: DadosECG, request: Request):
     try:
         dados.validar_batimentos()
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    batimentos_norm = normalizar_dados(dados.batimentos)
-    batimentos_norm = np.clip(batimentos_norm, 0, 1)
-    batimentos_norm = tf.expand_dims(tf.cast(batimentos_norm, tf.float32), axis=0)
+    # DESDE A ENTRADA NO MIDDLEWARE: LEITURA DO CORPO + VALIDACAO DO DadosECG
+    inicio = time.perf_counter()
+    if hasattr(request.state, "inicio"):
+        metricas.observar_etapa("validacao", inicio - request.state.inicio)
 
-    reconstruido = modelo(batimentos_norm)
-    mae = tf.keras.losses.MeanAbsoluteError()
-    perda = mae(batimentos_norm, reconstruido).numpy()
+    try:
+        janela = np.asarray(dados.batimentos, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Os batimentos devem ser numéricos.")
+    if janela.ndim != 1:
+        raise HTTPException(status_code=400, detail="Os batimentos devem ser uma lista simples de 141 números.")
 
-    diagnostico_ia, nivel_risco = calcular_diagnostico(perda)
+    # ELETRODO SOLTO, SATURACAO OU RUIDO: RESPONDE SEM PASSAR PELO MODELO E SEM GRAVAR
+    avaliacao, descartar = verificar_qualidade(janela[None, :], "analisar")
+    if descartar[0]:
+        raise HTTPException(
+            status_code=422,
+            detail={"erro": "Janela rejeitada pela qualidade do sinal", **resumo_qualidade(avaliacao, 0)}
+        )
+    inicio = time.perf_counter()
 
-    try:
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            query = """
-                INSERT INTO dados_locais (
-                    user_id, bat, spo2, press, status_local, diagnostico_ia, perda, data, hora
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            valores = (
-                dados.user_id,
-                json.dumps([float(x) for x in batimentos_norm.numpy().flatten()]),
-                float(dados.spo2) if dados.spo2 else None,
-                float(dados.press) if dados.press else None,
-                dados.status_local,
-                diagnostico_ia,
-                float(perda),
-                datetime.now().strftime("%Y-%m-%d"),
-                datetime.now().strftime("%H:%M:%S")
-            )
-            cursor.execute(query, valores)
-            conn.commit()
-    except sqlite3.Error as err:
-        raise HTTPException(status_code=500, detail=f"Erro ao salvar no banco de dados: {err}")
+    batimentos_norm = normalizar_dados(janela)
+    batimentos_norm = np.clip(batimentos_norm, 0, 1).astype(np.float32)
+    normalizado = time.perf_counter()
+    metricas.observar_etapa("normalizacao", normalizado - inicio)
+
+    # A JANELA ENTRA NA FILA DO AGENDADOR E E AVALIADA JUNTO COM AS DEMAIS
+    perda, modelo = aguardar(agendador.submeter(batimentos_norm), "O modelo")
+    metricas.observar_etapa("fila_e_inferencia", time.perf_counter() - normalizado)
+
+    diagnostico_ia, nivel_risco = calcular_diagnostico(perda, modelo.limiares)
+    metricas.contar_diagnostico("analisar", diagnostico_ia)
+
+    agora = datetime.now()
+    valores = (
+        dados.user_id,
+        codificar_batimentos(batimentos_norm, FORMATO_BAT),
+        float(dados.spo2) if dados.spo2 else None,
+        float(dados.press) if dados.press else None,
+        dados.status_local,
+        diagnostico_ia,
+        float(perda),
+        agora.strftime("%Y-%m-%d"),
+        agora.strftime("%H:%M:%S"),
+        agora.strftime("%Y-%m-%d %H:%M:%S")
+    )
+    inicio_gravacao = time.perf_counter()
+    gravacao = escritor.enfileirar(valores)
+
+    # NO MODO "sync" ESPERA O COMMIT DO LOTE; NO "async" RESPONDE DIRETO
+    if ACK_INGESTAO == "sync":
+        try:
+            aguardar(gravacao, "A gravação no banco")
+        except sqlite3.Error as err:
+            raise HTTPException(status_code=500, detail=f"Erro ao salvar no banco de dados: {err}")
+    metricas.observar_etapa("gravacao", time.perf_counter() - inicio_gravacao)
 
     return {
         "status_local": dados.status_local,
         "diagnostico_ia": diagnostico_ia,
         "nivel_risco": nivel_risco,
-        "perda": float(perda)
+        "perda": float(perda),
+        "qualidade": motivo_qualidade(avaliacao, 0),
+    }
+
+
+# RECONSTRUCAO DO DETECTOR PARA VARIOS REGISTROS (ids SEPARADOS POR VIRGULA)
+@router.get("/reconstrucao", dependencies=[Depends(modelo_pronto)])
+def reconstrucao_varios(ids: str, saida: Codificacao = Depends(codificacao_leitura)):
+    try:
+        lista_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids deve ser uma lista de inteiros separados por vírgula")
+    if not lista_ids or len(lista_ids) > RECONSTRUCAO_MAXIMO_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Informe entre 1 e {RECONSTRUCAO_MAXIMO_IDS} ids"
+        )
+    try:
+        return responder(saida, {"reconstrucoes": saida.registros(buscar_reconstrucoes(lista_ids))})
+    except sqlite3.Error as err:
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar o banco de dados: {err}")
+
+
+# RECONSTRUCAO DO DETECTOR PARA UM REGISTRO
+@router.get("/reconstrucao/{registro_id}", dependencies=[Depends(modelo_pronto)])
+def reconstrucao(registro_id: int, saida: Codificacao = Depends(codificacao_leitura)):
+    try:
+        reconstrucoes = buscar_reconstrucoes([registro_id])
+    except sqlite3.Error as err:
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar o banco de dados: {err}")
+    if not reconstrucoes:
+        raise HTTPException(status_code=404, detail="Registro não encontrado")
+    return responder(saida, saida.registro(reconstrucoes[0]))
+
+
+# RECEBE VARIAS JANELAS DE UM DISPOSITIVO DE UMA VEZ
+@router.post("/analisar_lote", dependencies=[Depends(modelo_pronto)])
+def analisar_lote(lote: LoteECG):
+    try:
+        janelas = lote.validar_batimentos(LOTE_MAXIMO_JANELAS)
+        momentos = lote.validar_timestamps(len(janelas))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # AS JANELAS REJEITADAS PELA QUALIDADE DO SINAL FICAM FORA DO MODELO E DO BANCO
+    avaliacao, descartar = verificar_qualidade(janelas, "analisar_lote")
+    aceitas = np.flatnonzero(~descartar)
+
+    # NORMALIZA E AVALIA TODAS AS JANELAS ACEITAS EM UMA UNICA PASSADA DO MODELO
+    janelas_norm = np.clip(normalizar_lote(janelas[aceitas]), 0, 1).astype(np.float32)
+    pontuados = dict(zip(aceitas, pontuar(janelas_norm))) if len(aceitas) else {}
+    normalizadas = dict(zip(aceitas, janelas_norm))
+
+    spo2 = float(lote.spo2) if lote.spo2 else None
+    press = float(lote.press) if lote.press else None
+    resultados = []
+    linhas = []
+    for i, momento in enumerate(momentos):
+        if descartar[i]:
+            resultados.append({
+                "timestamp": momento.strftime("%Y-%m-%d %H:%M:%S"),
+                "diagnostico_ia": None,
+                "nivel_risco": None,
+                "perda": None,
+                "qualidade": motivo_qualidade(avaliacao, i),
+            })
+            continue
+        janela = normalizadas[i]
+        perda, modelo = pontuados[i]
+        diagnostico_ia, nivel_risco = calcular_diagnostico(perda, modelo.limiares)
+        metricas.contar_diagnostico("analisar_lote", diagnostico_ia)
+        linhas.append((
+            lote.user_id,
+            codificar_batimentos(janela, FORMATO_BAT),
+            spo2,
+            press,
+            lote.status_local,
+            diagnostico_ia,
+            float(perda),
+            momento.strftime("%Y-%m-%d"),
+            momento.strftime("%H:%M:%S"),
+            momento.strftime("%Y-%m-%d %H:%M:%S"),
+        ))
+        resultados.append({
+            "timestamp": momento.strftime("%Y-%m-%d %H:%M:%S"),
+            "diagnostico_ia": diagnostico_ia,
+            "nivel_risco": nivel_risco,
+            "perda": float(perda),
+            "qualidade": motivo_qualidade(avaliacao, i),
+        })
+
+    # TODAS AS JANELAS VAO NO MESMO executemany
+    gravacao = escritor.enfileirar_muitos(linhas) if linhas else None
+    if gravacao is not None and ACK_INGESTAO == "sync":
+        try:
+            aguardar(gravacao, "A gravação no banco")
+        except sqlite3.Error as err:
+            raise HTTPException(status_code=500, detail=f"Erro ao salvar no banco de dados: {err}")
+
+    return {
+        "user_id": lote.user_id,
+        "status_local": lote.status_local,
+        "resultados": resultados,
+    }
+
+
+# CONVERTE UMA MENSAGEM DO WEBSOCKET EM AMOSTRAS:
+# BINARIO = int16 LITTLE-ENDIAN; TEXTO = LISTA JSON OU {"amostras": [...]}
+def ler_amostras(mensagem):
+    if mensagem.get("bytes") is not None:
+        return np.frombuffer(mensagem["bytes"], dtype="<i2")
+    conteudo = json.loads(mensagem.get("text") or "[]")
+    if isinstance(conteudo, dict):
+        conteudo = conteudo.get("amostras", [])
+    return np.asarray(conteudo, dtype=np.float64)
+
+
+# RECEBE UM FLUXO CONTINUO DE AMOSTRAS, SEPARA OS BATIMENTOS E AVALIA CADA UM
+@router.websocket("/ws/stream/{user_id}")
+async def stream_ecg(
+    websocket: WebSocket,
+    user_id: int,
+    taxa: float = 50.0,
+    status_local: str = "stream",
+):
+    await websocket.accept()
+    if not carregador.pronto:
+        # 1013 = "TRY AGAIN LATER"
+        await websocket.close(code=1013, reason="Modelo ainda não está pronto")
+        return
+    segmentador = SegmentadorBatimentos(taxa_amostragem=taxa)
+    try:
+        while True:
+            mensagem = await websocket.receive()
+            if mensagem["type"] == "websocket.disconnect":
+                break
+            try:
+                amostras = ler_amostras(mensagem)
+            except (ValueError, TypeError):
+                await websocket.send_json({"erro": "Mensagem de amostras inválida"})
+                continue
+
+            batimentos = segmentador.adicionar(amostras)
+            if not len(batimentos):
+                continue
+
+            # BATIMENTOS REJEITADOS PELA QUALIDADE DO SINAL SO GERAM O AVISO
+            avaliacao, descartar = verificar_qualidade(batimentos, "stream")
+            aceitos = np.flatnonzero(~descartar)
+
+            # OS BATIMENTOS ENTRAM NA MESMA FILA DO AGENDADOR QUE ATENDE /analisar
+            batimentos_norm = np.clip(normalizar_lote(batimentos[aceitos]), 0, 1).astype(np.float32)
+            try:
+                pontuados = await asyncio.wait_for(asyncio.gather(
+                    *(asyncio.wrap_future(agendador.submeter(b)) for b in batimentos_norm)
+                ), ESPERA_RESULTADO_S)
+            except (TimeoutError, AgendadorParado):
+                # 1013: TENTE DE NOVO MAIS TARDE
+                await websocket.close(code=1013, reason="Modelo indisponível")
+                return
+            avaliados = dict(zip(aceitos, zip(batimentos_norm, pontuados)))
+
+            agora = datetime.now()
+            for i in range(len(batimentos)):
+                if descartar[i]:
+                    await websocket.send_json({
+                        "qualidade": motivo_qualidade(avaliacao, i),
+                        "timestamp": agora.strftime("%Y-%m-%d %H:%M:%S"),
+                    })
+                    continue
+                batimento, (perda, modelo) = avaliados[i]
+                diagnostico_ia, nivel_risco = calcular_diagnostico(perda, modelo.limiares)
+                metricas.contar_diagnostico("stream", diagnostico_ia)
+                escritor.enfileirar((
+                    user_id,
+                    codificar_batimentos(batimento, FORMATO_BAT),
+                    None,
+                    None,
+                    status_local,
+                    diagnostico_ia,
+                    float(perda),
+                    agora.strftime("%Y-%m-%d"),
+                    agora.strftime("%H:%M:%S"),
+                    agora.strftime("%Y-%m-%d %H:%M:%S"),
+                ))
+                await websocket.send_json({
+                    "diagnostico_ia": diagnostico_ia,
+                    "nivel_risco": nivel_risco,
+                    "perda": float(perda),
+                    "timestamp": agora.strftime("%Y-%m-%d %H:%M:%S"),
+                    "qualidade": motivo_qualidade(avaliacao, i),
+                })
+    except WebSocketDisconnect:
+        pass
+
+
+# ABRE UMA ASSINATURA NO HUB: DE UM user_id (SO AS ANOMALIAS DELE COM anomalias=true)
+# OU, SEM user_id, DAS ANOMALIAS DE TODOS OS PACIENTES
+def abrir_assinatura(user_id, anomalias):
+    if not hub.ativo:
+        return None, "Eventos indisponíveis"
+    assinatura = hub.assinar(user_id, anomalias)
+    if assinatura is None:
+        return None, "Limite de assinantes atingido"
+    return assinatura, None
+
+
+def formatar_sse(evento):
+    cabecalho = f"event: {evento['tipo']}\n"
+    if "id" in evento:
+        cabecalho += f"id: {evento['id']}\n"
+    return cabecalho + f"data: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+
+# EVENTOS EM TEMPO REAL VIA SERVER-SENT EVENTS (SUBSTITUI O POLLING DE /ultimo_dado E /dados_anormais)
+@router.get("/eventos")
+async def eventos_sse(user_id: Optional[int] = None, anomalias: bool = False):
+    assinatura, erro = abrir_assinatura(user_id, anomalias)
+    if assinatura is None:
+        raise HTTPException(status_code=503, detail=erro)
+
+    async def gerar():
+        try:
+            # INTERVALO DE RECONEXAO DO EventSource
+            yield "retry: 3000\n\n"
+            while True:
+                evento = await assinatura.proximo(NOTIFICACOES_KEEPALIVE_S)
+                if evento is FIM:
+                    break
+                # COMENTARIO SSE: MANTEM A CONEXAO VIVA ATRAVES DE PROXIES
+                yield ": keepalive\n\n" if evento is None else formatar_sse(evento)
+        finally:
+            hub.cancelar(assinatura)
+
+    return StreamingResponse(
+        gerar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# OS MESMOS EVENTOS VIA WEBSOCKET (MENSAGENS JSON; O QUE O CLIENTE ENVIAR E IGNORADO)
+@router.websocket("/ws/eventos")
+async def eventos_ws(websocket: WebSocket, user_id: Optional[int] = None, anomalias: bool = False):
+    await websocket.accept()
+    assinatura, erro = abrir_assinatura(user_id, anomalias)
+    if assinatura is None:
+        await websocket.close(code=1013, reason=erro)
+        return
+
+    # A DESCONEXAO DO CLIENTE ENCERRA A ASSINATURA MESMO SEM EVENTOS CHEGANDO
+    async def esperar_desconexao():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    leitor = asyncio.ensure_future(esperar_desconexao())
+    leitor.add_done_callback(lambda _: hub.cancelar(assinatura))
+    try:
+        while True:
+            evento = await assinatura.proximo(NOTIFICACOES_KEEPALIVE_S)
+            if evento is FIM:
+                break
+            if evento is not None:
+                await websocket.send_json(evento)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        cliente_saiu = leitor.done()
+        leitor.cancel()
+        hub.cancelar(assinatura)
+
+    # ENCERRADA PELO SERVIDOR (CLIENTE LENTO COM A POLITICA "desconectar" OU DESLIGAMENTO)
+    if not cliente_saiu:
+        await websocket.close(code=1013, reason="Assinatura encerrada pelo servidor")
+
+
+# LIVENESS: O PROCESSO ESTA DE PE (MESMO QUE O MODELO AINDA ESTEJA CARREGANDO)
+@router.get("/saude")
+def saude():
+    return {
+        "pid": os.getpid(),
+        "tempo_ativo_s": time.time() - metricas.inicio_processo,
+        "primeira_requisicao_s": metricas.primeira_requisicao,
+        "memoria": memoria_processo(),
+        "modelo": carregador.estatisticas(),
+    }
+
+
+# READINESS: SO RESPONDE 200 DEPOIS QUE O MODELO FOI CARREGADO E AQUECIDO
+@router.get("/saude/pronto")
+def saude_pronto():
+    modelo_pronto()
+    return {
+        "pronto": True,
+        "pid": os.getpid(),
+        "pronto_em_s": carregador.pronto_em - metricas.inicio_processo,
+    }
+
+
+# VERSAO ATIVA, CANDIDATA E RESULTADO DA AVALIACAO EM SOMBRA
+@router.get("/modelos")
+def modelos():
+    resposta = {"modelo": carregador.estatisticas(), "sombra": sombra.estatisticas()}
+    if registro_modelos is not None:
+        resposta["registro"] = {"pasta": registro_modelos.pasta, "versoes": list(registro_modelos.versoes())}
+    return resposta
+
+
+# METRICAS NO FORMATO TEXTO DO PROMETHEUS
+@router.get("/metrics", response_class=PlainTextResponse)
+def exportar_metricas():
+    linhas = metricas.prometheus()
+
+    linhas += ["# TYPE easy_heart_inferencia_lote_tamanho histogram"]
+    linhas += agendador.hist_lote.prometheus("easy_heart_inferencia_lote_tamanho")
+    linhas += ["# TYPE easy_heart_inferencia_espera_ms histogram"]
+    linhas += agendador.hist_espera_ms.prometheus("easy_heart_inferencia_espera_ms")
+    # COM FRAGMENTOS, UMA SERIE POR ESCRITOR
+    rotulos = {nome: {"fragmento": nome} if len(escritor.escritores) > 1 else None for nome in escritor.escritores}
+    linhas += ["# TYPE easy_heart_gravacao_lote_ms histogram"]
+    for nome, escritor_fragmento in escritor.escritores.items():
+        linhas += escritor_fragmento.hist_flush_ms.prometheus("easy_heart_gravacao_lote_ms", rotulos[nome])
+    linhas += ["# TYPE easy_heart_gravacao_lote_linhas histogram"]
+    for nome, escritor_fragmento in escritor.escritores.items():
+        linhas += escritor_fragmento.hist_lote.prometheus("easy_heart_gravacao_lote_linhas", rotulos[nome])
+    linhas += ["# TYPE easy_heart_sombra_tempo_janela_ms histogram"]
+    linhas += sombra.hist_ativo_ms.prometheus("easy_heart_sombra_tempo_janela_ms", {"modelo": "ativo"})
+    linhas += sombra.hist_candidato_ms.prometheus("easy_heart_sombra_tempo_janela_ms", {"modelo": "candidato"})
+
+    medidores = {
+        "easy_heart_fila_inferencia": agendador.fila.qsize(),
+        "easy_heart_fila_ingestao": escritor.tamanho_fila(),
+        "easy_heart_linhas_gravadas_total": escritor.linhas_gravadas,
+        "easy_heart_db_bytes": estatisticas_banco.bytes(),
+        "easy_heart_modelo_pronto": int(carregador.pronto),
+        "easy_heart_cache_reconstrucao_acertos_total": cache_reconstrucao.acertos,
+        "easy_heart_cache_reconstrucao_faltas_total": cache_reconstrucao.faltas,
+        "easy_heart_modelo_trocas_total": carregador.trocas,
+        "easy_heart_sombra_amostras_total": sombra.amostras,
+        "easy_heart_sombra_concordantes_total": sombra.concordantes,
+        "easy_heart_sombra_descartados_total": sombra.descartados,
+        "easy_heart_eventos_assinantes": hub.assinantes,
+        "easy_heart_eventos_publicados_total": hub.publicados,
+        "easy_heart_eventos_entregues_total": hub.entregues,
+        "easy_heart_eventos_descartados_total": hub.descartados,
+        "easy_heart_eventos_desconectados_total": hub.desconectados,
+    }
+    if carregador.pronto:
+        medidores["easy_heart_tempo_ate_pronto_segundos"] = carregador.pronto_em - metricas.inicio_processo
+    if metricas.primeira_requisicao is not None:
+        medidores["easy_heart_tempo_primeira_requisicao_segundos"] = metricas.primeira_requisicao
+    for tipo, valor in memoria_processo().items():
+        if valor is not None:
+            medidores[f"easy_heart_processo_{tipo}"] = valor
+    try:
+        medidores["easy_heart_db_linhas"] = estatisticas_banco.linhas()
+    except sqlite3.Error:
+        pass
+    for nome, valor in medidores.items():
+        tipo = "counter" if nome.endswith("_total") else "gauge"
+        linhas += [f"# TYPE {nome} {tipo}", f"{nome} {valor}"]
+
+    return "\n".join(linhas) + "\n"
+
+
+# LIGA O PROFILER POR AMOSTRAGEM DURANTE `segundos`
+@router.post("/metrics/profiler")
+def iniciar_profiler(
+    segundos: float = Query(10.0, gt=0, le=300),
+    intervalo_ms: float = Query(5.0, ge=1, le=1000),
+):
+    if not PROFILER_HABILITADO:
+        raise HTTPException(status_code=403, detail="Profiler desabilitado (EASY_HEART_PROFILER=1 para habilitar)")
+    if not profiler.iniciar(segundos, intervalo_ms):
+        raise HTTPException(status_code=409, detail="O profiler já está em execução")
+    return {"ativo": True, "segundos": segundos, "intervalo_ms": intervalo_ms}
+
+
+# RESULTADO DO PROFILER (PILHAS MAIS FREQUENTES)
+@router.get("/metrics/profiler")
+def relatorio_profiler(limite: int = Query(50, ge=1, le=1000)):
+    if not PROFILER_HABILITADO:
+        raise HTTPException(status_code=403, detail="Profiler desabilitado (EASY_HEART_PROFILER=1 para habilitar)")
+    return profiler.relatorio(limite)
+
+
+# RETORNA OS HISTOGRAMAS DO AGENDADOR DE INFERENCIA
+@router.get("/estatisticas_inferencia")
+def estatisticas_inferencia():
+    return agendador.estatisticas()
+
+
+# RETORNA OS CONTADORES DO ESCRITOR DE INGESTAO
+@router.get("/estatisticas_ingestao")
+def estatisticas_ingestao():
+    arquivamento = [arquivador.estatisticas() for arquivador in arquivadores]
+    return {
+        "modo_ack": ACK_INGESTAO,
+        **escritor.estatisticas(),
+        "arquivamento": arquivamento[0] if len(arquivamento) == 1 else arquivamento,
+    }
+
+
+# RETORNA OS CONTADORES DO HUB DE EVENTOS
+@router.get("/estatisticas_eventos")
+def estatisticas_eventos():
+    return {
+        **hub.estatisticas(),
+        "origem": "banco" if leitor_eventos.ativo else "escritor",
+        "erro_leitura_banco": leitor_eventos.erro,
     }
 
 
 # RETORNA OS ULTIMOS 5 DADOS
 @router.get("/ultimos_5_dados")
-def ultimos_dados():
+def ultimos_dados(
+    request: Request,
+    user_id: Optional[int] = None,
+    limit: int = Query(5, ge=1, le=100),
+    after_id: Optional[int] = None,
+    saida: Codificacao = Depends(codificacao_leitura),
+):
     try:
-        # CONECTA
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-
-            # CONSULTA OS ULTIMOS 5 REGISTROS
-            query = (
-                "SELECT id, user_id, bat, spo2, press, status_local, diagnostico_ia, perda, data, hora "
-                "FROM dados_locais "
-                "ORDER BY id DESC LIMIT 5"
-            )
-            cursor.execute(query)
-            registros = cursor.fetchall()
-
-            # FORMATA OS DADOS
-            dados_formatados = [
-                {
-                    "id": registro[0],
-                    "user_id": registro[1],
-                    "batimentos": json.loads(registro[2]),
-                    "spo2": registro[3],
-                    "press": registro[4],
-                    "status_local": registro[5],
-                    "diagnostico_ia": registro[6],
-                    "perda": registro[7],
-                    "data": registro[8],
-                    "hora": registro[9],
-                }
-                for registro in registros
-            ]
+        # PAGINAS SEGUINTES VAO DIRETO NO BANCO; A PRIMEIRA SAI DO CACHE
+        if after_id is not None:
+            registros = buscar_ultimos(limit, user_id, after_id)
+            return responder(saida, {
+                "ultimos_dados": saida.registros(registros), "proximo_id": proximo_cursor(registros, limit)
+            })
 
-            return {"ultimos_dados": dados_formatados}
+        dados_formatados, geracao = buscar_recentes(limit, user_id)
+        etag = calcular_etag(dados_formatados, limit, user_id, saida.sufixo, geracao)
+        nao_modificada = resposta_nao_modificada(request, etag)
+        if nao_modificada is not None:
+            return nao_modificada
+
+        proximo_id = dados_formatados[-1]["id"] if len(dados_formatados) == limit else None
+        return responder(
+            saida,
+            {"ultimos_dados": saida.registros(dados_formatados), "proximo_id": proximo_id},
+            headers={"ETag": etag},
+        )
 
     except sqlite3.Error as err:
         raise HTTPException(status_code=500, detail=f"Erro ao consultar o banco de dados: {err}")
@@ -111,43 +865,28 @@ def ultimos_dados():
 
 # RETORNA O ULTIMO DADO
 @router.get("/ultimo_dado")
-def ultimo_dado():
+def ultimo_dado(
+    request: Request,
+    user_id: Optional[int] = None,
+    saida: Codificacao = Depends(codificacao_leitura),
+):
     try:
-        # CONECTA
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-
-            # CONSULTA O ULTIMO REGISTRO
-            query = (
-                "SELECT id, user_id, bat, spo2, press, status_local, diagnostico_ia, perda, data, hora "
-                "FROM dados_locais "
-                "ORDER BY id DESC LIMIT 1"
+        # CONSULTA O ULTIMO REGISTRO (NORMALMENTE JA ESTA NO CACHE)
+        registros, geracao = buscar_recentes(1, user_id)
+
+        # SE NAO TEM RETORNA 404
+        if not registros:
+            raise HTTPException(
+                status_code=404, 
+                detail="Nenhum registro encontrado no banco de dados"
             )
-            cursor.execute(query)
-            registro = cursor.fetchone()
-
-            # SE NAO TEM RETORNA 404
-            if not registro:
-                raise HTTPException(
-                    status_code=404, 
-                    detail="Nenhum registro encontrado no banco de dados"
-                )
-
-            # FORMATA O DADO
-            dado_formatado = {
-                "id": registro[0],
-                "user_id": registro[1],
-                "batimentos": json.loads(registro[2]),
-                "spo2": registro[3],
-                "press": registro[4],
-                "status_local": registro[5],
-                "diagnostico_ia": registro[6],
-                "perda": registro[7],
-                "data": registro[8],
-                "hora": registro[9],
-            }
 
-            return dado_formatado
+        etag = calcular_etag(registros, 1, user_id, saida.sufixo, geracao)
+        nao_modificada = resposta_nao_modificada(request, etag)
+        if nao_modificada is not None:
+            return nao_modificada
+
+        return responder(saida, saida.registro(registros[0]), headers={"ETag": etag})
 
     except sqlite3.Error as err:
         raise HTTPException(
@@ -158,66 +897,101 @@ def ultimo_dado():
 
 # BUSCA DADOS POR DATA
 @router.get("/dados_por_data")
-def dados_por_data(data_inicio: str, data_fim: str):
+def dados_por_data(
+    data_inicio: str,
+    data_fim: str,
+    user_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    after_id: Optional[int] = None,
+    saida: Codificacao = Depends(codificacao_leitura),
+):
+    try:
+        dados_formatados = buscar_pagina(
+            lambda conn, cursor: buscar_por_data(conn, data_inicio, data_fim, limit, user_id, cursor),
+            limit, user_id, after_id
+        )
+        return responder(saida, {
+            "dados": saida.registros(dados_formatados), "proximo_id": proximo_cursor(dados_formatados, limit)
+        })
+    except sqlite3.Error as err:
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar o banco de dados: {err}")
+
+
+# EXPORTA DADOS POR DATA EM STREAMING (NDJSON OU CSV), COM PROJECAO DE CAMPOS
+@router.get("/dados_por_data/exportar")
+def exportar_dados_por_data(
+    data_inicio: str,
+    data_fim: str,
+    user_id: Optional[int] = None,
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    campos: Optional[str] = None,
+):
+    lista_campos = campos.split(",") if campos else list(CAMPOS_EXPORTACAO)
+    invalidos = [c for c in lista_campos if c not in CAMPOS_EXPORTACAO]
+    if invalidos:
+        raise HTTPException(status_code=400, detail=f"Campos inválidos: {', '.join(invalidos)}")
+
+    if formato == "csv":
+        gerador = gerar_csv(armazenamento, lista_campos, data_inicio, data_fim, user_id, arquivo=arquivo)
+        return StreamingResponse(gerador, media_type="text/csv")
+    gerador = gerar_ndjson(armazenamento, lista_campos, data_inicio, data_fim, user_id, arquivo=arquivo)
+    return StreamingResponse(gerador, media_type="application/x-ndjson")
+
+
+# RESUMO (TOTAL, ANORMAIS, PERDA, SpO2 E PRESSAO) LIDO DAS TABELAS resumo_hora/resumo_dia
+@router.get("/estatisticas")
+def estatisticas(
+    user_id: Optional[int] = None,
+    data_inicio: Optional[str] = None,
+    data_fim: Optional[str] = None,
+    granularidade: Optional[str] = Query(None, pattern="^(hora|dia)$"),
+    saida: Codificacao = Depends(codificacao_leitura),
+):
+    # CADA FRAGMENTO DEVOLVE OS TOTAIS E A SERIE DELE; OS BALDES DO MESMO PERIODO SAO COMBINADOS
+    def ler(conn):
+        query, parametros = consulta_totais(user_id, data_inicio, data_fim)
+        totais = conn.execute(query, parametros).fetchone()
+        serie = []
+        if granularidade is not None:
+            query, parametros = consulta_serie(granularidade, user_id, data_inicio, data_fim)
+            serie = conn.execute(query, parametros).fetchall()
+        return totais, serie
+
     try:
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            query = """
-                SELECT id, user_id, bat, spo2, press, status_local, diagnostico_ia, perda, data, hora
-                FROM dados_locais 
-                WHERE data BETWEEN ? AND ?
-                ORDER BY data DESC, hora DESC
-            """
-            cursor.execute(query, (data_inicio, data_fim))
-            registros = cursor.fetchall()
-            
-            dados_formatados = [{
-                "id": r[0],
-                "user_id": r[1],
-                "batimentos": json.loads(r[2]),
-                "spo2": r[3],
-                "press": r[4],
-                "status_local": r[5],
-                "diagnostico_ia": r[6],
-                "perda": r[7],
-                "data": r[8],
-                "hora": r[9]
-            } for r in registros]
-            return {"dados": dados_formatados}
+        resultados = armazenamento.ler_em_paralelo(ler, user_id)
+        resposta = formatar_totais(combinar_totais([totais for totais, _ in resultados]))
+
+        # SERIE POR BALDE SO QUANDO PEDIDA
+        if granularidade is not None:
+            periodos = {}
+            for _, serie in resultados:
+                for r in serie:
+                    periodos.setdefault(r[0], []).append(r[1:])
+            resposta["serie"] = [
+                {"periodo": periodo, **formatar_totais(combinar_totais(periodos[periodo]))}
+                for periodo in sorted(periodos)
+            ]
+        return responder(saida, resposta)
     except sqlite3.Error as err:
         raise HTTPException(status_code=500, detail=f"Erro ao consultar o banco de dados: {err}")
 
 
 # BUSCA DADOS ANORMAIS
 @router.get("/dados_anormais")
-def dados_anormais():
+def dados_anormais(
+    user_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    after_id: Optional[int] = None,
+    saida: Codificacao = Depends(codificacao_leitura),
+):
+    def buscar_anormais(conn, cursor):
+        query, parametros = consulta_anormais(limit, user_id, cursor)
+        return [formatar_registro(r) for r in conn.execute(query, parametros).fetchall()]
+
     try:
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            query = """
-                SELECT id, user_id, bat, spo2, press, status_local, diagnostico_ia, perda, data, hora
-                FROM dados_locais 
-                WHERE diagnostico_ia = 'anormal' OR perda >= 0.5
-                ORDER BY data DESC, hora DESC
-            """
-            cursor.execute(query)
-            registros = cursor.fetchall()
-            
-            dados_formatados = [{
-                "id": r[0],
-                "user_id": r[1],
-                "batimentos": json.loads(r[2]),
-                "spo2": r[3],
-                "press": r[4],
-                "status_local": r[5],
-                "diagnostico_ia": r[6],
-                "perda": r[7],
-                "data": r[8],
-                "hora": r[9]
-            } for r in registros]
-            
-            print(dados_anormais)
-            return {"dados": dados_formatados}
+        dados_formatados = buscar_pagina(buscar_anormais, limit, user_id, after_id)
+        return responder(saida, {
+            "dados": saida.registros(dados_formatados), "proximo_id": proximo_cursor(dados_formatados, limit)
+        })
     except sqlite3.Error as err:
         raise HTTPException(status_code=500, detail=f"Erro ao consultar o banco de dados: {err}")
-
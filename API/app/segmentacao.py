@@ -0,0 +1,88 @@
+import numpy as np
+
+
+# SEGMENTA UM FLUXO CONTINUO DE AMOSTRAS DO ADC EM BATIMENTOS (DE UM PICO R AO SEGUINTE)
+class SegmentadorBatimentos:
+    """Mantem um buffer circular por conexao e detecta picos R de forma
+    incremental: energia da derivada suavizada por media movel, limiar
+    adaptativo e periodo refratario. Cada intervalo R-R completo e
+    reamostrado para `tamanho` pontos (o que o Detector espera)."""
+
+    def __init__(self, taxa_amostragem=50.0, tamanho=141, segundos_buffer=10.0,
+                 rr_minimo_s=0.3, rr_maximo_s=2.0):
+        self.taxa = float(taxa_amostragem)
+        self.tamanho = tamanho
+        self.capacidade = max(int(segundos_buffer * self.taxa), 4 * int(rr_maximo_s * self.taxa))
+        self.refratario = max(1, int(rr_minimo_s * self.taxa))
+        self.rr_maximo = int(rr_maximo_s * self.taxa)
+        self.janela_energia = max(1, int(0.15 * self.taxa))
+
+        self._buffer = np.empty(0, dtype=np.float64)
+        self._inicio = 0           # indice absoluto de _buffer[0]
+        self._ultimo_pico = None   # indice absoluto do ultimo pico R confirmado
+        self.amostras_recebidas = 0
+        self.batimentos_emitidos = 0
+
+    def _energia(self, x):
+        derivada = np.diff(x, prepend=x[:1])
+        nucleo = np.ones(self.janela_energia) / self.janela_energia
+        return np.convolve(derivada * derivada, nucleo, mode="same")
+
+    def _picos(self, x):
+        energia = self._energia(x)
+        limiar = 0.3 * np.percentile(energia, 98)
+        if limiar <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        meio = energia[1:-1]
+        candidatos = np.flatnonzero((meio > energia[:-2]) & (meio >= energia[2:]) & (meio > limiar)) + 1
+
+        # SO CONFIRMA PICOS QUE JA TEM UM PERIODO REFRATARIO DE AMOSTRAS DEPOIS DELES
+        candidatos = candidatos[candidatos < len(x) - self.refratario]
+
+        # REFINA CADA CANDIDATO PARA O MAXIMO DO SINAL ORIGINAL NA VIZINHANCA
+        picos = []
+        for c in candidatos:
+            a = max(0, c - self.janela_energia)
+            b = min(len(x), c + self.janela_energia + 1)
+            p = a + int(np.argmax(x[a:b]))
+            if picos and p - picos[-1] < self.refratario:
+                if x[p] > x[picos[-1]]:
+                    picos[-1] = p
+                continue
+            picos.append(p)
+        return np.asarray(picos, dtype=np.int64)
+
+    def _reamostrar(self, segmento):
+        origem = np.linspace(0.0, 1.0, len(segmento))
+        destino = np.linspace(0.0, 1.0, self.tamanho)
+        return np.interp(destino, origem, segmento)
+
+    # RECEBE NOVAS AMOSTRAS E DEVOLVE UM ARRAY (n, tamanho) COM OS BATIMENTOS COMPLETOS
+    def adicionar(self, amostras):
+        novas = np.asarray(amostras, dtype=np.float64).ravel()
+        self.amostras_recebidas += len(novas)
+        self._buffer = np.concatenate([self._buffer, novas])
+
+        batimentos = []
+        if len(self._buffer) > 2 * self.janela_energia + self.refratario:
+            for p in self._picos(self._buffer) + self._inicio:
+                if self._ultimo_pico is not None and p <= self._ultimo_pico + self.refratario:
+                    continue
+                if self._ultimo_pico is not None and p - self._ultimo_pico <= self.rr_maximo:
+                    segmento = self._buffer[self._ultimo_pico - self._inicio:p - self._inicio]
+                    batimentos.append(self._reamostrar(segmento))
+                self._ultimo_pico = p
+
+        # DESCARTA O QUE JA NAO PODE FAZER PARTE DE UM BATIMENTO FUTURO
+        excesso = len(self._buffer) - self.capacidade
+        if self._ultimo_pico is not None:
+            excesso = max(excesso, self._ultimo_pico - self._inicio - self.janela_energia)
+        if excesso > 0:
+            self._buffer = self._buffer[excesso:]
+            self._inicio += excesso
+
+        self.batimentos_emitidos += len(batimentos)
+        if not batimentos:
+            return np.empty((0, self.tamanho), dtype=np.float64)
+        return np.stack(batimentos)
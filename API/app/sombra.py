@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from metricas import Histograma
+from utils import calcular_diagnostico
+
+
+# AVALIA UM MODELO CANDIDATO EM SOMBRA COM UMA FRACAO DO TRAFEGO REAL
+class AvaliadorSombra:
+    """Recebe janelas ja pontuadas pelo modelo ativo, sorteia uma fracao
+    delas e, numa thread propria, pontua as mesmas janelas com o candidato.
+    A resposta ao cliente nunca espera por isso: a fila e limitada e, se
+    estiver cheia, o lote e descartado. Compara o diagnostico (concordancia),
+    a diferenca da perda e o tempo por janela dos dois modelos. As
+    estatisticas recomecam sempre que o par (ativo, candidato) muda."""
+
+    def __init__(self, fracao=0.1, capacidade_fila=64, semente=None):
+        self.fracao = max(0.0, min(1.0, float(fracao)))
+        self.fila = queue.Queue(maxsize=max(1, int(capacidade_fila)))
+        self._rng = np.random.default_rng(semente)
+        self._trava = threading.Lock()
+        self._thread = None
+        self._parar = threading.Event()
+        self._zerar(None)
+
+    def _zerar(self, par):
+        self.par = par
+        self.amostras = 0
+        self.concordantes = 0
+        self.soma_diferenca_perda = 0.0
+        self.descartados = 0
+        self.falhas = 0
+        self.hist_ativo_ms = Histograma([0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10])
+        self.hist_candidato_ms = Histograma([0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10])
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._laco, name="avaliador-sombra", daemon=True)
+            self._thread.start()
+
+    def parar(self, timeout=5.0):
+        self._parar.set()
+        try:
+            self.fila.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # CHAMADO LOGO DEPOIS DO MODELO ATIVO; SO SORTEIA E ENFILEIRA (NAO BLOQUEIA)
+    def oferecer(self, lote, perdas, ativo, segundos_ativo, candidato):
+        if candidato is None or self.fracao <= 0.0 or not len(lote):
+            return
+        escolhidas = self._rng.random(len(lote)) < self.fracao
+        if not escolhidas.any():
+            return
+        item = (
+            np.array(lote[escolhidas]), np.array(perdas[escolhidas]),
+            ativo, segundos_ativo / len(lote), candidato,
+        )
+        try:
+            self.fila.put_nowait(item)
+        except queue.Full:
+            with self._trava:
+                self.descartados += 1
+
+    def _avaliar(self, lote, perdas_ativo, ativo, segundos_por_janela, candidato):
+        par = (getattr(ativo, "versao", None), getattr(candidato, "versao", None))
+        inicio = time.perf_counter()
+        try:
+            perdas_candidato = candidato.calcular_perdas(lote)
+        except Exception:
+            with self._trava:
+                self.falhas += 1
+            return
+        segundos_candidato = (time.perf_counter() - inicio) / len(lote)
+
+        concordantes = sum(
+            calcular_diagnostico(a, ativo.limiares)[0] == calcular_diagnostico(c, candidato.limiares)[0]
+            for a, c in zip(perdas_ativo, perdas_candidato)
+        )
+        with self._trava:
+            if par != self.par:
+                self._zerar(par)
+            self.amostras += len(lote)
+            self.concordantes += concordantes
+            self.soma_diferenca_perda += float(np.sum(np.abs(perdas_candidato - perdas_ativo)))
+            self.hist_ativo_ms.observar(segundos_por_janela * 1000.0)
+            self.hist_candidato_ms.observar(segundos_candidato * 1000.0)
+
+    def _laco(self):
+        while not self._parar.is_set():
+            item = self.fila.get()
+            if item is None:
+                continue
+            self._avaliar(*item)
+
+    def estatisticas(self):
+        with self._trava:
+            ativo, candidato = self.par or (None, None)
+            return {
+                "fracao": self.fracao,
+                "ativo": ativo,
+                "candidato": candidato,
+                "amostras": self.amostras,
+                "concordancia": self.concordantes / self.amostras if self.amostras else None,
+                "diferenca_media_perda": self.soma_diferenca_perda / self.amostras if self.amostras else None,
+                "descartados": self.descartados,
+                "falhas": self.falhas,
+                "tempo_por_janela_ms": {
+                    "ativo": self.hist_ativo_ms.resumo(),
+                    "candidato": self.hist_candidato_ms.resumo(),
+                },
+            }
@@ -1,15 +1,33 @@
 import numpy as np
 
+# JANELA SEM AMPLITUDE (LINHA RETA) VIRA ZEROS EM VEZ DE NaN
 def normalizar_dados(dados):
-    dados = np.array(dados)
-    min_val = dados.min()
-    max_val = dados.max()
-    return (dados - min_val) / (max_val - min_val)
+    return normalizar_lote(np.asarray(dados, dtype=np.float64)[None, :])[0]
 
-def calcular_diagnostico(perda):
-    if perda < 0.3:  
+# Versao vetorizada: normaliza cada linha (janela) do array 2-D de uma vez
+def normalizar_lote(lote):
+    lote = np.asarray(lote, dtype=np.float64)
+    min_val = lote.min(axis=1, keepdims=True)
+    amplitude = lote.max(axis=1, keepdims=True) - min_val
+    return np.divide(lote - min_val, amplitude, out=np.zeros_like(lote), where=amplitude > 0)
+
+# Limiares usados quando o modelo carregado nao traz os seus (ver IA - Treino/treinar.py)
+LIMIARES_PADRAO = {"suspeito": 0.3, "anormal": 0.4}
+
+def calcular_diagnostico(perda, limiares=None):
+    limiares = limiares or LIMIARES_PADRAO
+    if perda < limiares["suspeito"]:
         return "normal", "baixo"
-    elif perda < 0.4:
+    elif perda < limiares["anormal"]:
         return "suspeito", "médio"
     else:
         return "anormal", "alto"
+
+# MESMA REGRA DE calcular_diagnostico PARA UM ARRAY DE PERDAS (SO O DIAGNOSTICO)
+def calcular_diagnosticos(perdas, limiares=None):
+    limiares = limiares or LIMIARES_PADRAO
+    perdas = np.asarray(perdas)
+    return np.where(
+        perdas < limiares["suspeito"], "normal",
+        np.where(perdas < limiares["anormal"], "suspeito", "anormal"),
+    )
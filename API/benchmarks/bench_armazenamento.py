@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import database
+from armazenamento import Armazenamento
+from consultas import consulta_ultimos
+from formato_bat import codificar_batimentos, decodificar_batimentos
+from ingestao import EscritorIngestao, QUERY_INSERCAO
+
+# COMPARA A VAZAO DE LEITURA/ESCRITA CONCORRENTE:
+#   antes  -> sqlite3.connect + commit a cada operacao (como os endpoints faziam)
+#   depois -> pool de leitura do Armazenamento + EscritorIngestao (ack sync ou async)
+#
+# Uso (a partir da pasta API):
+#   python benchmarks/bench_armazenamento.py --threads 16 --segundos 5 --fracao-escrita 0.2
+
+
+def gerar_linha(rng):
+    agora = datetime.now()
+    return (
+        int(rng.integers(1, 50)),
+        codificar_batimentos(rng.random(141, dtype=np.float32)),
+        97.0, 120.0, "Estável", "normal", float(rng.random()),
+        agora.strftime("%Y-%m-%d"), agora.strftime("%H:%M:%S"), agora.strftime("%Y-%m-%d %H:%M:%S"),
+    )
+
+
+def popular(caminho, linhas):
+    database.db_path = caminho
+    database.inicializar_db()
+    rng = np.random.default_rng(0)
+    with sqlite3.connect(caminho) as conn:
+        conn.executemany(QUERY_INSERCAO, [gerar_linha(rng) for _ in range(linhas)])
+
+
+def ler(conn):
+    query, parametros = consulta_ultimos(5, random.randint(1, 49))
+    return [decodificar_batimentos(r[2]) for r in conn.execute(query, parametros).fetchall()]
+
+
+def executar(nome, operacao, threads, segundos, fracao_escrita):
+    contagens = {"leituras": 0, "escritas": 0}
+    trava = threading.Lock()
+    fim = time.perf_counter() + segundos
+
+    def trabalhador(semente):
+        rng = np.random.default_rng(semente)
+        leituras = escritas = 0
+        while time.perf_counter() < fim:
+            if rng.random() < fracao_escrita:
+                operacao(escrita=gerar_linha(rng))
+                escritas += 1
+            else:
+                operacao(escrita=None)
+                leituras += 1
+        with trava:
+            contagens["leituras"] += leituras
+            contagens["escritas"] += escritas
+
+    lista = [threading.Thread(target=trabalhador, args=(i,)) for i in range(threads)]
+    for t in lista:
+        t.start()
+    for t in lista:
+        t.join()
+
+    total = contagens["leituras"] + contagens["escritas"]
+    return {"modo": nome, **contagens, "ops_por_segundo": total / segundos}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pool de conexões SQLite")
+    parser.add_argument("--linhas", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--segundos", type=float, default=5.0)
+    parser.add_argument("--fracao-escrita", type=float, default=0.2)
+    parser.add_argument("--ack", choices=["sync", "async"], default="async")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_armazenamento_")
+    caminho = os.path.join(pasta, "dados_locais.db")
+    popular(caminho, args.linhas)
+
+    # ANTES: UMA CONEXAO NOVA POR OPERACAO
+    def operacao_antes(escrita):
+        with sqlite3.connect(caminho, timeout=30) as conn:
+            if escrita is None:
+                ler(conn)
+            else:
+                conn.execute(QUERY_INSERCAO, escrita)
+                conn.commit()
+        conn.close()
+
+    antes = executar("antes", operacao_antes, args.threads, args.segundos, args.fracao_escrita)
+
+    # DEPOIS: POOL DE LEITURA + ESCRITOR COM GROUP COMMIT
+    armazenamento = Armazenamento(caminho)
+    escritor = EscritorIngestao(armazenamento, intervalo_ms=5.0)
+    escritor.iniciar()
+
+    def operacao_depois(escrita):
+        if escrita is None:
+            with armazenamento.leitura() as conn:
+                ler(conn)
+        else:
+            gravacao = escritor.enfileirar(escrita)
+            if args.ack == "sync":
+                gravacao.result()
+
+    depois = executar("depois", operacao_depois, args.threads, args.segundos, args.fracao_escrita)
+    escritor.parar()
+    armazenamento.fechar()
+
+    resultado = {
+        "parametros": vars(args),
+        "resultados": [antes, depois],
+        "ganho": depois["ops_por_segundo"] / antes["ops_por_segundo"] if antes["ops_por_segundo"] else None,
+    }
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
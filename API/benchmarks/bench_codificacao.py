@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from fastapi.encoders import jsonable_encoder
+
+import codificacao
+from codificacao import Codificacao, MIDIA_JSON, MIDIA_MSGPACK, codificar
+from formato_bat import codificar_batimentos, decodificar_batimentos
+from sinteticos import gerar_batimentos
+
+# COMPARA TAMANHO E TEMPO DE SERIALIZACAO DE UMA PAGINA DE /dados_por_data EM CADA FORMATO:
+#   antes:            .tolist() em cada registro + jsonable_encoder + json (como o FastAPI fazia)
+#   json/msgpack:     codificacao.py com batimentos em lista, base64 ou f32 e a projecao status
+# O tempo inclui a decodificacao da coluna `bat`, que tambem acontece em cada requisicao.
+#
+# Uso (a partir da pasta API):
+#   python benchmarks/bench_codificacao.py --registros 100 --repeticoes 50
+
+
+def linhas_banco(n):
+    batimentos, _ = gerar_batimentos(np.random.default_rng(0), n, 0.1)
+    return [
+        (i + 1, i % 50, codificar_batimentos(b / b.max()), 97.0, 120.0, "Estável",
+         "normal", 0.1 + i % 7 / 10, "2024-05-01", "12:00:00")
+        for i, b in enumerate(batimentos)
+    ]
+
+
+def registro(r, decodificar):
+    return {
+        "id": r[0], "user_id": r[1], "batimentos": decodificar(r[2]), "spo2": r[3], "press": r[4],
+        "status_local": r[5], "diagnostico_ia": r[6], "perda": r[7], "data": r[8], "hora": r[9],
+    }
+
+
+def antes(linhas):
+    conteudo = {"dados": [registro(r, lambda bat: decodificar_batimentos(bat).tolist()) for r in linhas],
+                "proximo_id": None}
+    return json.dumps(jsonable_encoder(conteudo), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def depois(saida):
+    def serializar(linhas):
+        registros = [registro(r, decodificar_batimentos) for r in linhas]
+        return codificar({"dados": saida.registros(registros), "proximo_id": None}, saida.midia)
+    return serializar
+
+
+def medir(funcao, linhas, repeticoes):
+    corpo = funcao(linhas)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(linhas)
+        tempos.append(time.perf_counter() - inicio)
+    return {
+        "bytes_por_registro": len(corpo) / len(linhas),
+        "bytes_gzip_por_registro": len(zlib.compress(corpo, 6)) / len(linhas),
+        "us_por_registro": float(np.median(tempos)) / len(linhas) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os formatos de resposta dos endpoints de leitura")
+    parser.add_argument("--registros", type=int, default=100, help="registros por página")
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args()
+
+    linhas = linhas_banco(args.registros)
+    formatos = {"antes": antes}
+    for midia, nome in ((MIDIA_JSON, "json"), (MIDIA_MSGPACK, "msgpack")):
+        if midia == MIDIA_MSGPACK and codificacao.msgpack is None:
+            continue
+        for bat in ("lista", "base64", "f32"):
+            if bat == "f32" and midia == MIDIA_JSON:
+                continue
+            formatos[f"{nome}_{bat}"] = depois(Codificacao(midia, bat))
+        formatos[f"{nome}_status"] = depois(Codificacao(midia, projecao="status"))
+
+    resultados = {nome: medir(funcao, linhas, args.repeticoes) for nome, funcao in formatos.items()}
+    referencia = resultados["antes"]
+    for resultado in resultados.values():
+        resultado["tamanho_relativo"] = resultado["bytes_por_registro"] / referencia["bytes_por_registro"]
+        resultado["aceleracao"] = referencia["us_por_registro"] / resultado["us_por_registro"]
+
+    print(json.dumps({
+        "parametros": vars(args),
+        "orjson": codificacao.orjson is not None,
+        "msgpack": codificacao.msgpack is not None,
+        "resultados": resultados,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from notificacoes import HubNotificacoes, FIM
+
+# MEDE O HUB DE EVENTOS (notificacoes.py) COM MILHARES DE ASSINANTES OCIOSOS:
+#   - memoria por assinante ocioso (fila + tarefa esperando, como um /eventos aberto)
+#   - custo de distribuicao no loop por registro publicado
+#   - latencia do commit (publicar na thread do escritor) ate o assinante receber
+#   - descartes de um assinante lento com a politica escolhida
+# Os assinantes ativos acompanham `--ativos` pacientes; os ociosos assinam
+# pacientes que nao recebem nada. Um quarto dos registros e anomalia.
+#
+# Uso (a partir da pasta API):
+#   python benchmarks/bench_notificacoes.py --ociosos 0,1000,10000 --ativos 100 --registros 20000
+
+
+def percentil(valores, p):
+    return float(np.percentile(valores, p)) if len(valores) else None
+
+
+async def assinante(hub, assinatura, enviados, latencias, atraso_s, keepalive_s):
+    while True:
+        evento = await assinatura.proximo(keepalive_s)
+        if evento is FIM:
+            return
+        if evento is None or evento["tipo"] == "descartados":
+            continue
+        latencias.append(time.perf_counter() - enviados[evento["id"]])
+        if atraso_s:
+            await asyncio.sleep(atraso_s)
+
+
+def gerar_registros(rng, n, usuarios):
+    registros = []
+    for id_ in range(1, n + 1):
+        anomalia = rng.random() < 0.25
+        registros.append((id_, (
+            int(rng.integers(1, usuarios + 1)), b"", 97.0, 120.0, "Estável",
+            "anormal" if anomalia else "normal", float(rng.random() * (0.6 if anomalia else 0.2)),
+            "2024-01-01", "12:00:00", "2024-01-01 12:00:00",
+        )))
+    return registros
+
+
+async def cenario(args, ociosos):
+    hub = HubNotificacoes(args.fila, args.politica, maximo_assinantes=ociosos + args.ativos + 10)
+    hub.iniciar()
+    enviados = {}
+    latencias = []
+
+    # TEMPO GASTO NO LOOP DISTRIBUINDO
+    distribuicao = []
+    distribuir = hub._distribuir
+
+    def distribuir_medido(gravados):
+        inicio = time.perf_counter()
+        distribuir(gravados)
+        distribuicao.append(time.perf_counter() - inicio)
+
+    hub._distribuir = distribuir_medido
+
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    tarefas = []
+    for i in range(ociosos):
+        # user_ids ALEM DOS QUE RECEBEM REGISTROS
+        assinatura = hub.assinar(args.usuarios + 1 + i)
+        tarefas.append(asyncio.ensure_future(
+            assinante(hub, assinatura, enviados, latencias, 0, args.keepalive)
+        ))
+    await asyncio.sleep(0)
+    bytes_ociosos = tracemalloc.get_traced_memory()[0] - antes
+    tracemalloc.stop()
+
+    for user_id in range(1, args.ativos + 1):
+        tarefas.append(asyncio.ensure_future(
+            assinante(hub, hub.assinar(user_id), enviados, latencias, 0, args.keepalive)
+        ))
+    # UM ASSINANTE DE TODAS AS ANOMALIAS QUE E LENTO
+    lento = hub.assinar(None, True)
+    latencias_lento = []
+    tarefas.append(asyncio.ensure_future(
+        assinante(hub, lento, enviados, latencias_lento, args.atraso_lento_ms / 1000, args.keepalive)
+    ))
+
+    # O "ESCRITOR" PUBLICA EM LOTES NO RITMO PEDIDO, DE OUTRA THREAD
+    registros = gerar_registros(np.random.default_rng(0), args.registros, args.usuarios)
+    custo_publicar = []
+
+    def escritor():
+        intervalo = args.lote / args.taxa
+        proximo = time.perf_counter()
+        for i in range(0, len(registros), args.lote):
+            lote = registros[i:i + args.lote]
+            agora = time.perf_counter()
+            for id_, _ in lote:
+                enviados[id_] = agora
+            hub.publicar(lote)
+            custo_publicar.append(time.perf_counter() - enviados[lote[-1][0]])
+            proximo += intervalo
+            time.sleep(max(0.0, proximo - time.perf_counter()))
+
+    inicio = time.perf_counter()
+    thread = threading.Thread(target=escritor)
+    thread.start()
+    while thread.is_alive():
+        await asyncio.sleep(0.05)
+    duracao = time.perf_counter() - inicio
+    await asyncio.sleep(0.2)
+
+    estatisticas = hub.estatisticas()
+    hub.parar()
+    await asyncio.gather(*tarefas)
+
+    return {
+        "ociosos": ociosos,
+        "ativos": args.ativos,
+        "registros_por_segundo": args.registros / duracao,
+        "bytes_por_assinante_ocioso": bytes_ociosos / ociosos if ociosos else None,
+        "publicar_us_p50": percentil(custo_publicar, 50) * 1e6,
+        "distribuir_us_por_registro": sum(distribuicao) / args.registros * 1e6,
+        "latencia_ms_p50": percentil(latencias, 50) * 1e3,
+        "latencia_ms_p99": percentil(latencias, 99) * 1e3,
+        "latencia_ms_max": max(latencias) * 1e3,
+        "lento_recebidos": len(latencias_lento),
+        "lento_descartados": lento.descartados,
+        "hub": estatisticas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do hub de eventos com assinantes ociosos")
+    parser.add_argument("--ociosos", default="0,1000,10000", help="lista de quantidades de assinantes ociosos")
+    parser.add_argument("--ativos", type=int, default=100, help="assinantes de pacientes que recebem registros")
+    parser.add_argument("--usuarios", type=int, default=100)
+    parser.add_argument("--registros", type=int, default=20000)
+    parser.add_argument("--taxa", type=float, default=5000, help="registros publicados por segundo")
+    parser.add_argument("--lote", type=int, default=64, help="registros por commit do escritor")
+    parser.add_argument("--fila", type=int, default=64)
+    parser.add_argument("--politica", default="descartar_antigos")
+    parser.add_argument("--atraso-lento-ms", type=float, default=5.0)
+    parser.add_argument("--keepalive", type=float, default=15.0)
+    args = parser.parse_args()
+
+    resultados = [asyncio.run(cenario(args, int(n))) for n in args.ociosos.split(",")]
+    print(json.dumps({"parametros": vars(args), "resultados": resultados}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
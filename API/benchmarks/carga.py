@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+PASTA_API = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PASTA_APP = os.path.join(PASTA_API, "app")
+
+# BENCHMARK DE CARGA DA API, SEM REDE
+#
+# Sobe o app FastAPI de app/main.py dentro do processo (httpx + ASGITransport),
+# usa bancos pre-populados com dados sinteticos e mede vazao e latencia
+# (p50/p95/p99) de /analisar e dos endpoints de leitura. Cada tamanho de banco
+# roda em um subprocesso separado; o resultado final sai em JSON.
+#
+# Uso (a partir da pasta API):
+#   python benchmarks/carga.py --tamanhos 10000,100000 --concorrencia 32 \
+#       --requisicoes 2000 --pesos-sinteticos --saida resultados_carga.json
+
+CENARIOS = ["analisar", "ultimo_dado", "ultimos_5_dados", "dados_por_data", "dados_anormais"]
+
+
+# ---------------------------------------------------------------------------
+# PREPARACAO DOS BANCOS
+# ---------------------------------------------------------------------------
+
+def preparar_banco(pasta, linhas, bloco=50000):
+    caminho = os.path.join(pasta, f"carga_{linhas}.db")
+    if os.path.exists(caminho):
+        with sqlite3.connect(caminho) as conn:
+            existentes = conn.execute("SELECT COUNT(*) FROM dados_locais").fetchone()[0]
+        if existentes >= linhas:
+            return caminho
+        os.remove(caminho)
+
+    os.environ["EASY_HEART_DB"] = caminho
+    # app/ NA FRENTE: OS MODULOS DA API TEM PRIORIDADE SOBRE OS SCRIPTS DESTA PASTA
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, PASTA_APP)
+    import database
+    from formato_bat import codificar_batimentos
+    from ingestao import QUERY_INSERCAO
+    from resumos import atualizar_resumos
+    from sinteticos import gerar_linhas
+
+    database.db_path = caminho
+    database.inicializar_db()
+    rng = np.random.default_rng(linhas)
+    inicio = time.perf_counter()
+    with sqlite3.connect(caminho) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        for feitas in range(0, linhas, bloco):
+            n = min(bloco, linhas - feitas)
+            with conn:
+                conn.executemany(QUERY_INSERCAO, gerar_linhas(rng, n, codificar=codificar_batimentos))
+                atualizar_resumos(conn, feitas + 1, feitas + n)
+            print(f"  {caminho}: {feitas + n}/{linhas} linhas", file=sys.stderr)
+    print(f"  populado em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+    return caminho
+
+
+def gerar_pesos_sinteticos(caminho):
+    dimensoes = [141, 32, 16, 8, 16, 32, 141]
+    rng = np.random.default_rng(0)
+    arrays = {"metadados": np.array(json.dumps({
+        "num_camadas": 6,
+        "dimensoes": dimensoes,
+        "ativacoes": ["relu"] * 5 + ["sigmoid"],
+        "origem": "sintetico",
+    }))}
+    for i in range(6):
+        arrays[f"kernel_{i}"] = (rng.standard_normal((dimensoes[i], dimensoes[i + 1])) * 0.2).astype(np.float32)
+        arrays[f"bias_{i}"] = np.zeros(dimensoes[i + 1], dtype=np.float32)
+    np.savez(caminho, **arrays)
+
+
+# ---------------------------------------------------------------------------
+# EXECUCAO DE UM TAMANHO (SUBPROCESSO)
+# ---------------------------------------------------------------------------
+
+def resumir(latencias, erros, duracao):
+    ms = np.asarray(latencias) * 1000.0
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "duracao_s": duracao,
+        "vazao_rps": len(latencias) / duracao if duracao else 0.0,
+        "latencia_ms": {
+            "media": float(ms.mean()) if len(ms) else None,
+            "p50": float(np.percentile(ms, 50)) if len(ms) else None,
+            "p95": float(np.percentile(ms, 95)) if len(ms) else None,
+            "p99": float(np.percentile(ms, 99)) if len(ms) else None,
+            "max": float(ms.max()) if len(ms) else None,
+        },
+    }
+
+
+async def rodar_cenario(cliente, nome, requisicoes, concorrencia, usuarios, semente):
+    from sinteticos import payload_analisar
+
+    rng = np.random.default_rng(semente)
+    hoje = datetime.now()
+    pendentes = iter(range(requisicoes))
+    latencias, erros = [], 0
+
+    def montar():
+        usuario = int(rng.integers(1, usuarios + 1))
+        if nome == "analisar":
+            return "POST", "/analisar", {"json": payload_analisar(rng, usuario)}
+        if nome == "ultimo_dado":
+            return "GET", "/ultimo_dado", {"params": {"user_id": usuario}}
+        if nome == "ultimos_5_dados":
+            return "GET", "/ultimos_5_dados", {"params": {"user_id": usuario}}
+        if nome == "dados_por_data":
+            fim = hoje - timedelta(days=int(rng.integers(0, 60)))
+            inicio = fim - timedelta(days=int(rng.integers(0, 7)))
+            return "GET", "/dados_por_data", {"params": {
+                "data_inicio": inicio.strftime("%Y-%m-%d"),
+                "data_fim": fim.strftime("%Y-%m-%d"),
+                "limit": 100,
+            }}
+        return "GET", "/dados_anormais", {"params": {"limit": 100}}
+
+    async def trabalhador():
+        nonlocal erros
+        for _ in pendentes:
+            metodo, rota, argumentos = montar()
+            inicio = time.perf_counter()
+            resposta = await cliente.request(metodo, rota, **argumentos)
+            latencias.append(time.perf_counter() - inicio)
+            if resposta.status_code >= 400 and resposta.status_code != 404:
+                erros += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return resumir(latencias, erros, time.perf_counter() - inicio)
+
+
+async def executar_interno(args):
+    import httpx
+
+    # app/ NA FRENTE: OS MODULOS DA API TEM PRIORIDADE SOBRE OS SCRIPTS DESTA PASTA
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, PASTA_APP)
+    import main
+
+    resultados = {}
+    async with main.app.router.lifespan_context(main.app):
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+            # O MODELO CARREGA EM SEGUNDO PLANO: ESPERA O /saude/pronto ANTES DE MEDIR
+            prazo = time.perf_counter() + 300
+            while (await cliente.get("/saude/pronto")).status_code != 200:
+                if time.perf_counter() > prazo:
+                    raise SystemExit("O modelo não ficou pronto a tempo")
+                await asyncio.sleep(0.05)
+            resultados["inicializacao"] = (await cliente.get("/saude")).json()
+
+            for i, nome in enumerate(args.cenarios.split(",")):
+                resultados[nome] = await rodar_cenario(
+                    cliente, nome, args.requisicoes, args.concorrencia, args.usuarios, i
+                )
+                print(f"  {nome}: {resultados[nome]['vazao_rps']:.0f} req/s", file=sys.stderr)
+    print(json.dumps(resultados))
+
+
+def executar_tamanho(args, caminho_db, linhas):
+    ambiente = dict(os.environ, EASY_HEART_DB=caminho_db)
+    if args.backend:
+        ambiente["EASY_HEART_BACKEND"] = args.backend
+    if args.pesos_numpy:
+        ambiente["EASY_HEART_PESOS_NUMPY"] = os.path.abspath(args.pesos_numpy)
+    comando = [
+        sys.executable, os.path.abspath(__file__), "--interno",
+        "--cenarios", args.cenarios,
+        "--requisicoes", str(args.requisicoes),
+        "--concorrencia", str(args.concorrencia),
+        "--usuarios", str(args.usuarios),
+    ]
+    print(f"Executando com {linhas} linhas...", file=sys.stderr)
+    saida = subprocess.run(comando, env=ambiente, cwd=PASTA_API, capture_output=True, text=True)
+    sys.stderr.write(saida.stderr[-2000:] if saida.returncode else "")
+    if saida.returncode:
+        raise SystemExit(f"Falha no benchmark com {linhas} linhas")
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def versao_codigo():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=PASTA_API, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga e latência da API")
+    parser.add_argument("--tamanhos", default="10000,100000",
+                        help="linhas dos bancos pré-populados, ex.: 10000,100000,1000000,10000000")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS))
+    parser.add_argument("--requisicoes", type=int, default=2000, help="requisições por cenário")
+    parser.add_argument("--concorrencia", type=int, default=32)
+    parser.add_argument("--usuarios", type=int, default=100)
+    parser.add_argument("--pasta-dados", default=os.path.join(PASTA_API, "benchmarks", "dados"))
+    parser.add_argument("--backend", default=None, help="sobrescreve EASY_HEART_BACKEND")
+    parser.add_argument("--pesos-numpy", default=None, help="sobrescreve EASY_HEART_PESOS_NUMPY")
+    parser.add_argument("--pesos-sinteticos", action="store_true",
+                        help="usa pesos aleatórios no backend numpy (mede só desempenho)")
+    parser.add_argument("--saida", default="resultados_carga.json")
+    parser.add_argument("--interno", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        asyncio.run(executar_interno(args))
+        return
+
+    os.makedirs(args.pasta_dados, exist_ok=True)
+    if args.pesos_sinteticos:
+        args.backend = "numpy"
+        args.pesos_numpy = os.path.join(args.pasta_dados, "pesos_sinteticos.npz")
+        gerar_pesos_sinteticos(args.pesos_numpy)
+
+    relatorio = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "versao": versao_codigo(),
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parametros": {k: v for k, v in vars(args).items() if k != "interno"},
+        "resultados": {},
+    }
+    for linhas in (int(t) for t in args.tamanhos.split(",")):
+        caminho_db = preparar_banco(args.pasta_dados, linhas)
+        relatorio["resultados"][str(linhas)] = executar_tamanho(args, caminho_db, linhas)
+
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.saida}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from backends import BackendNumpy
+from config import CAMINHO_PESOS_NUMPY
+from quantizar_pesos import carregar_janelas, quantizar
+from sinteticos import gerar_batimentos
+from utils import calcular_diagnosticos, normalizar_lote
+
+# COMPARA AS VARIANTES float16 E int8 DO DETECTOR COM O float32
+#
+# Para cada variante mede, sobre os mesmos batimentos:
+#   - desvio da perda MAE em relacao ao float32 (medio, maximo, p99)
+#   - concordancia do diagnostico com os limiares do modelo float32
+#   - vazao (janelas/s) para cada tamanho de lote
+#   - memoria: tamanho do arquivo, bytes dos kernels no formato gravado,
+#     bytes dos pesos na memoria do BackendNumpy, tempo da conversao para
+#     float32 na carga e pico de alocacao (tracemalloc) de um lote de 1024 janelas
+#
+# O BackendNumpy calcula sempre em float32 (os kernels quantizados sao
+# convertidos na carga): memoria e vazao das variantes ficam iguais as do
+# float32, e o ganho do float16/int8 e so no arquivo (disco, download, registro).
+# Sem --db usa batimentos sinteticos (calibracao so com normais).
+#
+# Uso (a partir da pasta API):
+#   python benchmarks/precisao.py --pesos PESO.npz --db dados_locais.db --saida resultados_precisao.json
+#   python benchmarks/precisao.py --pesos PESO.npz --amostras 20000
+
+
+def janelas_sinteticas(rng, n, fracao_anormal):
+    batimentos, _ = gerar_batimentos(rng, n, fracao_anormal)
+    return np.clip(normalizar_lote(batimentos), 0, 1).astype(np.float32)
+
+
+def perdas_em_lotes(backend, janelas, tamanho_lote=1024):
+    return np.concatenate([
+        backend.calcular_perdas(janelas[i:i + tamanho_lote]) for i in range(0, len(janelas), tamanho_lote)
+    ])
+
+
+def medir_vazao(backend, janelas, tamanho_lote, repeticoes):
+    lote = np.ascontiguousarray(janelas[:tamanho_lote])
+    backend.calcular_perdas(lote)
+    chamadas = max(1, 4096 // tamanho_lote)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            backend.calcular_perdas(lote)
+        tempos.append(time.perf_counter() - inicio)
+    return len(lote) * chamadas / float(np.median(tempos))
+
+
+def medir_memoria(backend, caminho, janelas):
+    with np.load(caminho, allow_pickle=False) as arquivo:
+        gravados = [arquivo[f"kernel_{i}"] for i in range(len(backend.kernels))]
+    inicio = time.perf_counter()
+    for kernel in gravados:
+        np.ascontiguousarray(kernel, dtype=np.float32)
+    conversao = time.perf_counter() - inicio
+    arrays = backend.kernels + backend.biases + getattr(backend, "escalas_kernel", [])
+    tracemalloc.start()
+    backend.calcular_perdas(janelas[:1024])
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "arquivo_bytes": os.path.getsize(caminho),
+        "kernels_gravados_bytes": int(sum(k.nbytes for k in gravados)),
+        "pesos_em_memoria_bytes": int(sum(a.nbytes for a in arrays)),
+        "conversao_float32_ms": conversao * 1000 if backend.precisao != "float32" else 0.0,
+        "pico_alocacao_lote_1024_bytes": pico,
+    }
+
+
+def comparar(args):
+    rng = np.random.default_rng(args.semente)
+    if args.db:
+        calibracao = carregar_janelas(args.db, args.calibracao, diagnostico="normal")
+        avaliacao = carregar_janelas(args.db, args.amostras)
+    else:
+        calibracao = janelas_sinteticas(rng, args.calibracao, 0.0)
+        avaliacao = janelas_sinteticas(rng, args.amostras, 0.1)
+    if not len(avaliacao):
+        raise SystemExit("Nenhum batimento para avaliar")
+
+    base = BackendNumpy(args.pesos)
+    perdas_base = perdas_em_lotes(base, avaliacao)
+    diagnosticos_base = calcular_diagnosticos(perdas_base, base.limiares)
+    tamanhos = [int(t) for t in args.lotes.split(",")]
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        variantes = {"float32": args.pesos}
+        for precisao in ("float16", "int8"):
+            variantes[precisao] = os.path.join(pasta, f"{precisao}.npz")
+            quantizar(args.pesos, variantes[precisao], precisao, calibracao, args.percentil, args.margem)
+
+        for precisao, caminho in variantes.items():
+            backend = BackendNumpy(caminho)
+            perdas = perdas_em_lotes(backend, avaliacao)
+            desvio = np.abs(perdas - perdas_base)
+            diagnosticos = calcular_diagnosticos(perdas, base.limiares)
+            mudancas = {}
+            for antes, depois in zip(diagnosticos_base[diagnosticos != diagnosticos_base],
+                                     diagnosticos[diagnosticos != diagnosticos_base]):
+                mudancas[f"{antes}->{depois}"] = mudancas.get(f"{antes}->{depois}", 0) + 1
+            resultados[precisao] = {
+                "desvio_perda": {
+                    "medio": float(desvio.mean()),
+                    "p99": float(np.percentile(desvio, 99)),
+                    "maximo": float(desvio.max()),
+                    "relativo_medio": float(np.mean(desvio / np.maximum(perdas_base, 1e-12))),
+                },
+                "concordancia_diagnostico": float(np.mean(diagnosticos == diagnosticos_base)),
+                "mudancas_diagnostico": mudancas,
+                "janelas_por_s": {str(t): medir_vazao(backend, avaliacao, t, args.repeticoes) for t in tamanhos},
+                "memoria": medir_memoria(backend, caminho, avaliacao),
+            }
+            print(f"  {precisao}: concordância {resultados[precisao]['concordancia_diagnostico']:.4f}, "
+                  f"desvio médio {resultados[precisao]['desvio_perda']['medio']:.2e}", file=sys.stderr)
+
+    return {
+        "maquina": {"processador": platform.processor() or platform.machine(), "cpus": os.cpu_count(),
+                    "numpy": np.__version__},
+        "pesos": args.pesos,
+        "origem_batimentos": args.db or "sinteticos",
+        "amostras": int(len(avaliacao)),
+        "amostras_calibracao": int(len(calibracao)),
+        "limiares": base.limiares,
+        "observacao": "as contas sao sempre em float32: float16/int8 reduzem so o arquivo, "
+                      "nao a memoria nem o tempo de inferencia",
+        "resultados": resultados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o Detector float32 com as variantes float16 e int8")
+    parser.add_argument("--pesos", default=CAMINHO_PESOS_NUMPY, help="artefato float32")
+    parser.add_argument("--db", default=None, help="banco com batimentos gravados (padrão: sintéticos)")
+    parser.add_argument("--amostras", type=int, default=20000)
+    parser.add_argument("--calibracao", type=int, default=5000)
+    parser.add_argument("--percentil", type=float, default=99.99)
+    parser.add_argument("--margem", type=float, default=2.0)
+    parser.add_argument("--lotes", default="1,32,1024")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", default=None)
+    args = parser.parse_args()
+
+    relatorio = comparar(args)
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+        print(f"Resultados gravados em {args.saida}", file=sys.stderr)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
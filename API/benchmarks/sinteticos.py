@@ -0,0 +1,76 @@
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# GERADORES DE DADOS SINTETICOS PARA OS BENCHMARKS (SEM REDE E SEM DATASET EXTERNO)
+
+TAMANHO = 141
+
+
+def _gauss(t, centro, largura, amplitude):
+    return amplitude * np.exp(-((t - centro) / largura) ** 2)
+
+
+# BATIMENTOS CRUS NA ESCALA DO ADC DO ESP32 (0..4095), UM POR LINHA
+def gerar_batimentos(rng, n, fracao_anormal=0.1):
+    t = np.linspace(0.0, 1.0, TAMANHO)[None, :]
+    anormal = rng.random((n, 1)) < fracao_anormal
+
+    # PQRST NORMAL COM PEQUENAS VARIACOES DE POSICAO E AMPLITUDE
+    deslocamento = rng.normal(0, 0.01, (n, 1))
+    sinal = (
+        _gauss(t, 0.20 + deslocamento, 0.030, 0.15)
+        + _gauss(t, 0.30 + deslocamento, 0.008, -0.10)
+        + _gauss(t, 0.33 + deslocamento, 0.012, rng.normal(1.0, 0.05, (n, 1)))
+        + _gauss(t, 0.36 + deslocamento, 0.010, -0.20)
+        + _gauss(t, 0.60 + deslocamento, 0.050, 0.30)
+    )
+
+    # ANORMAIS: QRS LARGO, ONDA T INVERTIDA E SUPRADESNIVEL DE ST
+    sinal_anormal = (
+        _gauss(t, 0.33 + deslocamento, 0.045, 0.8)
+        + _gauss(t, 0.60 + deslocamento, 0.060, -0.35)
+        + 0.25 * ((t > 0.38) & (t < 0.55))
+    )
+    sinal = np.where(anormal, sinal_anormal, sinal)
+    sinal += rng.normal(0, 0.02, (n, TAMANHO))
+
+    adc = 1500 + 1800 * sinal
+    return np.clip(np.rint(adc), 0, 4095).astype(np.int64), anormal.ravel()
+
+
+def payload_analisar(rng, user_id):
+    batimentos, _ = gerar_batimentos(rng, 1)
+    return {
+        "user_id": int(user_id),
+        "batimentos": batimentos[0].tolist(),
+        "spo2": float(rng.integers(90, 100)),
+        "press": float(rng.integers(100, 140)),
+        "status_local": "Estável",
+    }
+
+
+# LINHAS PRONTAS PARA QUERY_INSERCAO, COM DATAS ESPALHADAS PELOS ULTIMOS `dias`
+def gerar_linhas(rng, n, usuarios=100, dias=90, codificar=None):
+    batimentos, anormal = gerar_batimentos(rng, n)
+    minimo = batimentos.min(axis=1, keepdims=True)
+    maximo = batimentos.max(axis=1, keepdims=True)
+    normalizados = ((batimentos - minimo) / np.maximum(maximo - minimo, 1)).astype(np.float32)
+    perdas = np.where(anormal, rng.uniform(0.35, 0.7, n), rng.uniform(0.05, 0.32, n))
+    inicio = datetime.now() - timedelta(days=dias)
+    segundos = np.sort(rng.integers(0, dias * 86400, n))
+    usuarios_linha = rng.integers(1, usuarios + 1, n)
+
+    linhas = []
+    for i in range(n):
+        momento = inicio + timedelta(seconds=int(segundos[i]))
+        perda = float(perdas[i])
+        diagnostico = "normal" if perda < 0.3 else ("suspeito" if perda < 0.4 else "anormal")
+        bat = codificar(normalizados[i]) if codificar else json.dumps(normalizados[i].tolist())
+        linhas.append((
+            int(usuarios_linha[i]), bat, 97.0, 120.0, "Estável", diagnostico, perda,
+            momento.strftime("%Y-%m-%d"), momento.strftime("%H:%M:%S"),
+            momento.strftime("%Y-%m-%d %H:%M:%S"),
+        ))
+    return linhas
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# OS MODULOS DA API SAO IMPORTADOS COMO NO SERVIDOR (A PARTIR DE app/)
+PASTA_API = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PASTA_API, "app"))
+sys.path.insert(1, os.path.join(PASTA_API, "benchmarks"))
@@ -0,0 +1,104 @@
+import sqlite3
+
+import numpy as np
+
+from cache_recentes import CacheRecentes, calcular_etag, incrementar_geracao, ler_geracao
+from database import inicializar_db
+from exportar_pesos import salvar_artefato
+from formato_bat import codificar_batimentos
+from particoes import arquivar_mes, ler_colunas
+from repontuar import repontuar
+
+
+def registro(id_, user_id=1, diagnostico="normal"):
+    return {"id": id_, "user_id": user_id, "diagnostico_ia": diagnostico}
+
+
+def test_mudanca_de_geracao_esvazia_o_cache():
+    cache = CacheRecentes(capacidade_global=10, capacidade_usuario=5)
+    cache.sincronizar(0)
+    cache.carregar([registro(1), registro(2)], geracao=0)
+    cache.carregar([registro(2)], user_id=1, geracao=0)
+    assert [r["id"] for r in cache.ultimos(2)] == [2, 1]
+
+    cache.sincronizar(1)
+    assert cache.ultimos(1) is None
+    assert cache.ultimos(1, user_id=1) is None
+
+    # CARGA LIDA ANTES DA MUDANCA NAO VOLTA PARA O CACHE
+    cache.carregar([registro(2)], geracao=0)
+    assert cache.ultimos(1) is None
+    cache.carregar([registro(2, diagnostico="anormal")], geracao=1)
+    assert cache.ultimos(1)[0]["diagnostico_ia"] == "anormal"
+
+
+def test_cache_guarda_no_maximo_maximo_usuarios():
+    cache = CacheRecentes(capacidade_global=10, capacidade_usuario=5, maximo_usuarios=2)
+    cache.sincronizar(0)
+    cache.carregar([registro(1, user_id=1)], user_id=1, geracao=0)
+    cache.carregar([registro(2, user_id=2)], user_id=2, geracao=0)
+    assert cache.ultimos(1, user_id=1) is not None
+
+    # O PACIENTE 2 E O MENOS USADO: SAI QUANDO CHEGA O 3 E VOLTA A SER LIDO DO BANCO
+    cache.adicionar([registro(3, user_id=3)])
+    assert cache.ultimos(1, user_id=2) is None
+    assert [r["id"] for r in cache.ultimos(1, user_id=1)] == [1]
+    assert len(cache._usuarios) == 2
+
+
+def test_etag_muda_com_a_geracao():
+    registros = [registro(7)]
+    assert calcular_etag(registros, 1, geracao=0) != calcular_etag(registros, 1, geracao=1)
+
+
+def inserir(conn, data, quantidade):
+    for _ in range(quantidade):
+        conn.execute(
+            "INSERT INTO dados_locais (user_id, bat, spo2, press, status_local, diagnostico_ia, perda, data, "
+            "hora, data_hora) VALUES (1, ?, 97, 120, 'normal', 'antigo', 9.0, ?, '08:00:00', ?)",
+            (codificar_batimentos(np.linspace(0, 1, 141, dtype=np.float32)), data, f"{data} 08:00:00")
+        )
+
+
+def criar_pesos(tmp_path):
+    rng = np.random.default_rng(0)
+    camadas = [(rng.normal(0, 0.1, (141, 16)).astype(np.float32), np.zeros(16, np.float32)),
+               (rng.normal(0, 0.1, (16, 141)).astype(np.float32), np.zeros(141, np.float32))]
+    pesos = str(tmp_path / "pesos.npz")
+    salvar_artefato(pesos, camadas, "teste")
+    return pesos
+
+
+def test_repontuar_incrementa_a_geracao(tmp_path):
+    caminho = str(tmp_path / "dados.db")
+    inicializar_db(caminho)
+    with sqlite3.connect(caminho) as conn:
+        inserir(conn, "2026-03-10", 3)
+        incrementar_geracao(conn)
+        antes = ler_geracao(conn)
+
+    repontuar(caminho, "numpy", criar_pesos(tmp_path), "numpy:teste", processos=1, resumos=False)
+    with sqlite3.connect(caminho) as conn:
+        assert ler_geracao(conn) > antes
+        assert "antigo" not in {d for (d,) in conn.execute("SELECT diagnostico_ia FROM dados_locais")}
+
+
+def test_repontuar_regrava_os_meses_arquivados(tmp_path):
+    caminho = str(tmp_path / "dados.db")
+    inicializar_db(caminho)
+    with sqlite3.connect(caminho) as conn:
+        inserir(conn, "2026-03-10", 2)
+        inserir(conn, "2026-04-10", 1)
+        arquivar_mes(conn, "2026-03", str(tmp_path / "arq"))
+
+    ponto = repontuar(caminho, "numpy", criar_pesos(tmp_path), "numpy:teste", processos=1)
+    assert ponto["atualizadas"] == 3 and ponto["meses"] == ["2026-03"]
+    colunas = ler_colunas(str(tmp_path / "arq" / "2026-03.npz"))
+    assert "antigo" not in set(colunas["diagnostico_ia"].tolist())
+    assert (colunas["perda"] != 9.0).all()
+    with sqlite3.connect(caminho) as conn:
+        # OS RESUMOS DO MES ARQUIVADO SAEM DA PARTICAO JA REPONTUADA
+        perda_maxima = conn.execute(
+            "SELECT MAX(max_perda) FROM resumo_dia WHERE periodo LIKE '2026-03-%'"
+        ).fetchone()[0]
+        assert perda_maxima == float(colunas["perda"].max())
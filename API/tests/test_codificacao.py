@@ -0,0 +1,49 @@
+import base64
+
+import numpy as np
+import pytest
+
+import codificacao
+from codificacao import Codificacao, MIDIA_JSON, MIDIA_MSGPACK, codificar, negociar
+
+msgpack = pytest.importorskip("msgpack")
+
+
+@pytest.mark.parametrize("accept, midia", [
+    (None, MIDIA_JSON),
+    ("", MIDIA_JSON),
+    ("*/*", MIDIA_JSON),
+    ("application/*", MIDIA_JSON),
+    ("application/msgpack", MIDIA_MSGPACK),
+    ("application/x-msgpack", MIDIA_MSGPACK),
+    ("Application/MsgPack", MIDIA_MSGPACK),
+    ("application/json, application/msgpack", MIDIA_JSON),
+    ("application/json;q=0.5, application/msgpack", MIDIA_MSGPACK),
+    ("application/msgpack;q=0, */*;q=0.1", MIDIA_JSON),
+    ("text/html, application/x-msgpack;q=0.9", MIDIA_MSGPACK),
+])
+def test_negociar(accept, midia):
+    assert negociar(accept) == midia
+
+
+@pytest.mark.parametrize("accept", ["text/html", "application/xml", "application/json;q=0", "*/*;q=abc"])
+def test_negociar_sem_formato_aceitavel(accept):
+    assert negociar(accept) is None
+
+
+def test_negociar_sem_msgpack_instalado(monkeypatch):
+    monkeypatch.setattr(codificacao, "msgpack", None)
+    assert negociar("application/msgpack") is None
+    assert negociar("application/msgpack, application/json;q=0.1") == MIDIA_JSON
+
+
+def test_amostras_em_base64_e_f32():
+    batimentos = np.linspace(0, 4095, 141, dtype=np.float32)
+    registro = {"id": 1, "batimentos": batimentos, "reconstrucao": None}
+
+    texto = Codificacao(MIDIA_JSON, "base64").registro(registro)["batimentos"]
+    np.testing.assert_array_equal(np.frombuffer(base64.b64decode(texto), dtype="<f4"), batimentos)
+
+    corpo = msgpack.unpackb(codificar([Codificacao(MIDIA_MSGPACK, "f32").registro(registro)], MIDIA_MSGPACK))
+    np.testing.assert_array_equal(np.frombuffer(corpo[0]["batimentos"], dtype="<f4"), batimentos)
+    assert corpo[0]["reconstrucao"] is None
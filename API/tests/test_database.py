@@ -0,0 +1,43 @@
+import multiprocessing
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from database import inicializar_db, migrar_data_hora
+
+
+def test_migrar_data_hora_com_ids_esparsos(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "antigo.db"))
+    conn.execute("CREATE TABLE dados_locais (id INTEGER PRIMARY KEY, data TEXT, hora TEXT)")
+    # ids DE FRAGMENTOS: (seq << 6) | slot, NA CASA DOS 10^14
+    ids = [((1_700_000_000_000 * 16 + i) << 6) | 3 for i in range(5)]
+    conn.executemany(
+        "INSERT INTO dados_locais (id, data, hora) VALUES (?, '2026-03-10', ?)",
+        [(id_, f"08:00:0{i}") for i, id_ in enumerate(ids)]
+    )
+    conn.commit()
+
+    migrar_data_hora(conn, bloco=2)
+    assert [d for (d,) in conn.execute("SELECT data_hora FROM dados_locais ORDER BY id")] == [
+        f"2026-03-10 08:00:0{i}" for i in range(5)
+    ]
+    conn.close()
+
+
+def test_varios_processos_inicializam_o_mesmo_banco(tmp_path):
+    caminho = str(tmp_path / "antigo.db")
+    with sqlite3.connect(caminho) as conn:
+        conn.execute("CREATE TABLE dados_locais (id INTEGER PRIMARY KEY, user_id INT, bat TEXT, spo2 FLOAT, "
+                     "press FLOAT, status_local TEXT, diagnostico_ia TEXT, perda FLOAT, data TEXT, hora TEXT)")
+        conn.executemany(
+            "INSERT INTO dados_locais (user_id, diagnostico_ia, perda, data, hora) "
+            "VALUES (1, 'normal', 0.1, '2026-03-10', '08:00:00')", [()] * 100
+        )
+
+    # COMO OS WORKERS DO --producao: TODOS MIGRAM AO MESMO TEMPO, UM DE CADA VEZ PELA TRAVA
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(4, mp_context=contexto) as pool:
+        list(pool.map(inicializar_db, [caminho] * 4))
+
+    with sqlite3.connect(caminho) as conn:
+        assert conn.execute("SELECT SUM(registros) FROM resumo_dia").fetchone()[0] == 100
+        assert not conn.execute("SELECT 1 FROM dados_locais WHERE data_hora IS NULL").fetchone()
@@ -0,0 +1,44 @@
+import json
+import sqlite3
+import threading
+
+import numpy as np
+
+from database import inicializar_db
+from exportacao import gerar_ndjson
+from formato_bat import codificar_batimentos
+from fragmentos import ArmazenamentoFragmentado
+
+
+def test_exportacao_nao_prende_conexao_do_pool(tmp_path):
+    caminho = str(tmp_path / "dados.db")
+    inicializar_db(caminho)
+    with sqlite3.connect(caminho) as conn:
+        for user_id in (1, 2, 3):
+            conn.execute(
+                "INSERT INTO dados_locais (user_id, bat, spo2, press, status_local, diagnostico_ia, perda, data, "
+                "hora, data_hora) VALUES (?, ?, 97, 120, 'normal', 'normal', 0.1, '2026-03-10', '08:00:00', "
+                "'2026-03-10 08:00:00')",
+                (user_id, codificar_batimentos(np.zeros(141, dtype=np.float32)))
+            )
+    armazenamento = ArmazenamentoFragmentado.unico(caminho)
+    banco = armazenamento.bancos["principal"]
+    banco.max_leitura = 1
+
+    # DOWNLOAD PARADO NO MEIO
+    gerador = gerar_ndjson(armazenamento, ["user_id", "batimentos"], "2026-03-01", "2026-03-31", bloco=1)
+    primeira = json.loads(next(gerador))
+    assert primeira["user_id"] == 3 and len(primeira["batimentos"]) == 141
+
+    # A UNICA CONEXAO DO POOL CONTINUA LIVRE PARA AS OUTRAS REQUISICOES
+    def ler():
+        with banco.leitura() as conn:
+            conn.execute("SELECT 1").fetchone()
+
+    leitor = threading.Thread(target=ler, daemon=True)
+    leitor.start()
+    leitor.join(2)
+    assert not leitor.is_alive()
+
+    assert [json.loads(linha)["user_id"] for linha in gerador] == [2, 1]
+    armazenamento.fechar()
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pytest
+
+from backends import BackendNumpy
+from exportar_pesos import exportar, ler_camadas_h5, verificar_paridade
+
+PESOS_H5 = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "PESO.weights.h5")
+
+
+@pytest.fixture(scope="module")
+def artefato(tmp_path_factory):
+    saida = str(tmp_path_factory.mktemp("pesos") / "PESO.npz")
+    return saida, exportar(PESOS_H5, saida)
+
+
+def test_exportar_guarda_as_camadas_do_h5(artefato):
+    saida, metadados = artefato
+    camadas = ler_camadas_h5(PESOS_H5)
+    assert metadados["num_camadas"] == len(camadas)
+    assert metadados["dimensoes"][0] == metadados["dimensoes"][-1]
+    with np.load(saida) as arquivo:
+        for i, (kernel, bias) in enumerate(camadas):
+            np.testing.assert_array_equal(arquivo[f"kernel_{i}"], kernel)
+            np.testing.assert_array_equal(arquivo[f"bias_{i}"], bias)
+
+
+def test_backend_numpy_no_lote_fixo(artefato):
+    saida, metadados = artefato
+    janela = metadados["dimensoes"][0]
+    backend = BackendNumpy(saida, tamanho_janela=janela)
+    lote = np.random.default_rng(0).random((32, janela), dtype=np.float32)
+
+    # MESMAS CONTAS DO Detector: Dense + relu, E sigmoid NA ULTIMA CAMADA
+    ativacao = lote.astype(np.float64)
+    for i, (kernel, bias) in enumerate(ler_camadas_h5(PESOS_H5)):
+        ativacao = ativacao @ kernel + bias
+        ativacao = np.maximum(ativacao, 0) if i < metadados["num_camadas"] - 1 else 1 / (1 + np.exp(-ativacao))
+
+    np.testing.assert_allclose(backend.reconstruir(lote), ativacao, atol=1e-5)
+    np.testing.assert_allclose(backend.calcular_perdas(lote), np.mean(np.abs(lote - ativacao), axis=1), atol=1e-5)
+
+
+def test_paridade_keras_numpy(artefato):
+    pytest.importorskip("tensorflow")
+    saida, _ = artefato
+    diferenca, diferenca_perda, ok = verificar_paridade(PESOS_H5, saida, amostras=64)
+    assert ok, f"reconstrução {diferenca:.3e}, perda {diferenca_perda:.3e}"
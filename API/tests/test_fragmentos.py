@@ -0,0 +1,81 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+import fragmentos
+from formato_bat import codificar_batimentos
+from fragmentos import BITS_FRAGMENTO, caminho_fragmento, gerar_ids, iniciar, mover_usuarios
+from resumos import reconstruir_resumos
+
+
+def test_gerar_ids_guarda_o_slot_nos_bits_baixos(tmp_path):
+    iniciar(str(tmp_path), 1)
+    conn = sqlite3.connect(caminho_fragmento(str(tmp_path), "f0"))
+    ids = gerar_ids(conn, 5, 37)
+    assert [i & (2 ** BITS_FRAGMENTO - 1) for i in ids] == [37] * 5
+    assert np.all(np.diff(ids) == 2 ** BITS_FRAGMENTO)
+    assert max(ids) < 2 ** 53
+
+
+def test_gerar_ids_cresce_mesmo_com_o_relogio_voltando(tmp_path, monkeypatch):
+    iniciar(str(tmp_path), 1)
+    conn = sqlite3.connect(caminho_fragmento(str(tmp_path), "f0"))
+    agora = 1_800_000_000_000_000_000
+    monkeypatch.setattr(fragmentos.time, "time_ns", lambda: agora)
+    primeiros = gerar_ids(conn, 3, 1)
+    agora -= 60 * 10 ** 9
+    segundos = gerar_ids(conn, 3, 1)
+    assert segundos[0] > primeiros[-1]
+    assert gerar_ids(conn, 1, 2)[0] >> BITS_FRAGMENTO == (segundos[-1] >> BITS_FRAGMENTO) + 1
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    pasta = str(tmp_path / "fragmentos")
+    iniciar(pasta, 2, pasta_arquivo=str(tmp_path / "arquivo"))
+    with sqlite3.connect(caminho_fragmento(pasta, "f0")) as conn:
+        ids = gerar_ids(conn, 6, 0)
+        for id_, user_id in zip(ids, [1, 1, 2, 2, 3, 3]):
+            conn.execute(
+                "INSERT INTO dados_locais (id, user_id, bat, spo2, press, status_local, diagnostico_ia, perda, "
+                "data, hora, data_hora) VALUES (?, ?, ?, 97, 120, 'normal', 'normal', 0.1, "
+                "'2026-03-10', '08:00:00', '2026-03-10 08:00:00')",
+                (id_, user_id, codificar_batimentos(np.zeros(141, dtype=np.float32)))
+            )
+        reconstruir_resumos(conn)
+    return pasta
+
+
+def contar(pasta, nome):
+    with sqlite3.connect(caminho_fragmento(pasta, nome)) as conn:
+        return (
+            conn.execute("SELECT COUNT(*) FROM dados_locais").fetchone()[0],
+            conn.execute("SELECT COALESCE(SUM(registros), 0) FROM resumo_dia").fetchone()[0],
+        )
+
+
+def test_mover_usuarios(pasta, tmp_path):
+    linhas, _ = mover_usuarios(pasta, "f0", "f1", [1, 2], str(tmp_path / "arquivo"))
+    assert linhas == 4
+    assert contar(pasta, "f0") == (2, 2)
+    assert contar(pasta, "f1") == (4, 4)
+
+
+def test_mover_usuarios_interrompido_pode_ser_repetido(pasta, tmp_path, monkeypatch):
+    # QUEDA DEPOIS DA COPIA, ANTES DE APAGAR DA ORIGEM: AS DUAS PONTAS TEM AS LINHAS
+    def falhar(*args):
+        raise RuntimeError("queda")
+
+    monkeypatch.setattr(fragmentos, "apagar_resumos", falhar)
+    with pytest.raises(RuntimeError):
+        mover_usuarios(pasta, "f0", "f1", [1, 2], str(tmp_path / "arquivo"))
+    assert contar(pasta, "f0") == (6, 6)
+    assert contar(pasta, "f1") == (4, 4)
+
+    # REPETIR NAO DUPLICA LINHAS NEM SOMA OS RESUMOS DE NOVO
+    monkeypatch.undo()
+    linhas, _ = mover_usuarios(pasta, "f0", "f1", [1, 2], str(tmp_path / "arquivo"))
+    assert linhas == 4
+    assert contar(pasta, "f0") == (2, 2)
+    assert contar(pasta, "f1") == (4, 4)
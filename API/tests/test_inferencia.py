@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+
+from inferencia import AgendadorInferencia, AgendadorParado
+
+
+def test_agendador_parado_falha_na_hora():
+    agendador = AgendadorInferencia(lambda lote: lote.sum(axis=1))
+    with pytest.raises(AgendadorParado):
+        agendador.submeter(np.ones(141)).result(timeout=0)
+
+    agendador.iniciar()
+    assert agendador.submeter(np.ones(141)).result(timeout=5) == 141
+    agendador.parar()
+    with pytest.raises(AgendadorParado):
+        agendador.submeter(np.ones(141)).result(timeout=0)
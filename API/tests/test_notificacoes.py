@@ -0,0 +1,57 @@
+import sqlite3
+
+from database import inicializar_db
+from fragmentos import ArmazenamentoFragmentado
+from notificacoes import LeitorEventosBanco
+
+
+class HubFalso:
+    def __init__(self):
+        self.assinantes = 0
+        self.publicados = []
+
+    def publicar(self, gravados):
+        self.publicados += gravados
+
+
+def inserir(caminho, user_id, diagnostico="normal"):
+    with sqlite3.connect(caminho) as conn:
+        conn.execute(
+            "INSERT INTO dados_locais (user_id, spo2, press, status_local, diagnostico_ia, perda, data, hora, "
+            "data_hora) VALUES (?, 97, 120, 'normal', ?, 0.1, '2026-03-10', '08:00:00', '2026-03-10 08:00:00')",
+            (user_id, diagnostico)
+        )
+
+
+def test_leitor_publica_cada_linha_nova_uma_vez(tmp_path):
+    caminho = str(tmp_path / "dados.db")
+    inicializar_db(caminho)
+    inserir(caminho, 1)
+    armazenamento = ArmazenamentoFragmentado.unico(caminho)
+    hub = HubFalso()
+    leitor = LeitorEventosBanco(hub, armazenamento, ativo=True, bloco=2)
+    leitor._ultimos = {"principal": leitor._maior_id(armazenamento.bancos["principal"])}
+
+    # SEM ASSINANTES SO ACOMPANHA O MAIOR id
+    inserir(caminho, 2)
+    leitor.executar()
+    assert hub.publicados == []
+
+    # GRAVADAS POR OUTRO PROCESSO (OUTRA CONEXAO): PUBLICADAS EM ORDEM, EM BLOCOS, SEM REPETIR
+    hub.assinantes = 1
+    for user_id in (3, 4, 5):
+        inserir(caminho, user_id, "anormal")
+    leitor.executar()
+    leitor.executar()
+    assert [(id_, valores[0], valores[5]) for id_, valores in hub.publicados] == [
+        (3, 3, "anormal"), (4, 4, "anormal"), (5, 5, "anormal")
+    ]
+    armazenamento.fechar()
+
+
+def test_leitor_inativo_nao_sobe_thread(tmp_path):
+    caminho = str(tmp_path / "dados.db")
+    inicializar_db(caminho)
+    leitor = LeitorEventosBanco(HubFalso(), ArmazenamentoFragmentado.unico(caminho))
+    leitor.iniciar()
+    assert leitor._thread is None
@@ -0,0 +1,175 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from consultas import consulta_por_data
+from database import inicializar_db
+from formato_bat import codificar_batimentos
+from fragmentos import juntar_ordenados
+import particoes
+from resumos import atualizar_resumos, reconstruir_resumos
+from particoes import (
+    LeitorArquivo, arquivar_mes, condicao_nao_arquivadas, formatar_arquivado, gravar_particao, meses_arquivados,
+    _juntar, _filtrar, _para_colunas, ler_colunas,
+)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    caminho = str(tmp_path / "dados.db")
+    inicializar_db(caminho)
+    conexao = sqlite3.connect(caminho)
+    yield conexao
+    conexao.close()
+
+
+def inserir(conn, data_hora, user_id=1, quantidade=1):
+    data, hora = data_hora.split(" ")
+    with conn:
+        for _ in range(quantidade):
+            conn.execute(
+                "INSERT INTO dados_locais (user_id, bat, spo2, press, status_local, diagnostico_ia, perda, "
+                "data, hora, data_hora) VALUES (?, ?, 97, 120, 'normal', 'normal', 0.1, ?, ?, ?)",
+                (user_id, codificar_batimentos(np.arange(141, dtype=np.float32)), data, hora, data_hora)
+            )
+
+
+# O QUE /dados_por_data DEVOLVE DE UM BANCO (MESMA REGRA DE endpoints.buscar_por_data)
+def ler_tudo(conn, arquivo, data_inicio="2026-01-01", data_fim="2026-12-31", limite=10000):
+    meses = meses_arquivados(conn, data_inicio, data_fim)
+    query, parametros = consulta_por_data(data_inicio, data_fim, limite, None, None, condicao_nao_arquivadas(meses))
+    banco = [
+        {"id": r[0], "data": r[8], "hora": r[9]} for r in conn.execute(query, parametros).fetchall()
+    ]
+    arquivados = arquivo.buscar_por_data(conn, data_inicio, data_fim, limite)
+    return juntar_ordenados([banco, arquivados], lambda r: (r["data"], r["hora"], r["id"]), limite)
+
+
+def ids(registros):
+    return [r["id"] for r in registros]
+
+
+def todos_os_ids(conn):
+    return {i for (i,) in conn.execute("SELECT id FROM dados_locais")}
+
+
+def test_juntar_descarta_ids_repetidos(conn):
+    inserir(conn, "2026-03-10 08:00:00", quantidade=3)
+    linhas = conn.execute(f"SELECT {particoes._COLUNAS_BANCO} FROM dados_locais ORDER BY id").fetchall()
+    antigas, novas = _para_colunas(linhas[:2]), _para_colunas(linhas[1:])
+    juntas = _juntar(antigas, novas)
+    assert sorted(juntas["id"]) == [1, 2, 3]
+    assert juntas["bat_offsets"][-1] == len(juntas["bat_valores"]) == 3 * 141
+
+
+def test_filtrar_mantem_os_batimentos_de_cada_linha(conn):
+    inserir(conn, "2026-03-10 08:00:00", quantidade=4)
+    linhas = conn.execute(f"SELECT {particoes._COLUNAS_BANCO} FROM dados_locais ORDER BY id").fetchall()
+    colunas = _para_colunas(linhas)
+    colunas["bat_valores"] = colunas["bat_valores"] + np.repeat(np.arange(4) * 1000, 141).astype(np.float32)
+    filtradas = _filtrar(colunas, np.array([False, True, False, True]))
+    assert list(filtradas["id"]) == [2, 4]
+    np.testing.assert_array_equal(filtradas["bat_valores"][:141], np.arange(141) + 1000)
+    np.testing.assert_array_equal(filtradas["bat_valores"][141:], np.arange(141) + 3000)
+
+
+def test_arquivar_mes_em_blocos(conn, tmp_path):
+    inserir(conn, "2026-03-10 08:00:00", quantidade=7)
+    assert arquivar_mes(conn, "2026-03", str(tmp_path / "arq"), bloco=3) == 7
+    assert not todos_os_ids(conn)
+    colunas = ler_colunas(str(tmp_path / "arq" / "2026-03.npz"))
+    assert list(colunas["id"]) == list(range(1, 8))
+    assert list(colunas["bat_offsets"]) == [141 * i for i in range(8)]
+
+
+def test_arquivar_mes_mais_novo_nao_esconde_os_anteriores(conn, tmp_path):
+    inserir(conn, "2026-03-10 08:00:00", quantidade=2)
+    inserir(conn, "2026-04-10 08:00:00", quantidade=2)
+    inserir(conn, "2026-05-10 08:00:00", quantidade=2)
+    esperados = sorted(todos_os_ids(conn), reverse=True)
+
+    # --mes DE UM MES NO MEIO: MARCO E MAIO CONTINUAM NO BANCO E VISIVEIS
+    arquivar_mes(conn, "2026-04", str(tmp_path / "arq"))
+    assert ids(ler_tudo(conn, LeitorArquivo())) == esperados
+
+
+def test_linhas_atrasadas_de_mes_arquivado_continuam_visiveis(conn, tmp_path):
+    pasta = str(tmp_path / "arq")
+    inserir(conn, "2026-03-10 08:00:00", quantidade=3)
+    arquivar_mes(conn, "2026-03", pasta)
+    inserir(conn, "2026-03-05 12:00:00")
+    inserir(conn, "2026-04-01 00:00:00")
+    arquivo = LeitorArquivo()
+    assert ids(ler_tudo(conn, arquivo)) == [5, 3, 2, 1, 4]
+
+    # O PROXIMO ARQUIVAMENTO DO MES LEVA A LINHA ATRASADA PARA A PARTICAO
+    assert arquivar_mes(conn, "2026-03", pasta) == 1
+    assert todos_os_ids(conn) == {5}
+    assert ids(ler_tudo(conn, arquivo)) == [5, 3, 2, 1, 4]
+
+
+def test_queda_entre_o_npz_e_o_delete_nao_duplica(conn, tmp_path, monkeypatch):
+    pasta = str(tmp_path / "arq")
+    inserir(conn, "2026-03-10 08:00:00", quantidade=3)
+    linhas = conn.execute(f"SELECT {particoes._COLUNAS_BANCO} FROM dados_locais ORDER BY id").fetchall()
+
+    # .npz GRAVADO, CATALOGO E DELETE NAO: AS LINHAS SO APARECEM UMA VEZ (PELO BANCO)
+    gravar_particao(conn, "2026-03", _para_colunas(linhas), pasta)
+    with conn:
+        conn.execute("DELETE FROM particoes_arquivadas")
+    arquivo = LeitorArquivo()
+    assert ids(ler_tudo(conn, arquivo)) == [3, 2, 1]
+
+    # CATALOGO GRAVADO, DELETE NAO: AS LINHAS SO APARECEM UMA VEZ (PELO ARQUIVO)
+    gravar_particao(conn, "2026-03", _para_colunas(linhas), pasta)
+    assert ids(ler_tudo(conn, arquivo)) == [3, 2, 1]
+
+    # REFAZER O ARQUIVAMENTO NAO REPETE ids NA PARTICAO
+    assert arquivar_mes(conn, "2026-03", pasta) == 3
+    assert sorted(ler_colunas(f"{pasta}/2026-03.npz")["id"]) == [1, 2, 3]
+    assert meses_arquivados(conn) == {"2026-03": 3}
+    assert ids(ler_tudo(conn, arquivo)) == [3, 2, 1]
+
+
+def test_paginas_intercalam_banco_e_arquivo(conn, tmp_path):
+    pasta = str(tmp_path / "arq")
+    for dia in range(1, 6):
+        inserir(conn, f"2026-03-0{dia} 08:00:00")
+    arquivar_mes(conn, "2026-03", pasta)
+    inserir(conn, "2026-03-03 12:00:00")
+    arquivo = LeitorArquivo()
+    assert ids(ler_tudo(conn, arquivo, limite=3)) == [5, 4, 6]
+
+
+def test_reconstruir_resumos_nao_conta_linhas_atrasadas_duas_vezes(conn, tmp_path):
+    def registros_no_mes():
+        return conn.execute(
+            "SELECT SUM(registros) FROM resumo_dia WHERE periodo LIKE '2026-03-%'"
+        ).fetchone()[0]
+
+    inserir(conn, "2026-03-10 08:00:00", quantidade=3)
+    reconstruir_resumos(conn)
+    arquivar_mes(conn, "2026-03", str(tmp_path / "arq"))
+
+    # LINHA ATRASADA DO MES ARQUIVADO, SOMADA AOS RESUMOS COMO NA INGESTAO
+    inserir(conn, "2026-03-05 12:00:00")
+    with conn:
+        atualizar_resumos(conn, 4, 4)
+    assert registros_no_mes() == 4
+
+    reconstruir_resumos(conn)
+    assert registros_no_mes() == 4
+    horas = dict(conn.execute(
+        "SELECT periodo, registros FROM resumo_hora WHERE periodo LIKE '2026-03-%'"
+    ).fetchall())
+    assert horas == {"2026-03-05 12": 1, "2026-03-10 08": 3}
+
+
+def test_texto_vazio_continua_vazio_no_arquivo(conn, tmp_path):
+    inserir(conn, "2026-03-10 08:00:00")
+    with conn:
+        conn.execute("UPDATE dados_locais SET status_local = '', diagnostico_ia = ''")
+    arquivar_mes(conn, "2026-03", str(tmp_path / "arq"))
+    registro = formatar_arquivado(ler_colunas(str(tmp_path / "arq" / "2026-03.npz")), 0)
+    assert registro["status_local"] == registro["diagnostico_ia"] == ""
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from qualidade import avaliar_qualidade, rejeitadas, resumo_qualidade, NAO_FINITO
+from sinteticos import gerar_batimentos
+
+
+@pytest.fixture
+def batimentos():
+    lote, _ = gerar_batimentos(np.random.default_rng(0), 8, 0.25)
+    return lote
+
+
+def test_batimentos_limpos_passam(batimentos):
+    avaliacao = avaliar_qualidade(batimentos)
+    assert not avaliacao["codigo"].any()
+    assert not rejeitadas(avaliacao).any()
+
+
+def test_linha_reta_saturacao_e_ruido(batimentos):
+    saturada = batimentos[1].copy()
+    saturada[40:60] = 4095
+    ruidosa = batimentos[2] + np.random.default_rng(1).normal(0, 300, batimentos.shape[1])
+    avaliacao = avaliar_qualidade(np.stack([np.full(141, 2000.0), saturada, ruidosa]))
+    assert list(avaliacao["motivo"]) == ["linha_reta", "saturacao", "ruido"]
+    assert rejeitadas(avaliacao).all()
+
+
+def test_deriva_so_marca(batimentos):
+    com_deriva = batimentos[3] + np.linspace(0, 900, 141)
+    avaliacao = avaliar_qualidade(com_deriva)
+    assert avaliacao["motivo"][0] == "deriva_linha_base"
+    assert not rejeitadas(avaliacao)[0]
+
+
+@pytest.mark.parametrize("valor", [np.nan, np.inf, -np.inf])
+def test_nao_finito_sempre_rejeitado(batimentos, valor):
+    janela = batimentos[0].astype(np.float64)
+    janela[70] = valor
+    avaliacao = avaliar_qualidade(np.stack([janela, np.full(141, np.nan), batimentos[1]]))
+    assert list(avaliacao["motivo"]) == [NAO_FINITO, NAO_FINITO, ""]
+    # MESMO COM A LISTA DE REJEICAO VAZIA
+    assert list(rejeitadas(avaliacao, rejeitar=())) == [True, True, False]
+
+
+def test_resumo_sem_nan():
+    avaliacao = avaliar_qualidade(np.full((1, 141), np.nan))
+    resumo = resumo_qualidade(avaliacao, 0)
+    assert resumo["motivo"] == NAO_FINITO
+    assert all(v is None or np.isfinite(v) for k, v in resumo.items() if k != "motivo")
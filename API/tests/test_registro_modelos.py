@@ -0,0 +1,27 @@
+from registro_modelos import RegistroModelos
+
+
+def pesos(tmp_path, nome):
+    caminho = tmp_path / nome
+    caminho.write_bytes(b"pesos")
+    return str(caminho)
+
+
+def test_publicar_nao_troca_a_versao_ativa(tmp_path):
+    registro = RegistroModelos(str(tmp_path / "modelos"))
+    assert registro.ativa() == (None, None)
+
+    # A PRIMEIRA VERSAO NASCE ATIVA; A SEGUNDA SO DEPOIS DO `ativar`
+    registro.publicar(pesos(tmp_path, "a.npz"), "v1")
+    assert registro.ativa()[0] == "v1"
+    registro.publicar(pesos(tmp_path, "b.npz"), "v2")
+    assert registro.ativa()[0] == "v1"
+    registro.ativar("v2")
+    assert registro.ativa()[0] == "v2"
+
+
+def test_sem_ponteiro_nao_ha_versao_ativa(tmp_path):
+    registro = RegistroModelos(str(tmp_path / "modelos"))
+    registro.publicar(pesos(tmp_path, "a.npz"), "v1")
+    (tmp_path / "modelos" / "ATIVO").unlink()
+    assert registro.ativa() == (None, None)
@@ -14,7 +14,8 @@
 const char* WIFI_SSID = "Rede";
 const char* WIFI_PASSWORD = "123456780";
 const char* API_URL = "http://192.168.0.6:8000/analisar";
-const char* STATUS_URL = "http://192.168.0.6:8000/ultimo_dado";
+// projecao=status: só id, diagnóstico e status, sem os 141 batimentos
+const char* STATUS_URL = "http://192.168.0.6:8000/ultimo_dado?projecao=status";
 
 // Variáveis globais
 int batimentos[ARRAY_SIZE];
@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+import numpy as np
+
+PASTA_TREINO = os.path.dirname(os.path.abspath(__file__))
+PASTA_APP = os.path.join(PASTA_TREINO, "..", "API", "app")
+sys.path.insert(0, PASTA_APP)
+
+# TREINO OFFLINE DO DETECTOR (MESMA ARQUITETURA SERVIDA PELA API)
+#
+# Na primeira execucao o CSV (local ou baixado com --baixar) e convertido em
+# .npy na pasta de cache: janelas reamostradas para 141 pontos e normalizadas
+# como a API faz (min-max por janela). Nas seguintes o .npy e so mapeado em
+# memoria. Os lotes saem de um tf.data com leitura paralela e prefetch.
+#
+# O resultado e um unico .npz (pesos, arquitetura, normalizacao, limiares e
+# tempos de treino) que a API carrega direto:
+#   EASY_HEART_BACKEND=numpy EASY_HEART_PESOS_NUMPY=modelo.npz
+#
+# Uso (a partir da pasta "IA - Treino"):
+#   python treinar.py --csv ecg.csv --saida ../API/PESO.npz
+#   python treinar.py --baixar --saida ../API/PESO.npz
+
+URL_ECG = "http://storage.googleapis.com/download.tensorflow.org/data/ecg.csv"
+
+# NO ECG5000 PREPARADO PELO TENSORFLOW O ROTULO 1 E O RITMO NORMAL
+ROTULO_NORMAL = 1
+
+
+# ---------------------------------------------------------------------------
+# CACHE DO DATASET EM .npy
+# ---------------------------------------------------------------------------
+
+# MESMA NORMALIZACAO DE utils.normalizar_lote, COM O clip FEITO NOS ENDPOINTS
+def normalizar_janelas(janelas):
+    minimo = janelas.min(axis=1, keepdims=True)
+    maximo = janelas.max(axis=1, keepdims=True)
+    amplitude = np.where(maximo > minimo, maximo - minimo, 1.0)
+    return np.clip((janelas - minimo) / amplitude, 0, 1)
+
+
+def reamostrar(janelas, tamanho):
+    if janelas.shape[1] == tamanho:
+        return janelas
+    origem = np.linspace(0.0, 1.0, janelas.shape[1])
+    destino = np.linspace(0.0, 1.0, tamanho)
+    return np.stack([np.interp(destino, origem, janela) for janela in janelas])
+
+
+def preparar_cache(csv, pasta_cache, tamanho, baixar=False):
+    os.makedirs(pasta_cache, exist_ok=True)
+    caminho_janelas = os.path.join(pasta_cache, f"janelas_{tamanho}.npy")
+    caminho_rotulos = os.path.join(pasta_cache, "rotulos.npy")
+
+    if not (os.path.exists(caminho_janelas) and os.path.exists(caminho_rotulos)):
+        if csv is None:
+            csv = os.path.join(pasta_cache, "ecg.csv")
+        if not os.path.exists(csv):
+            if not baixar:
+                raise SystemExit(f"{csv} não encontrado (use --csv ou --baixar)")
+            print(f"Baixando {URL_ECG}...")
+            urllib.request.urlretrieve(URL_ECG, csv)
+
+        inicio = time.perf_counter()
+        dados = np.loadtxt(csv, delimiter=",", dtype=np.float64)
+        janelas = normalizar_janelas(reamostrar(dados[:, :-1], tamanho)).astype(np.float32)
+        np.save(caminho_janelas, janelas)
+        np.save(caminho_rotulos, dados[:, -1].astype(np.int8))
+        print(f"Cache criado em {pasta_cache}: {janelas.shape} em {time.perf_counter() - inicio:.1f}s")
+
+    return np.load(caminho_janelas, mmap_mode="r"), np.load(caminho_rotulos, mmap_mode="r")
+
+
+# ---------------------------------------------------------------------------
+# tf.data
+# ---------------------------------------------------------------------------
+
+# OS INDICES SAO EMBARALHADOS E AGRUPADOS; CADA LOTE E LIDO DO .npy MAPEADO EM PARALELO
+def criar_dataset(tf, janelas, indices, tamanho_lote, embaralhar, semente=0):
+    tamanho = janelas.shape[1]
+
+    def ler_lote(idx):
+        return np.asarray(janelas[np.sort(idx)], dtype=np.float32)
+
+    def carregar(idx):
+        lote = tf.numpy_function(ler_lote, [idx], tf.float32)
+        lote = tf.ensure_shape(lote, [None, tamanho])
+        return lote, lote
+
+    dataset = tf.data.Dataset.from_tensor_slices(np.asarray(indices, dtype=np.int64))
+    if embaralhar:
+        dataset = dataset.shuffle(len(indices), seed=semente, reshuffle_each_iteration=True)
+    dataset = dataset.batch(tamanho_lote)
+    dataset = dataset.map(carregar, num_parallel_calls=tf.data.AUTOTUNE, deterministic=False)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+# ---------------------------------------------------------------------------
+# TREINO, LIMIARES E AVALIACAO
+# ---------------------------------------------------------------------------
+
+def dividir(rotulos, fracao_teste, fracao_validacao, semente):
+    rng = np.random.default_rng(semente)
+    indices = rng.permutation(len(rotulos))
+    n_teste = int(len(indices) * fracao_teste)
+    teste, treino = indices[:n_teste], indices[n_teste:]
+
+    # O AUTOENCODER SO VE BATIMENTOS NORMAIS
+    normais = treino[np.asarray(rotulos)[treino] == ROTULO_NORMAL]
+    n_validacao = int(len(normais) * fracao_validacao)
+    return normais[n_validacao:], normais[:n_validacao], teste
+
+
+def perdas_mae(modelo, janelas, indices, tamanho_lote=1024):
+    perdas = []
+    for i in range(0, len(indices), tamanho_lote):
+        lote = np.asarray(janelas[np.sort(indices[i:i + tamanho_lote])], dtype=np.float32)
+        perdas.append(np.mean(np.abs(lote - modelo(lote).numpy()), axis=1))
+    return np.concatenate(perdas) if perdas else np.empty(0)
+
+
+def avaliar(perdas, rotulos, limiar):
+    previsto_anormal = perdas >= limiar
+    anormal = rotulos != ROTULO_NORMAL
+    vp = int(np.sum(previsto_anormal & anormal))
+    fp = int(np.sum(previsto_anormal & ~anormal))
+    fn = int(np.sum(~previsto_anormal & anormal))
+    return {
+        "acuracia": float(np.mean(previsto_anormal == anormal)) if len(perdas) else None,
+        "precisao_anormal": vp / (vp + fp) if vp + fp else None,
+        "revocacao_anormal": vp / (vp + fn) if vp + fn else None,
+    }
+
+
+def treinar(args):
+    import tensorflow as tf
+    from detector import Detector
+    from exportar_pesos import salvar_artefato
+
+    tf.keras.utils.set_random_seed(args.semente)
+    janelas, rotulos = preparar_cache(args.csv, args.cache, args.tamanho, args.baixar)
+    treino, validacao, teste = dividir(rotulos, args.fracao_teste, args.fracao_validacao, args.semente)
+    print(f"Treino: {len(treino)} normais, validação: {len(validacao)}, teste: {len(teste)}")
+
+    camadas = tuple(int(n) for n in args.camadas.split(","))
+    modelo = Detector(camadas=camadas, saida=args.tamanho)
+    modelo.compile(optimizer=tf.keras.optimizers.Adam(args.taxa_aprendizado), loss="mae")
+
+    parada = tf.keras.callbacks.EarlyStopping(
+        monitor="val_loss", patience=args.paciencia, restore_best_weights=True
+    )
+    inicio = time.perf_counter()
+    historico = modelo.fit(
+        criar_dataset(tf, janelas, treino, args.tamanho_lote, True, args.semente),
+        validation_data=criar_dataset(tf, janelas, validacao, args.tamanho_lote, False),
+        epochs=args.epocas,
+        callbacks=[parada],
+        verbose=2,
+    )
+    duracao = time.perf_counter() - inicio
+    epocas = len(historico.history["loss"])
+
+    # LIMIARES A PARTIR DA DISTRIBUICAO DA PERDA NOS BATIMENTOS NORMAIS DE TREINO
+    perdas_treino = perdas_mae(modelo, janelas, treino)
+    limiares = {
+        "suspeito": float(np.percentile(perdas_treino, args.percentil_suspeito)),
+        "anormal": float(np.percentile(perdas_treino, args.percentil_anormal)),
+    }
+    perdas_teste = perdas_mae(modelo, janelas, np.sort(teste))
+    rotulos_teste = np.asarray(rotulos)[np.sort(teste)]
+
+    camadas_densas = modelo.encoder.layers + modelo.decoder.layers
+    metadados = salvar_artefato(
+        args.saida,
+        [camada.get_weights() for camada in camadas_densas],
+        "treinar.py",
+        arquitetura={"modelo": "Detector", "camadas": list(camadas), "saida": args.tamanho},
+        normalizacao={"metodo": "min_max_por_janela", "clip": [0.0, 1.0]},
+        limiares={
+            **limiares,
+            "percentis": {"suspeito": args.percentil_suspeito, "anormal": args.percentil_anormal},
+        },
+        treino={
+            "tempo_s": duracao,
+            "epocas": epocas,
+            "amostras_treino": int(len(treino)),
+            "amostras_por_s": len(treino) * epocas / duracao if duracao else None,
+            "perda_treino": float(historico.history["loss"][-1]),
+            "perda_validacao_melhor": float(min(historico.history["val_loss"])),
+            "tamanho_lote": args.tamanho_lote,
+            "semente": args.semente,
+        },
+        avaliacao={
+            "suspeito": avaliar(perdas_teste, rotulos_teste, limiares["suspeito"]),
+            "anormal": avaliar(perdas_teste, rotulos_teste, limiares["anormal"]),
+        },
+    )
+    return metadados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina o Detector e exporta o artefato da API")
+    parser.add_argument("--csv", default=None, help="ECG5000 em CSV (140 amostras + rótulo por linha)")
+    parser.add_argument("--baixar", action="store_true", help=f"baixa o CSV de {URL_ECG} se faltar")
+    parser.add_argument("--cache", default=os.path.join(PASTA_TREINO, "cache"))
+    parser.add_argument("--saida", default="PESO.npz")
+    parser.add_argument("--tamanho", type=int, default=141, help="amostras por janela servidas pela API")
+    parser.add_argument("--camadas", default="32,16,8")
+    parser.add_argument("--epocas", type=int, default=200)
+    parser.add_argument("--paciencia", type=int, default=10)
+    parser.add_argument("--tamanho-lote", type=int, default=256)
+    parser.add_argument("--taxa-aprendizado", type=float, default=1e-3)
+    parser.add_argument("--fracao-teste", type=float, default=0.2)
+    parser.add_argument("--fracao-validacao", type=float, default=0.2)
+    parser.add_argument("--percentil-suspeito", type=float, default=95.0)
+    parser.add_argument("--percentil-anormal", type=float, default=99.0)
+    parser.add_argument("--semente", type=int, default=21)
+    args = parser.parse_args()
+
+    metadados = treinar(args)
+    treino = metadados["treino"]
+    print(f"Artefato gravado em {args.saida}: camadas {metadados['dimensoes']}")
+    print(f"Treino: {treino['epocas']} épocas em {treino['tempo_s']:.1f}s "
+          f"({treino['amostras_por_s']:.0f} amostras/s)")
+    print(f"Limiares: {json.dumps(metadados['limiares'])}")
+    print(f"Avaliação no teste: {json.dumps(metadados['avaliacao'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,10 @@ from datetime import datetime, timedelta
 # URL base da API
 BASE_URL = "http://localhost:8000"
 
+# Registros por página e validade (segundos) das respostas guardadas em cache
+TAMANHO_PAGINA = 50
+VALIDADE_CACHE = 30
+
 # CONFIGURAÇÕES INICIAIS DA TELA
 st.set_page_config(page_title="Análise de Batimentos Cardíacos", layout="wide")
 st.title("Análise de Batimentos Cardíacos")
@@ -19,13 +23,32 @@ visualizacao = st.radio(
     ["Últimos 5 registros", "Busca por data", "Registros anormais"]
 )
 
+# SESSÃO HTTP ÚNICA (REAPROVEITA AS CONEXÕES ENTRE OS RERUNS DO STREAMLIT)
+@st.cache_resource
+def obter_sessao():
+    return requests.Session()
+
+# GET NA API COM CACHE POR VALIDADE (OS PARÂMETROS FAZEM PARTE DA CHAVE)
+@st.cache_data(ttl=VALIDADE_CACHE, show_spinner=False)
+def buscar(rota, **params):
+    response = obter_sessao().get(f"{BASE_URL}{rota}", params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+# RECONSTRUÇÃO DO MODELO NÃO MUDA PARA UM MESMO REGISTRO: CACHE MAIS LONGO
+@st.cache_data(ttl=3600, show_spinner=False)
+def buscar_reconstrucao(registro_id):
+    response = obter_sessao().get(f"{BASE_URL}/reconstrucao/{registro_id}", timeout=10)
+    response.raise_for_status()
+    return response.json()
+
 # FUNÇÃO PARA PLOTAR OS BATIMENTOS
 def plot_batimentos(registro):
     # Converte os batimentos para array NumPy
     batimentos = np.array(registro["batimentos"], dtype=np.float32)
 
-    # Reconstrói os batimentos simulando IA
-    reconstructed = batimentos * 0.9 + 0.1
+    # Reconstrução feita pelo Detector na API
+    reconstructed = np.array(buscar_reconstrucao(registro["id"])["reconstrucao"], dtype=np.float32)
 
     # Calcula erro entre real e reconstruído
     erro = np.abs(batimentos - reconstructed)
@@ -55,7 +78,8 @@ def plot_batimentos(registro):
     return fig, erro
 
 # FUNÇÃO PARA EXIBIR A TABELA DOS DADOS
-def exibir_dados(dados):
+# Se `resumo` vier de /estatisticas, as métricas cobrem o período inteiro e não só a página
+def exibir_dados(dados, resumo=None):
     if dados:
         df = pd.DataFrame(dados)
 
@@ -77,12 +101,20 @@ def exibir_dados(dados):
 
         # Mostra métricas no topo
         col1, col2, col3 = st.columns(3)
+        if resumo is not None:
+            total = resumo["total_registros"]
+            anormais = resumo["registros_anormais"]
+            erro_medio = resumo["perda_media"] or 0.0
+        else:
+            total = len(df)
+            anormais = len(df[df_display["Diagnóstico IA"] == "anormal"])
+            erro_medio = df_display["Erro (Perda)"].mean()
         with col1:
-            st.metric("Total de Registros", len(df))
+            st.metric("Total de Registros", total)
         with col2:
-            st.metric("Registros Anormais", len(df[df_display["Diagnóstico IA"] == "anormal"]))
+            st.metric("Registros Anormais", anormais)
         with col3:
-            st.metric("Erro Médio", f"{df_display['Erro (Perda)'].mean():.4f}")
+            st.metric("Erro Médio", f"{erro_medio:.4f}")
 
         # Mostra a tabela colorida
         st.dataframe(
@@ -94,6 +126,33 @@ def exibir_dados(dados):
 
         return df_display, dados
 
+    return None, None
+
+# CONTROLES DE PÁGINA: GUARDA A PILHA DE CURSORES (after_id) DE CADA VISÃO NO session_state
+def paginar(chave, proximo_id):
+    pilha = st.session_state.setdefault(chave, [None])
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        if st.button("⬅️ Anterior", key=f"{chave}_anterior", disabled=len(pilha) == 1):
+            pilha.pop()
+            st.rerun()
+    with col2:
+        if st.button("Próxima ➡️", key=f"{chave}_proxima", disabled=proximo_id is None):
+            pilha.append(proximo_id)
+            st.rerun()
+    with col3:
+        st.caption(f"Página {len(pilha)}")
+
+# CURSOR DA PÁGINA ATUAL DE UMA VISÃO
+def cursor_atual(chave):
+    return st.session_state.setdefault(chave, [None])[-1]
+
+# REMOVE after_id=None DOS PARÂMETROS
+def parametros_pagina(after_id, **params):
+    if after_id is not None:
+        params["after_id"] = after_id
+    return params
+
 # FUNÇÃO PARA MOSTRAR DETALHES DE UM REGISTRO
 def mostrar_detalhes_registro(registro, dados_completos):
     # Mostra informações principais em 4 colunas
@@ -123,8 +182,7 @@ def mostrar_detalhes_registro(registro, dados_completos):
 try:
     # CASO 1: VISUALIZA OS ÚLTIMOS 5 DADOS
     if visualizacao == "Últimos 5 registros":
-        response = requests.get(f"{BASE_URL}/ultimos_5_dados")
-        dados = response.json()["ultimos_dados"]
+        dados = buscar("/ultimos_5_dados")["ultimos_dados"]
 
         df_display, dados_completos = exibir_dados(dados)
 
@@ -145,37 +203,42 @@ try:
         with col2:
             data_fim = st.date_input("Data final", value=datetime.now())
 
-        if "dados_busca" not in st.session_state:
-            st.session_state.dados_busca = None
+        if "periodo_busca" not in st.session_state:
+            st.session_state.periodo_busca = None
 
+        # Nova busca volta para a primeira página
         if st.button("Buscar", type="primary"):
-            response = requests.get(
-                f"{BASE_URL}/dados_por_data",
-                params={
-                    "data_inicio": data_inicio.strftime("%Y-%m-%d"),
-                    "data_fim": data_fim.strftime("%Y-%m-%d")
-                }
-            )
-            st.session_state.dados_busca = response.json()["dados"]
-
-        if st.session_state.dados_busca:
-            df_display, dados_completos = exibir_dados(st.session_state.dados_busca)
-
-            registro_selecionado = st.selectbox(
-                "Selecione um registro para visualizar os gráficos:",
-                options=dados_completos,
-                format_func=lambda x: f"ID: {x['id']} - {x['data']} {x['hora']} - Diagnóstico: {x['diagnostico_ia']}"
-            )
-            if registro_selecionado:
-                mostrar_detalhes_registro(registro_selecionado, dados_completos)
+            st.session_state.periodo_busca = (data_inicio.strftime("%Y-%m-%d"), data_fim.strftime("%Y-%m-%d"))
+            st.session_state.paginas_busca = [None]
+
+        if st.session_state.periodo_busca:
+            inicio, fim = st.session_state.periodo_busca
+            pagina = buscar("/dados_por_data", **parametros_pagina(
+                cursor_atual("paginas_busca"),
+                data_inicio=inicio, data_fim=fim, limit=TAMANHO_PAGINA,
+            ))
+            resumo = buscar("/estatisticas", data_inicio=inicio, data_fim=fim)
+            df_display, dados_completos = exibir_dados(pagina["dados"], resumo)
+            paginar("paginas_busca", pagina["proximo_id"])
+
+            if dados_completos:
+                registro_selecionado = st.selectbox(
+                    "Selecione um registro para visualizar os gráficos:",
+                    options=dados_completos,
+                    format_func=lambda x: f"ID: {x['id']} - {x['data']} {x['hora']} - Diagnóstico: {x['diagnostico_ia']}"
+                )
+                if registro_selecionado:
+                    mostrar_detalhes_registro(registro_selecionado, dados_completos)
 
     # CASO 3: REGISTROS ANORMAIS
     else:
-        response = requests.get(f"{BASE_URL}/dados_anormais")
-        dados = response.json()["dados"]
+        pagina = buscar("/dados_anormais", **parametros_pagina(
+            cursor_atual("paginas_anormais"), limit=TAMANHO_PAGINA
+        ))
         st.warning("⚠️ Exibindo apenas registros classificados como anormais")
 
-        df_display, dados_completos = exibir_dados(dados)
+        df_display, dados_completos = exibir_dados(pagina["dados"])
+        paginar("paginas_anormais", pagina["proximo_id"])
 
         if dados_completos:
             registro_selecionado = st.selectbox(